@@ -0,0 +1,129 @@
+"""
+Benchmark insert hóa đơn hàng loạt
+
+So sánh ba cách ghi N hóa đơn vào một database SQLite tạm (cùng profile
+PRAGMA với bot):
+    1. InvoiceRepository.create  - commit + refresh từng hóa đơn (đo trên mẫu nhỏ)
+    2. session.add_all           - ORM unit-of-work, một commit
+    3. InvoiceRepository.bulk_create - INSERT ... ON CONFLICT RETURNING theo batch
+
+Cách chạy:
+    python benchmark_bulk_insert.py [--rows 100000] [--baseline-rows 2000] [--batch-size 1000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import Base
+from src.database.models import Invoice
+from src.database.repository import InvoiceRepository
+from src.database.sqlite_profile import install_sqlite_profile
+
+CATEGORIES = [
+    ('642', 'Chi phí văn phòng'),
+    ('641', 'Chi phí bán hàng'),
+    ('627', 'Chi phí sản xuất chung'),
+    ('156', 'Hàng hóa'),
+]
+
+
+def make_invoices(count, prefix):
+    start = datetime(2024, 1, 1)
+    invoices = []
+    for i in range(count):
+        subtotal = round(random.uniform(1e5, 5e7), -3)
+        account_code, category = random.choice(CATEGORIES)
+        invoices.append({
+            'invoice_number': f'{prefix}{i:08d}',
+            'invoice_date': start + timedelta(days=random.randint(0, 365)),
+            'supplier_name': f'Công ty TNHH NCC {i % 500}',
+            'supplier_tax_code': f'0{random.randint(100000000, 999999999)}',
+            'subtotal': subtotal,
+            'tax_rate': 10.0,
+            'tax_amount': subtotal * 0.1,
+            'total_amount': subtotal * 1.1,
+            'description': 'Hóa đơn benchmark',
+            'account_code': account_code,
+            'category': category,
+            'created_by_user_id': 1000 + i % 50,
+            'created_by_username': f'user{i % 50}',
+        })
+    return invoices
+
+
+def new_session_factory(db_path):
+    engine = create_engine(f'sqlite:///{db_path}', echo=False)
+    install_sqlite_profile(engine)
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def timed(label, count, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:38s}: {count:>8,} rows | {elapsed:8.2f} s | {count / elapsed:>10,.0f} rows/s")
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk invoice insert benchmark')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--baseline-rows', type=int, default=2000,
+                        help='Số hóa đơn đo với create() từng cái (chậm)')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    print("=" * 88)
+    print(f"BULK INSERT BENCHMARK - {args.rows:,} invoices, batch {args.batch_size}")
+    print("=" * 88)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = new_session_factory(os.path.join(tmp, 'bench.db'))
+        session = Session()
+        try:
+            baseline = make_invoices(args.baseline_rows, 'ONE')
+            per_row = timed('create() (commit mỗi hóa đơn)', len(baseline),
+                            lambda: [InvoiceRepository.create(session, data) for data in baseline])
+
+            orm_rows = make_invoices(args.rows, 'ORM')
+
+            def add_all():
+                session.add_all(Invoice(**data) for data in orm_rows)
+                session.commit()
+            orm = timed('session.add_all() + 1 commit', len(orm_rows), add_all)
+            session.expunge_all()
+
+            bulk_rows = make_invoices(args.rows, 'BULK')
+            bulk = timed('bulk_create()', len(bulk_rows),
+                         lambda: InvoiceRepository.bulk_create(session, bulk_rows, args.batch_size))
+
+            # Import lại cùng dữ liệu: toàn bộ là duplicate
+            result = None
+
+            def reimport():
+                nonlocal result
+                result = InvoiceRepository.bulk_create(session, bulk_rows, args.batch_size)
+            timed('bulk_create() lần 2 (toàn duplicate)', len(bulk_rows), reimport)
+            print(f"    -> created {len(result.created_ids)}, duplicates {len(result.duplicates):,}")
+
+            upsert_rows = make_invoices(args.rows // 2, 'BULK') + make_invoices(args.rows // 2, 'NEW')
+            timed('bulk_upsert() (50% cập nhật)', len(upsert_rows),
+                  lambda: InvoiceRepository.bulk_upsert(session, upsert_rows, batch_size=args.batch_size))
+        finally:
+            session.close()
+            engine.dispose()
+
+    print("=" * 88)
+    print(f"  bulk_create vs create(): x{bulk / per_row:.0f} | bulk_create vs add_all(): x{bulk / orm:.1f}")
+    print("=" * 88)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+Benchmark SQLite: nhiều writer/reader đồng thời trên cùng một file
+
+So sánh cấu hình mặc định (rollback journal, synchronous=FULL) với profile
+production trong src/database/sqlite_profile.py (WAL, synchronous=NORMAL,
+busy_timeout, mmap, cache, temp_store). Workload mô phỏng bot + web admin:
+writer duyệt hóa đơn (UPDATE invoice + tăng counter user trong một
+transaction), reader chạy các query thống kê của dashboard.
+
+Các PRAGMA của lần chạy tuned lấy từ sqlite_pragmas(), đúng danh sách mà
+DatabaseManager áp dụng theo config (.env) hiện tại.
+
+Cách chạy:
+    python benchmark_sqlite.py [--writers 4] [--readers 4] [--seconds 5] [--rows 20000]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from src.database.sqlite_profile import sqlite_pragmas
+
+DEFAULT_PRAGMAS = [
+    ('journal_mode', 'DELETE'),
+    ('synchronous', 'FULL'),
+]
+
+# Timeout mặc định của sqlite3/pysqlite (SQLAlchemy dùng giá trị này)
+CONNECT_TIMEOUT = 5.0
+
+
+def connect(db_path, pragmas):
+    conn = sqlite3.connect(db_path, timeout=CONNECT_TIMEOUT, isolation_level=None)
+    for name, value in pragmas:
+        conn.execute(f'PRAGMA {name}={value}')
+    return conn
+
+
+def setup_database(db_path, pragmas, rows):
+    conn = connect(db_path, pragmas)
+    conn.executescript("""
+        CREATE TABLE invoices (
+            id INTEGER PRIMARY KEY,
+            invoice_number VARCHAR(100) UNIQUE NOT NULL,
+            supplier_name VARCHAR(255),
+            total_amount FLOAT NOT NULL,
+            status VARCHAR(50) DEFAULT 'pending',
+            approved_by VARCHAR(100),
+            created_by_user_id INTEGER NOT NULL
+        );
+        CREATE INDEX ix_invoices_status ON invoices(status);
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY,
+            telegram_user_id INTEGER UNIQUE NOT NULL,
+            total_invoices_approved INTEGER DEFAULT 0
+        );
+    """)
+    conn.execute('BEGIN')
+    conn.executemany(
+        'INSERT INTO invoices (invoice_number, supplier_name, total_amount, created_by_user_id) '
+        'VALUES (?, ?, ?, ?)',
+        ((f'HD{i:08d}', f'NCC {i % 200}', random.uniform(1e4, 1e7), i % 50) for i in range(rows))
+    )
+    conn.executemany('INSERT INTO users (telegram_user_id) VALUES (?)', ((i,) for i in range(50)))
+    conn.execute('COMMIT')
+    conn.close()
+
+
+def writer(db_path, pragmas, rows, deadline, results):
+    conn = connect(db_path, pragmas)
+    done = errors = 0
+    latencies = []
+    while time.time() < deadline:
+        invoice_id = random.randint(1, rows)
+        started = time.perf_counter()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                "UPDATE invoices SET status = ?, approved_by = ? WHERE id = ?",
+                (random.choice(['approved', 'rejected', 'pending']), 'bench', invoice_id)
+            )
+            conn.execute(
+                'UPDATE users SET total_invoices_approved = total_invoices_approved + 1 '
+                'WHERE telegram_user_id = ?', (invoice_id % 50,)
+            )
+            conn.execute('COMMIT')
+            done += 1
+            latencies.append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            errors += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+    conn.close()
+    results.put(('write', done, errors, latencies))
+
+
+def reader(db_path, pragmas, deadline, results):
+    conn = connect(db_path, pragmas)
+    done = errors = 0
+    latencies = []
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.execute("SELECT status, COUNT(*), SUM(total_amount) FROM invoices GROUP BY status").fetchall()
+            conn.execute(
+                "SELECT * FROM invoices WHERE status = 'pending' ORDER BY id DESC LIMIT 20"
+            ).fetchall()
+            done += 1
+            latencies.append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            errors += 1
+    conn.close()
+    results.put(('read', done, errors, latencies))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(name, pragmas, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        setup_database(db_path, pragmas, args.rows)
+
+        results = multiprocessing.Queue()
+        deadline = time.time() + args.seconds
+        procs = [multiprocessing.Process(target=writer, args=(db_path, pragmas, args.rows, deadline, results))
+                 for _ in range(args.writers)]
+        procs += [multiprocessing.Process(target=reader, args=(db_path, pragmas, deadline, results))
+                  for _ in range(args.readers)]
+        for proc in procs:
+            proc.start()
+        collected = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+
+    summary = {}
+    for kind in ('write', 'read'):
+        items = [c for c in collected if c[0] == kind]
+        latencies = [lat for c in items for lat in c[3]]
+        summary[kind] = {
+            'ops': sum(c[1] for c in items),
+            'errors': sum(c[2] for c in items),
+            'p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+            'p99_ms': percentile(latencies, 99) * 1000,
+        }
+
+    print(f"\n{name}")
+    print("-" * 72)
+    for kind, stats in summary.items():
+        print(f"  {kind:5s}: {stats['ops'] / args.seconds:9.0f} ops/s | "
+              f"locked errors: {stats['errors']:5d} | "
+              f"p50 {stats['p50_ms']:7.2f} ms | p99 {stats['p99_ms']:8.2f} ms")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite concurrent writer/reader benchmark')
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print(f"SQLITE BENCHMARK - {args.writers} writers, {args.readers} readers, "
+          f"{args.seconds:g}s, {args.rows:,} invoices")
+    print("=" * 72)
+
+    baseline = run('Mặc định (journal=DELETE, synchronous=FULL)', DEFAULT_PRAGMAS, args)
+    tuned_pragmas = sqlite_pragmas()
+    tuned = run('Production profile (' + ', '.join(f'{name}={value}' for name, value in tuned_pragmas) + ')',
+                tuned_pragmas, args)
+
+    print("\n" + "=" * 72)
+    for kind in ('write', 'read'):
+        before = baseline[kind]['ops'] or 1
+        print(f"  {kind:5s} throughput: x{tuned[kind]['ops'] / before:.1f}")
+    print("=" * 72)
+
+
+if __name__ == '__main__':
+    main()
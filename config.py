@@ -13,8 +13,41 @@ TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 if not TELEGRAM_TOKEN:
     raise ValueError("TELEGRAM_TOKEN không được tìm thấy trong file .env")
 
+# Nhận update: 'polling' (mặc định) hoặc 'webhook' (aiohttp server, xem src/bot/webhook.py)
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # URL public (https://bot.example.com), trống = không gọi setWebhook
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')  # Bắt buộc ở mode webhook, 1-256 ký tự A-Z a-z 0-9 _ -
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8081))
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 8))  # Số update xử lý đồng thời
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000))  # Đầy thì trả 503, Telegram gửi lại sau
+WEBHOOK_DRAIN_TIMEOUT_SECONDS = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT_SECONDS', 30))
+
+# FSM storage (state hội thoại): 'sql' (bảng fsm_states), 'redis' hoặc 'memory' (chỉ một instance)
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'sql').lower()
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+FSM_STATE_TTL_SECONDS = int(os.getenv('FSM_STATE_TTL_SECONDS', 7 * 86400)) or None  # Chỉ áp dụng cho Redis
+
 # Database Configuration
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///accounting.db')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))  # giây chờ lấy connection
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # giây
+
+# SQLite Profile (áp dụng cho mỗi connection khi dùng SQLite)
+SQLITE_PROFILE_ENABLED = os.getenv('SQLITE_PROFILE_ENABLED', 'true').lower() == 'true'
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -64000))  # âm = KiB (~64MB)
+SQLITE_TEMP_STORE = os.getenv('SQLITE_TEMP_STORE', 'MEMORY')
+# Bật kiểm tra khóa ngoại (cần cho ON DELETE CASCADE của invoice_image_hashes).
+# Database cũ có dữ liệu mồ côi: kiểm tra bằng PRAGMA foreign_key_check trước khi bật
+SQLITE_FOREIGN_KEYS = os.getenv('SQLITE_FOREIGN_KEYS', 'true').lower() == 'true'
+SQLITE_MAINTENANCE_INTERVAL_MINUTES = int(os.getenv('SQLITE_MAINTENANCE_INTERVAL_MINUTES', 60))
 
 # OCR Configuration
 OCR_TYPE = os.getenv('OCR_TYPE', 'easyocr')
@@ -30,11 +63,102 @@ LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 MAX_FILE_SIZE_MB = int(os.getenv('MAX_FILE_SIZE_MB', 20))
 TEMP_FILE_RETENTION_HOURS = int(os.getenv('TEMP_FILE_RETENTION_HOURS', 24))
 
+# Upload ZIP nhiều hóa đơn
+ZIP_MAX_FILES = int(os.getenv('ZIP_MAX_FILES', 200))
+ZIP_MAX_UNCOMPRESSED_MB = int(os.getenv('ZIP_MAX_UNCOMPRESSED_MB', 200))
+BATCH_OCR_WORKERS = int(os.getenv('BATCH_OCR_WORKERS', 4))  # Số file OCR/trích xuất song song
+# Tin nhắn tiến độ: khoảng cách tối thiểu giữa hai lần sửa (ms)
+PROGRESS_EDIT_INTERVAL_MS = int(os.getenv('PROGRESS_EDIT_INTERVAL_MS', 1000))
+
+# Hàng đợi xử lý upload: chia lượt đều giữa các user (1 user gửi 200 ảnh không chặn người khác)
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 4))  # Số upload xử lý đồng thời
+INGEST_MAX_PENDING_PER_USER = int(os.getenv('INGEST_MAX_PENDING_PER_USER', 300))
+INGEST_DRAIN_TIMEOUT_SECONDS = float(os.getenv('INGEST_DRAIN_TIMEOUT_SECONDS', 60))
+# Số OCR / gọi AI chạy đồng thời toàn process (gồm cả ZIP)
+OCR_CONCURRENCY = int(os.getenv('OCR_CONCURRENCY', 2))
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', 4))
+# Token bucket cho tin nhắn / nút bấm (upload không bị chặn mà vào hàng đợi)
+THROTTLE_USER_RATE = float(os.getenv('THROTTLE_USER_RATE', 1))  # thao tác/giây mỗi user
+THROTTLE_USER_BURST = float(os.getenv('THROTTLE_USER_BURST', 10))
+THROTTLE_CHAT_RATE = float(os.getenv('THROTTLE_CHAT_RATE', 3))  # thao tác/giây mỗi chat (group)
+THROTTLE_CHAT_BURST = float(os.getenv('THROTTLE_CHAT_BURST', 10))
+
+# Ảnh gần giống (dHash): số bit khác nhau tối đa để coi là cùng một hóa đơn
+# (tối đa 3: hash được tách 4 khối, chỉ đảm bảo tìm đủ khi lệch <= 3 bit)
+IMAGE_HASH_MAX_DISTANCE = int(os.getenv('IMAGE_HASH_MAX_DISTANCE', 3))
+IMAGE_HASH_MAX_CANDIDATES = int(os.getenv('IMAGE_HASH_MAX_CANDIDATES', 500))  # Số hash ứng viên tối đa mỗi lần tìm
+
+# Cache quyền user (giây)
+PERMISSION_CACHE_TTL_SECONDS = int(os.getenv('PERMISSION_CACHE_TTL_SECONDS', 60))
+
+# Số row mỗi batch của InvoiceRepository.bulk_create / bulk_upsert
+BULK_INSERT_BATCH_SIZE = int(os.getenv('BULK_INSERT_BATCH_SIZE', 1000))
+
+# Buffer hoạt động user: chu kỳ flush xuống database (giây)
+ACTIVITY_FLUSH_INTERVAL_SECONDS = float(os.getenv('ACTIVITY_FLUSH_INTERVAL_SECONDS', 5))
+
+# Outbox thông báo Telegram (giới hạn của Telegram: ~30 tin/giây, ~1 tin/giây mỗi chat)
+NOTIFY_RATE_PER_SECOND = float(os.getenv('NOTIFY_RATE_PER_SECOND', 25))
+NOTIFY_PER_CHAT_INTERVAL_SECONDS = float(os.getenv('NOTIFY_PER_CHAT_INTERVAL_SECONDS', 1))
+NOTIFY_BATCH_SIZE = int(os.getenv('NOTIFY_BATCH_SIZE', 200))  # Số tin mỗi lần worker lấy từ outbox
+NOTIFY_POLL_INTERVAL_SECONDS = float(os.getenv('NOTIFY_POLL_INTERVAL_SECONDS', 2))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv('NOTIFY_MAX_ATTEMPTS', 5))
+NOTIFY_RETENTION_DAYS = int(os.getenv('NOTIFY_RETENTION_DAYS', 7))  # Giữ tin đã gửi để tra cứu
+
+# Scheduler: job định kỳ (cú pháp cron 5 trường, giờ local của server)
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true'
+SCHEDULER_TICK_SECONDS = float(os.getenv('SCHEDULER_TICK_SECONDS', 30))
+SCHEDULER_LOCK_TTL_SECONDS = float(os.getenv('SCHEDULER_LOCK_TTL_SECONDS', 90))  # Lease leader giữa các instance
+DAILY_SUMMARY_CRON = os.getenv('DAILY_SUMMARY_CRON', '0 18 * * *')
+PENDING_REMINDER_CRON = os.getenv('PENDING_REMINDER_CRON', '0 9,14 * * 1-5')
+PENDING_REMINDER_MIN_AGE_HOURS = float(os.getenv('PENDING_REMINDER_MIN_AGE_HOURS', 24))
+BUDGET_ALERT_CRON = os.getenv('BUDGET_ALERT_CRON', '0 * * * *')
+# Ngân sách tháng theo danh mục, vd: "Văn phòng phẩm=5000000;Điện nước=3000000;*=50000000" (* = tổng)
+MONTHLY_BUDGETS = os.getenv('MONTHLY_BUDGETS', '')
+BUDGET_ALERT_THRESHOLDS = os.getenv('BUDGET_ALERT_THRESHOLDS', '0.8,1.0')  # Tỷ lệ ngân sách đã dùng
+
+# Report Settings
+# Báo cáo Word vượt ngưỡng này chỉ xuất số liệu tổng hợp theo nhóm
+WORD_REPORT_DETAIL_LIMIT = int(os.getenv('WORD_REPORT_DETAIL_LIMIT', 2000))
+# Báo cáo PDF được render trong process riêng
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', 1))
+PDF_RENDER_TIMEOUT = int(os.getenv('PDF_RENDER_TIMEOUT', 120))
+PDF_FONT_PATH = os.getenv('PDF_FONT_PATH')  # Font TTF hỗ trợ tiếng Việt (optional)
+
 # Directories
 DATA_DIR = BASE_DIR / 'data'
 TEMPLATES_DIR = BASE_DIR / 'templates'
+# File tạm (ảnh vừa tải về, file export): xóa sau TEMP_FILE_RETENTION_HOURS
+TEMP_DIR = DATA_DIR / 'tmp'
 DATA_DIR.mkdir(exist_ok=True)
 TEMPLATES_DIR.mkdir(exist_ok=True)
+TEMP_DIR.mkdir(exist_ok=True)
+
+# File Storage (file gốc hóa đơn, đặt tên theo SHA-256 nội dung)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')  # local | s3
+STORAGE_DIR = Path(os.getenv('STORAGE_DIR', DATA_DIR / 'objects'))
+STORAGE_IMAGE_FORMAT = os.getenv('STORAGE_IMAGE_FORMAT', 'WEBP').upper()  # WEBP | AVIF | ORIGINAL
+STORAGE_IMAGE_QUALITY = int(os.getenv('STORAGE_IMAGE_QUALITY', 80))
+TEMP_SWEEP_INTERVAL_MINUTES = int(os.getenv('TEMP_SWEEP_INTERVAL_MINUTES', 60))
+THUMBNAIL_DIR = Path(os.getenv('THUMBNAIL_DIR', DATA_DIR / 'thumbs'))  # Cache thumbnail cho web admin
+THUMBNAIL_MAX_SIZE = int(os.getenv('THUMBNAIL_MAX_SIZE', 320))  # px, cạnh dài nhất
+WEB_IMAGE_CACHE_MAX_AGE = int(os.getenv('WEB_IMAGE_CACHE_MAX_AGE', 86400))  # giây, Cache-Control của ảnh
+
+# Web Admin (gunicorn.conf.py cho production, app.run chỉ để dev)
+WEB_HOST = os.getenv('WEB_HOST', '0.0.0.0')
+WEB_PORT = int(os.getenv('WEB_PORT', 5000))
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', min((os.cpu_count() or 1) * 2 + 1, 8)))
+WEB_THREADS = int(os.getenv('WEB_THREADS', 4))  # Thread mỗi worker (gthread)
+WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', 120))  # Báo cáo PDF có thể mất vài chục giây
+WEB_DEBUG = os.getenv('WEB_DEBUG', 'false').lower() == 'true'
+WEB_STATIC_MAX_AGE = int(os.getenv('WEB_STATIC_MAX_AGE', 7 * 86400))  # giây, file static có version trong URL
+
+# S3 / MinIO (khi STORAGE_BACKEND=s3)
+S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')  # vd: http://localhost:9000 cho MinIO
+S3_BUCKET = os.getenv('S3_BUCKET', 'invoices')
+S3_ACCESS_KEY_ID = os.getenv('S3_ACCESS_KEY_ID')
+S3_SECRET_ACCESS_KEY = os.getenv('S3_SECRET_ACCESS_KEY')
+S3_REGION = os.getenv('S3_REGION', 'us-east-1')
 
 # OCR Languages
 OCR_LANGUAGES = ['vi', 'en']  # Vietnamese and English
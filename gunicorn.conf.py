@@ -0,0 +1,38 @@
+"""
+Cấu hình gunicorn cho Web Admin (production)
+
+Cách chạy:
+    gunicorn webapp.app:app          (tự đọc gunicorn.conf.py trong thư mục hiện tại)
+
+- preload_app: import app (init_db, tạo bảng) một lần trong process master,
+  các worker fork ra dùng chung code đã nạp
+- post_fork: mỗi worker bỏ connection pool kế thừa từ master và tự mở pool
+  mới, không bao giờ dùng chung một socket database giữa các process
+- worker gthread: mỗi worker xử lý WEB_THREADS request song song (I/O
+  database, đọc file ảnh)
+"""
+import config as app_config  # "config" là tên một setting của gunicorn
+
+bind = f"{app_config.WEB_HOST}:{app_config.WEB_PORT}"
+workers = app_config.WEB_WORKERS
+worker_class = 'gthread'
+threads = app_config.WEB_THREADS
+timeout = app_config.WEB_TIMEOUT
+graceful_timeout = 30
+keepalive = 5
+
+preload_app = True
+
+# Restart worker định kỳ để giới hạn memory (pandas/reportlab khi xuất báo cáo)
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+loglevel = app_config.LOG_LEVEL.lower()
+
+
+def post_fork(server, worker):
+    from src.database import db_manager
+    db_manager.dispose_after_fork()
+    server.log.info(f"Worker {worker.pid}: database pool reset after fork")
@@ -1,12 +1,21 @@
 import asyncio
+import signal
 import sys
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from loguru import logger
 
 import config
-from src.database import db_manager
-from src.bot import commands, handlers, queries, admin, advanced_search
+from src.database import db_manager, async_db_manager
+from src.database.activity import activity_buffer
+from src.storage import sweep_temp_files
+from src.bot import commands, handlers, queries, admin, bulk_admin, advanced_search
+from src.bot.middlewares import DbSessionMiddleware, ThrottlingMiddleware
+from src.bot.ingestion import ingestion_queue
+from src.bot.outbox import NotificationWorker, STOP_TIMEOUT_SECONDS
+from src.bot.webhook import run_webhook
+from src.bot.fsm_storage import create_fsm_storage
+from src.scheduler import Scheduler
 
 # Configure logging
 logger.remove()
@@ -22,6 +31,38 @@ logger.add(
     level=config.LOG_LEVEL
 )
 
+async def run_database_maintenance():
+    """Bảo trì SQLite định kỳ (PRAGMA optimize, checkpoint WAL)"""
+    interval = config.SQLITE_MAINTENANCE_INTERVAL_MINUTES * 60
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(db_manager.run_maintenance)
+            logger.debug("Database maintenance completed")
+        except Exception as e:
+            logger.warning(f"Database maintenance failed: {e}")
+
+async def run_temp_sweeper():
+    """Xóa file tạm (upload chờ xử lý, file export) quá TEMP_FILE_RETENTION_HOURS"""
+    interval = config.TEMP_SWEEP_INTERVAL_MINUTES * 60
+    while True:
+        try:
+            await asyncio.to_thread(sweep_temp_files)
+        except Exception as e:
+            logger.warning(f"Temp file sweep failed: {e}")
+        await asyncio.sleep(interval)
+
+def shutdown_event() -> asyncio.Event:
+    """Event được set khi nhận SIGTERM/SIGINT (mode webhook tự xử lý tín hiệu)"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: Ctrl+C dừng qua KeyboardInterrupt
+    return stop
+
 async def main():
     """Main function để chạy bot"""
     
@@ -50,28 +91,91 @@ async def main():
         logger.error(f"Failed to initialize bot: {e}")
         sys.exit(1)
     
-    # Initialize dispatcher
-    dp = Dispatcher()
+    # Initialize dispatcher (FSM storage dùng chung khi chạy nhiều instance)
+    dp = Dispatcher(storage=create_fsm_storage())
+    
+    # Một database session cho mỗi update
+    dp.update.middleware(DbSessionMiddleware())
+    # Giới hạn tần suất tin nhắn / nút bấm theo user và chat (upload vào hàng đợi riêng)
+    throttling = ThrottlingMiddleware()
+    dp.message.outer_middleware(throttling)
+    dp.callback_query.outer_middleware(throttling)
     
     # Register routers
     dp.include_router(commands.router)
     dp.include_router(handlers.router)
     dp.include_router(queries.router)
     dp.include_router(admin.router)
+    dp.include_router(bulk_admin.router)
+    dp.include_router(admin.denied_router)
     dp.include_router(advanced_search.router)
     
     logger.info("All routers registered")
     
-    # Start polling
+    # Background tasks
+    maintenance_task = None
+    if config.SQLITE_MAINTENANCE_INTERVAL_MINUTES > 0:
+        maintenance_task = asyncio.create_task(run_database_maintenance())
+    sweeper_task = None
+    if config.TEMP_SWEEP_INTERVAL_MINUTES > 0:
+        sweeper_task = asyncio.create_task(run_temp_sweeper())
+    activity_task = asyncio.create_task(
+        activity_buffer.run(async_db_manager, config.ACTIVITY_FLUSH_INTERVAL_SECONDS)
+    )
+    # Worker xử lý upload (OCR + AI), chia lượt giữa các user
+    ingestion_queue.start()
+    # Gửi thông báo trong outbox theo rate limit của Telegram
+    outbox_worker = NotificationWorker(bot)
+    outbox_task = asyncio.create_task(outbox_worker.run())
+    # Tổng kết ngày, nhắc duyệt, cảnh báo ngân sách (một leader giữa các instance)
+    scheduler = None
+    scheduler_task = None
+    if config.SCHEDULER_ENABLED:
+        scheduler = Scheduler()
+        scheduler_task = asyncio.create_task(scheduler.run())
+    
+    # Start polling / webhook server
     try:
-        logger.info("Bot is now running. Press Ctrl+C to stop.")
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        logger.info(f"Bot is now running ({config.BOT_MODE}). Press Ctrl+C to stop.")
+        if config.BOT_MODE == 'webhook':
+            await run_webhook(dp, bot, shutdown_event())
+        else:
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
-        logger.error(f"Error during polling: {e}")
+        logger.error(f"Error during {config.BOT_MODE}: {e}")
     finally:
+        # Xử lý nốt các upload đã nhận trước khi đóng bot session / database
+        await ingestion_queue.drain()
+        if maintenance_task:
+            maintenance_task.cancel()
+        if sweeper_task:
+            sweeper_task.cancel()
+        outbox_worker.stop()
+        try:
+            # Gửi nốt nhóm đang gửi và ghi trạng thái (quá hạn thì hủy, lô vẫn được ghi)
+            await asyncio.wait_for(outbox_task, STOP_TIMEOUT_SECONDS)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        if scheduler_task:
+            scheduler_task.cancel()
+            try:
+                await scheduler_task
+            except asyncio.CancelledError:
+                pass
+            try:
+                await scheduler.release()
+            except Exception as e:
+                logger.warning(f"Cannot release scheduler lock: {e}")
+        activity_task.cancel()
+        try:
+            await activity_task  # đợi flush đang chạy trả batch về buffer
+        except asyncio.CancelledError:
+            pass
+        await activity_buffer.flush(async_db_manager)
         await bot.session.close()
+        await async_db_manager.dispose()
         logger.info("Bot shut down successfully")
 
 if __name__ == "__main__":
@@ -29,6 +29,10 @@ def migrate_database(db_path='accounting.db'):
         migrations_invoices = [
             ("approved_by_username", "ALTER TABLE invoices ADD COLUMN approved_by_username VARCHAR(100)"),
             ("rejection_reason", "ALTER TABLE invoices ADD COLUMN rejection_reason TEXT"),
+            ("content_hash", "ALTER TABLE invoices ADD COLUMN content_hash VARCHAR(64)"),
+            ("image_hash", "ALTER TABLE invoices ADD COLUMN image_hash VARCHAR(16)"),
+            ("telegram_file_id", "ALTER TABLE invoices ADD COLUMN telegram_file_id VARCHAR(200)"),
+            ("telegram_file_unique_id", "ALTER TABLE invoices ADD COLUMN telegram_file_unique_id VARCHAR(100)"),
         ]
         
         for col_name, sql in migrations_invoices:
@@ -41,13 +45,87 @@ def migrate_database(db_path='accounting.db'):
                 else:
                     raise
         
-        # 3. Tạo index cho status (nếu chưa có)
+        # 3. Tạo index cho status, content_hash (nếu chưa có)
         try:
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoice_status ON invoices(status)")
             logger.info("✓ Created index: idx_invoice_status")
+            cursor.execute("CREATE INDEX IF NOT EXISTS ix_invoices_content_hash ON invoices(content_hash)")
+            logger.info("✓ Created index: ix_invoices_content_hash")
+            cursor.execute("CREATE INDEX IF NOT EXISTS ix_invoices_image_hash ON invoices(image_hash)")
+            logger.info("✓ Created index: ix_invoices_image_hash")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS ix_invoices_telegram_file_unique_id "
+                "ON invoices(telegram_file_unique_id)"
+            )
+            logger.info("✓ Created index: ix_invoices_telegram_file_unique_id")
         except Exception as e:
             logger.warning(f"  Index creation failed: {e}")
         
+        # 3b. Số hóa đơn chỉ duy nhất theo MST: (supplier_tax_code, invoice_number)
+        cursor.execute("""
+            UPDATE invoices SET supplier_tax_code = ''
+            WHERE supplier_tax_code IS NULL OR LOWER(supplier_tax_code) IN ('none', 'null')
+        """)
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type='index' AND name='ix_invoices_invoice_number'")
+        row = cursor.fetchone()
+        if row and row[0] and row[0].upper().startswith("CREATE UNIQUE"):
+            cursor.execute("DROP INDEX ix_invoices_invoice_number")
+            logger.info("✓ Dropped global unique index on invoice_number")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_invoices_invoice_number ON invoices(invoice_number)")
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_invoices_supplier_number "
+            "ON invoices(supplier_tax_code, invoice_number)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_invoices_fingerprint "
+            "ON invoices(supplier_name, invoice_date, total_amount)"
+        )
+        logger.info("✓ Created indexes: uq_invoices_supplier_number, ix_invoices_fingerprint")
+        
+        # 3d. Index (cột sort, id) cho keyset pagination
+        pagination_indexes = {
+            'ix_invoices_created_at_id': 'created_at, id',
+            'ix_invoices_status_created_at_id': 'status, created_at, id',
+            'ix_invoices_user_created_at_id': 'created_by_user_id, created_at, id',
+            'ix_invoices_invoice_date_id': 'invoice_date, id',
+            'ix_invoices_total_amount_id': 'total_amount, id',
+        }
+        for index_name, columns in pagination_indexes.items():
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON invoices({columns})")
+        logger.info(f"✓ Created {len(pagination_indexes)} pagination indexes")
+        
+        # 3c. Bảng hash ảnh (multi-index Hamming lookup) + backfill từ invoices.image_hash
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS invoice_image_hashes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                invoice_id INTEGER NOT NULL REFERENCES invoices(id) ON DELETE CASCADE,
+                image_hash VARCHAR(16) NOT NULL,
+                chunk0 INTEGER NOT NULL,
+                chunk1 INTEGER NOT NULL,
+                chunk2 INTEGER NOT NULL,
+                chunk3 INTEGER NOT NULL
+            )
+        """)
+        for column in ('invoice_id', 'chunk0', 'chunk1', 'chunk2', 'chunk3'):
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_invoice_image_hashes_{column} "
+                f"ON invoice_image_hashes({column})"
+            )
+        cursor.execute("""
+            SELECT id, image_hash FROM invoices
+            WHERE image_hash IS NOT NULL
+              AND id NOT IN (SELECT invoice_id FROM invoice_image_hashes)
+        """)
+        backfill = []
+        for invoice_id, image_hash in cursor.fetchall():
+            value = int(image_hash, 16)
+            backfill.append((invoice_id, image_hash) + tuple((value >> s) & 0xFFFF for s in (48, 32, 16, 0)))
+        cursor.executemany(
+            "INSERT INTO invoice_image_hashes (invoice_id, image_hash, chunk0, chunk1, chunk2, chunk3) "
+            "VALUES (?, ?, ?, ?, ?, ?)", backfill
+        )
+        logger.info(f"✓ Created table invoice_image_hashes ({len(backfill)} hashes backfilled)")
+        
         # 4. Thêm cột mới vào users
         logger.info("Migrating users table...")
         
@@ -154,7 +232,8 @@ def verify_migration(db_path='accounting.db'):
     cursor.execute("PRAGMA table_info(invoices)")
     invoice_cols = [col[1] for col in cursor.fetchall()]
     
-    required_invoice_cols = ['approved_by_username', 'rejection_reason']
+    required_invoice_cols = ['approved_by_username', 'rejection_reason', 'content_hash', 'image_hash',
+                             'telegram_file_id', 'telegram_file_unique_id']
     for col in required_invoice_cols:
         if col in invoice_cols:
             logger.info(f"  ✓ invoices.{col} exists")
@@ -181,6 +260,13 @@ def verify_migration(db_path='accounting.db'):
     else:
         logger.warning("  ⚠ idx_invoice_status missing")
     
+    for index_name in ('uq_invoices_supplier_number', 'ix_invoices_fingerprint',
+                       'ix_invoices_created_at_id', 'ix_invoices_status_created_at_id'):
+        if index_name in indexes:
+            logger.info(f"  ✓ {index_name} exists")
+        else:
+            logger.warning(f"  ⚠ {index_name} missing")
+    
     if 'idx_user_role' in indexes:
         logger.info("  ✓ idx_user_role exists")
     else:
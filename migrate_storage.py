@@ -0,0 +1,70 @@
+"""
+Chuyển file gốc hóa đơn cũ (data/invoice_<user>_<timestamp>.jpg) vào storage
+
+Mỗi file được lưu theo key content-addressed (ảnh nén lại WebP), cập nhật
+invoices.file_path (và content_hash nếu còn trống) rồi xóa file cũ.
+
+Cách chạy:
+    python migrate_storage.py [--keep] [--dry-run]
+"""
+import argparse
+import hashlib
+import os
+from pathlib import Path
+from loguru import logger
+
+from src.database import db_manager
+from src.database.models import Invoice
+from src.storage import storage
+
+
+def migrate_storage(keep: bool = False, dry_run: bool = False):
+    """Chuyển các hóa đơn còn lưu đường dẫn tuyệt đối sang storage key"""
+    session = db_manager.get_session()
+    moved = missing = saved_bytes = 0
+    try:
+        invoices = session.query(Invoice).filter(Invoice.file_path.isnot(None)).all()
+        for invoice in invoices:
+            if not os.path.isabs(invoice.file_path):
+                continue
+            path = Path(invoice.file_path)
+            if not path.exists():
+                missing += 1
+                logger.warning(f"Invoice #{invoice.id}: file not found {path}")
+                continue
+            if dry_run:
+                moved += 1
+                continue
+
+            data = path.read_bytes()
+            digest = hashlib.sha256(data).hexdigest()
+            key = storage.save(data, digest, path.name)
+
+            invoice.file_path = key
+            if not invoice.content_hash:
+                invoice.content_hash = digest
+            session.commit()
+
+            stored = storage.local_path(key)
+            if stored:
+                saved_bytes += len(data) - stored.stat().st_size
+            if not keep:
+                path.unlink()
+            moved += 1
+    finally:
+        session.close()
+
+    logger.info(f"Moved {moved} files, {missing} missing, saved {saved_bytes / 1024 / 1024:.1f} MB")
+    return moved
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Chuyển file gốc hóa đơn vào storage')
+    parser.add_argument('--keep', action='store_true', help='Giữ lại file cũ trong DATA_DIR')
+    parser.add_argument('--dry-run', action='store_true', help='Chỉ đếm, không thay đổi gì')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("STORAGE MIGRATION - DATA_DIR → content-addressed storage")
+    print("=" * 60)
+    migrate_storage(keep=args.keep, dry_run=args.dry_run)
@@ -11,7 +11,13 @@ echo "URL: http://localhost:5000"
 echo "Default Password: admin123"
 echo ""
 echo "Press Ctrl+C to stop the server"
+echo "Production mode: ./run_web.sh --prod (gunicorn)"
 echo "=================================="
 echo ""
 
-python webapp/app.py
+if [ "$1" = "--prod" ]; then
+    # Nhiều worker, xem gunicorn.conf.py
+    gunicorn webapp.app:app
+else
+    python webapp/app.py
+fi
@@ -0,0 +1,92 @@
+"""
+Gửi update giả tới webhook server đang chạy local (BOT_MODE=webhook)
+
+Tạo update tin nhắn văn bản giống Telegram rồi POST tới WEBHOOK_PATH kèm
+secret token, in status code và thời gian phản hồi. Bot vẫn gọi Telegram API
+để trả lời, nên dùng chat_id của chính mình nếu muốn thấy phản hồi thật.
+
+Cách chạy:
+    python send_test_update.py [--text /start] [--user-id 123] [--count 1] [--concurrency 1]
+    python send_test_update.py --secret sai   # kiểm tra server trả 401
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import time
+
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_update_ids = itertools.count(random.randint(1, 10**8))
+
+
+def make_message_update(text: str, user_id: int, username: str = 'webhook_test') -> dict:
+    """Update ``message`` tối thiểu mà aiogram parse được"""
+    user = {'id': user_id, 'is_bot': False, 'first_name': 'Webhook', 'username': username}
+    return {
+        'update_id': next(_update_ids),
+        'message': {
+            'message_id': random.randint(1, 10**6),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private', 'first_name': 'Webhook', 'username': username},
+            'from': user,
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+            if text.startswith('/') else [],
+        },
+    }
+
+
+async def send(session: aiohttp.ClientSession, url: str, secret: str, update: dict):
+    started = time.perf_counter()
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+    async with session.post(url, json=update, headers=headers) as response:
+        body = await response.text()
+    return response.status, (time.perf_counter() - started) * 1000, body
+
+
+async def run(args):
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def send_one(session):
+        async with semaphore:
+            return await send(session, args.url, args.secret,
+                              make_message_update(args.text, args.user_id))
+
+    async with aiohttp.ClientSession() as session:
+        results = await asyncio.gather(*(send_one(session) for _ in range(args.count)))
+
+    for status, elapsed, body in results[:10]:
+        print(f"{status} {elapsed:.1f} ms {body[:80]}")
+    if len(results) > 10:
+        print(f"... {len(results) - 10} more")
+    statuses = {}
+    for status, _, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f"Status: {statuses}, max {max(elapsed for _, elapsed, _ in results):.1f} ms")
+
+    async with aiohttp.ClientSession() as session:
+        base = args.url.split('/', 3)
+        async with session.get(f"{base[0]}//{base[2]}/readyz") as response:
+            print(f"/readyz: {response.status} {await response.text()}")
+
+
+def main():
+    port = os.getenv('WEBHOOK_PORT', '8081')
+    path = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+    parser = argparse.ArgumentParser(description='Post synthetic Telegram updates to the local webhook')
+    parser.add_argument('--url', default=f"http://127.0.0.1:{port}{path}")
+    parser.add_argument('--secret', default=os.getenv('WEBHOOK_SECRET', ''))
+    parser.add_argument('--text', default='/start')
+    parser.add_argument('--user-id', type=int, default=int(os.getenv('TEST_USER_ID', 1)))
+    parser.add_argument('--count', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
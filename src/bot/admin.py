@@ -1,47 +1,60 @@
 """Admin commands cho Telegram Bot"""
+import asyncio
+from pathlib import Path
 from aiogram import Router, F
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import (
+    Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile, BufferedInputFile
+)
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from loguru import logger
 from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import db_manager
-from src.database.repository import InvoiceRepository, UserRepository
+from src.database.async_repository import AsyncInvoiceRepository, AsyncUserRepository
+from src.database.permissions import permission_cache
+from src.database.activity import activity_buffer
+from src.storage import storage
+from src.bot.filters import AdminFilter
+from src.bot.notifications import notify_user
 
 router = Router()
-invoice_repo = InvoiceRepository()
-user_repo = UserRepository()
+router.message.filter(AdminFilter())
+router.callback_query.filter(AdminFilter())
+
+# Update admin của người không có quyền rơi xuống đây (include sau các router admin)
+denied_router = Router()
+
+ADMIN_COMMANDS = ("admin", "pending", "bulk", "users", "set_role", "stats_admin")
+ADMIN_CALLBACK_PREFIXES = ("approve_", "reject_", "view_", "bulk_")
+
+# Định dạng gửi được bằng sendPhoto, còn lại (PDF, XML, AVIF...) gửi dạng document
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+STATUS_LABELS = {'approved': 'đã được duyệt', 'rejected': 'đã bị từ chối'}
 
 class AdminStates(StatesGroup):
     """States cho admin workflow"""
     waiting_for_rejection_reason = State()
     waiting_for_user_role = State()
 
-def is_admin(user_id: int) -> bool:
-    """Kiểm tra user có phải admin không"""
-    user = user_repo.get_by_telegram_id(user_id)
-    return user and user.role in ['admin', 'accountant']
-
 @router.message(Command("admin"))
-async def cmd_admin(message: Message):
+async def cmd_admin(message: Message, session: AsyncSession):
     """Admin panel"""
-    if not is_admin(message.from_user.id):
-        await message.answer("⛔ Bạn không có quyền truy cập chức năng này!")
-        return
-    
-    user = user_repo.get_by_telegram_id(message.from_user.id)
+    # AdminFilter vừa kiểm tra quyền nên permission chắc chắn có trong cache
+    permission = await permission_cache.get_or_load(session, message.from_user.id)
     
     # Thống kê
-    pending_count = invoice_repo.count_by_status('pending')
-    total_users = user_repo.count_all()
+    pending_count = await AsyncInvoiceRepository.count_by_status(session, 'pending')
+    total_users = await AsyncUserRepository.count_all(session)
     
     text = f"""
 🔐 <b>ADMIN PANEL</b>
 
-👤 Xin chào {user.first_name or user.username}!
-📊 Vai trò: <b>{user.role.upper()}</b>
+👤 Xin chào {message.from_user.first_name or message.from_user.username}!
+📊 Vai trò: <b>{permission.role.upper()}</b>
 
 📈 <b>Thống kê:</b>
 • Hóa đơn chờ duyệt: {pending_count}
@@ -49,6 +62,7 @@ async def cmd_admin(message: Message):
 
 <b>Các lệnh có sẵn:</b>
 /pending - Xem hóa đơn chờ duyệt
+/bulk - Duyệt/từ chối nhiều hóa đơn
 /users - Quản lý users
 /stats_admin - Thống kê chi tiết
 /set_role - Phân quyền user
@@ -56,13 +70,9 @@ async def cmd_admin(message: Message):
     await message.answer(text, parse_mode="HTML")
 
 @router.message(Command("pending"))
-async def cmd_pending(message: Message):
+async def cmd_pending(message: Message, session: AsyncSession):
     """Xem hóa đơn chờ duyệt"""
-    if not is_admin(message.from_user.id):
-        await message.answer("⛔ Bạn không có quyền truy cập!")
-        return
-    
-    pending_invoices = invoice_repo.get_by_status('pending', limit=10)
+    pending_invoices = await AsyncInvoiceRepository.get_by_status(session, 'pending', limit=10)
     
     if not pending_invoices:
         await message.answer("✅ Không có hóa đơn nào chờ duyệt!")
@@ -76,7 +86,7 @@ async def cmd_pending(message: Message):
 📅 Ngày: {invoice.invoice_date.strftime('%d/%m/%Y')}
 🏢 Nhà CC: {invoice.supplier_name}
 💰 Tổng tiền: <b>{invoice.total_amount:,.0f} VNĐ</b>
-📝 Mô tả: {invoice.description[:100]}...
+📝 Mô tả: {(invoice.description or '')[:100]}...
 👤 Người tạo: @{invoice.created_by_username or 'N/A'}
 
 📂 Danh mục: {invoice.category}
@@ -92,58 +102,60 @@ async def cmd_pending(message: Message):
         ])
         
         await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+    
+    await message.answer("💡 Dùng /bulk để chọn và duyệt nhiều hóa đơn cùng lúc.")
+
+async def already_processed_text(session: AsyncSession, invoice_id: int) -> str:
+    """Thông báo khi hóa đơn không còn chờ duyệt (admin khác vừa xử lý)"""
+    invoice = await AsyncInvoiceRepository.get_by_id(session, invoice_id)
+    if not invoice:
+        return "❌ Không tìm thấy hóa đơn!"
+    by = f" bởi @{invoice.approved_by_username}" if invoice.approved_by_username else ""
+    return f"⚠️ Hóa đơn #{invoice.invoice_number} {STATUS_LABELS.get(invoice.status, invoice.status)}{by}"
 
 @router.callback_query(F.data.startswith("approve_"))
-async def callback_approve(callback: CallbackQuery):
+async def callback_approve(callback: CallbackQuery, session: AsyncSession):
     """Duyệt hóa đơn"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("⛔ Bạn không có quyền!", show_alert=True)
+    invoice_id = int(callback.data.split("_")[1])
+    
+    # Chỉ đổi khi còn pending: hai admin bấm cùng lúc thì chỉ một người duyệt
+    change = await AsyncInvoiceRepository.set_status(
+        session, invoice_id, 'approved', str(callback.from_user.id), callback.from_user.username
+    )
+    if not change:
+        await callback.answer(await already_processed_text(session, invoice_id), show_alert=True)
         return
     
-    invoice_id = int(callback.data.split("_")[1])
-    user = user_repo.get_by_telegram_id(callback.from_user.id)
+    # Thông báo cho người tạo hóa đơn (outbox, gửi sau khi commit)
+    await notify_user(
+        session, change.created_by_user_id,
+        f"✅ Hóa đơn #{change.invoice_number} của bạn đã được duyệt!\n"
+        f"👤 Người duyệt: @{callback.from_user.username}",
+        kind='invoice_status'
+    )
+    await session.commit()
     
-    # Cập nhật status
-    invoice = invoice_repo.get_by_id(invoice_id)
-    if invoice:
-        invoice_repo.update(invoice_id, {
-            'status': 'approved',
-            'approved_by': str(callback.from_user.id),
-            'approved_by_username': callback.from_user.username,
-            'approved_at': datetime.now()
-        })
-        
-        # Update user stats
-        user_repo.increment_approved_count(callback.from_user.id)
-        
-        await callback.message.edit_text(
-            f"✅ <b>ĐÃ DUYỆT</b>\n\n{callback.message.text}\n\n"
-            f"👤 Người duyệt: @{callback.from_user.username}\n"
-            f"⏰ Thời gian: {datetime.now().strftime('%d/%m/%Y %H:%M')}",
-            parse_mode="HTML"
-        )
-        
-        # Gửi notification cho user tạo hóa đơn
-        try:
-            await callback.bot.send_message(
-                invoice.created_by_user_id,
-                f"✅ Hóa đơn #{invoice.invoice_number} của bạn đã được duyệt!\n"
-                f"👤 Người duyệt: @{callback.from_user.username}"
-            )
-        except:
-            pass
+    # Update user stats (flush theo batch)
+    activity_buffer.add_approved(callback.from_user.id)
     
+    await callback.message.edit_text(
+        f"✅ <b>ĐÃ DUYỆT</b>\n\n{callback.message.text}\n\n"
+        f"👤 Người duyệt: @{callback.from_user.username}\n"
+        f"⏰ Thời gian: {datetime.now().strftime('%d/%m/%Y %H:%M')}",
+        parse_mode="HTML"
+    )
     await callback.answer("✅ Đã duyệt hóa đơn!")
 
 @router.callback_query(F.data.startswith("reject_"))
-async def callback_reject(callback: CallbackQuery, state: FSMContext):
+async def callback_reject(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Từ chối hóa đơn"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("⛔ Bạn không có quyền!", show_alert=True)
-        return
-    
     invoice_id = int(callback.data.split("_")[1])
     
+    invoice = await AsyncInvoiceRepository.get_by_id(session, invoice_id)
+    if not invoice or invoice.status != 'pending':
+        await callback.answer(await already_processed_text(session, invoice_id), show_alert=True)
+        return
+    
     await state.update_data(invoice_id=invoice_id)
     await state.set_state(AdminStates.waiting_for_rejection_reason)
     
@@ -154,68 +166,85 @@ async def callback_reject(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 @router.message(AdminStates.waiting_for_rejection_reason)
-async def process_rejection(message: Message, state: FSMContext):
+async def process_rejection(message: Message, state: FSMContext, session: AsyncSession):
     """Xử lý lý do từ chối"""
     data = await state.get_data()
     invoice_id = data.get('invoice_id')
     reason = message.text
+    await state.clear()
     
-    invoice = invoice_repo.get_by_id(invoice_id)
-    if invoice:
-        invoice_repo.update(invoice_id, {
-            'status': 'rejected',
-            'approved_by': str(message.from_user.id),
-            'approved_by_username': message.from_user.username,
-            'approved_at': datetime.now(),
-            'rejection_reason': reason
-        })
-        
-        await message.answer(
-            f"❌ Đã từ chối hóa đơn #{invoice.invoice_number}\n"
-            f"📝 Lý do: {reason}",
-            parse_mode="HTML"
-        )
-        
-        # Notify user
-        try:
-            await message.bot.send_message(
-                invoice.created_by_user_id,
-                f"❌ Hóa đơn #{invoice.invoice_number} đã bị từ chối\n\n"
-                f"📝 Lý do: {reason}\n"
-                f"👤 Người từ chối: @{message.from_user.username}"
-            )
-        except:
-            pass
+    # Admin khác có thể đã duyệt trong lúc đang nhập lý do
+    change = await AsyncInvoiceRepository.set_status(
+        session, invoice_id, 'rejected', str(message.from_user.id), message.from_user.username, reason
+    )
+    if not change:
+        await message.answer(await already_processed_text(session, invoice_id))
+        return
     
-    await state.clear()
+    await notify_user(
+        session, change.created_by_user_id,
+        f"❌ Hóa đơn #{change.invoice_number} đã bị từ chối\n\n"
+        f"📝 Lý do: {reason}\n"
+        f"👤 Người từ chối: @{message.from_user.username}",
+        kind='invoice_status'
+    )
+    await session.commit()
+    
+    await message.answer(
+        f"❌ Đã từ chối hóa đơn #{change.invoice_number}\n"
+        f"📝 Lý do: {reason}",
+        parse_mode="HTML"
+    )
 
 @router.callback_query(F.data.startswith("view_"))
-async def callback_view_image(callback: CallbackQuery):
+async def callback_view_image(callback: CallbackQuery, session: AsyncSession):
     """Xem ảnh hóa đơn"""
     invoice_id = int(callback.data.split("_")[1])
-    invoice = invoice_repo.get_by_id(invoice_id)
+    invoice = await AsyncInvoiceRepository.get_by_id(session, invoice_id)
     
-    if invoice and invoice.file_path:
-        try:
-            from aiogram.types import FSInputFile
-            photo = FSInputFile(invoice.file_path)
-            await callback.message.answer_photo(
-                photo,
-                caption=f"📄 Hóa đơn #{invoice.invoice_number}"
-            )
-        except Exception as e:
-            await callback.answer(f"❌ Không thể tải ảnh: {e}", show_alert=True)
-    else:
+    if not invoice or not invoice.file_path:
         await callback.answer("❌ Không tìm thấy file ảnh!", show_alert=True)
+        return
+    
+    is_photo = Path(invoice.file_path).suffix.lower() in PHOTO_EXTENSIONS
+    send = callback.message.answer_photo if is_photo else callback.message.answer_document
+    caption = f"📄 Hóa đơn #{invoice.invoice_number}"
+    
+    # Telegram đã có file: gửi bằng file_id, không upload lại
+    if invoice.telegram_file_id:
+        try:
+            await send(invoice.telegram_file_id, caption=caption)
+            await callback.answer()
+            return
+        except TelegramBadRequest as e:
+            logger.info(f"Cached file_id of invoice #{invoice.id} is invalid, re-uploading: {e}")
+    
+    try:
+        local_path = storage.local_path(invoice.file_path)
+        if local_path:
+            input_file = FSInputFile(local_path)
+        else:
+            data = await asyncio.to_thread(storage.read, invoice.file_path)
+            input_file = BufferedInputFile(data, filename=Path(invoice.file_path).name)
+        sent = await send(input_file, caption=caption)
+        await callback.answer()
+    except Exception as e:
+        await callback.answer(f"❌ Không thể tải ảnh: {e}", show_alert=True)
+        return
+    
+    # Lưu file_id của bản vừa upload cho các lần xem sau
+    media = sent.photo[-1] if is_photo else sent.document
+    try:
+        await AsyncInvoiceRepository.set_telegram_file(session, invoice.id, media.file_id, media.file_unique_id)
+        await session.commit()
+    except Exception as e:
+        logger.warning(f"Cannot cache file_id of invoice #{invoice.id}: {e}")
+        await session.rollback()
 
 @router.message(Command("users"))
-async def cmd_users(message: Message):
+async def cmd_users(message: Message, session: AsyncSession):
     """Danh sách users"""
-    if not is_admin(message.from_user.id):
-        await message.answer("⛔ Bạn không có quyền!")
-        return
-    
-    users = user_repo.get_all()
+    users = await AsyncUserRepository.get_all(session)
     
     text = "<b>👥 DANH SÁCH USERS</b>\n\n"
     for user in users[:20]:  # Limit 20
@@ -228,12 +257,8 @@ async def cmd_users(message: Message):
     await message.answer(text, parse_mode="HTML")
 
 @router.message(Command("set_role"))
-async def cmd_set_role(message: Message, state: FSMContext):
+async def cmd_set_role(message: Message, state: FSMContext, session: AsyncSession):
     """Phân quyền user"""
-    if not is_admin(message.from_user.id):
-        await message.answer("⛔ Bạn không có quyền!")
-        return
-    
     # Parse command: /set_role @username role
     parts = message.text.split()
     if len(parts) < 3:
@@ -251,13 +276,15 @@ async def cmd_set_role(message: Message, state: FSMContext):
         return
     
     # Find user
-    user = user_repo.get_by_username(username)
+    user = await AsyncUserRepository.get_by_username(session, username)
     if not user:
         await message.answer(f"❌ Không tìm thấy user @{username}")
         return
     
-    # Update role
-    user_repo.update_role(user.id, new_role)
+    # Update role (commit trước rồi mới xóa cache, tránh update khác load lại role cũ)
+    await AsyncUserRepository.update_role(session, user.id, new_role)
+    await session.commit()
+    permission_cache.invalidate(user.telegram_user_id)
     
     await message.answer(
         f"✅ Đã cập nhật role cho @{username}:\n"
@@ -266,20 +293,16 @@ async def cmd_set_role(message: Message, state: FSMContext):
     )
 
 @router.message(Command("stats_admin"))
-async def cmd_stats_admin(message: Message):
+async def cmd_stats_admin(message: Message, session: AsyncSession):
     """Thống kê chi tiết cho admin"""
-    if not is_admin(message.from_user.id):
-        await message.answer("⛔ Bạn không có quyền!")
-        return
-    
     # Lấy thống kê
-    total_invoices = invoice_repo.count_all()
-    pending = invoice_repo.count_by_status('pending')
-    approved = invoice_repo.count_by_status('approved')
-    rejected = invoice_repo.count_by_status('rejected')
+    total_invoices = await AsyncInvoiceRepository.count_all(session)
+    pending = await AsyncInvoiceRepository.count_by_status(session, 'pending')
+    approved = await AsyncInvoiceRepository.count_by_status(session, 'approved')
+    rejected = await AsyncInvoiceRepository.count_by_status(session, 'rejected')
     
-    total_amount = invoice_repo.get_total_amount()
-    approved_amount = invoice_repo.get_total_amount_by_status('approved')
+    total_amount = await AsyncInvoiceRepository.get_total_amount(session)
+    approved_amount = await AsyncInvoiceRepository.get_total_amount_by_status(session, 'approved')
     
     text = f"""
 📊 <b>THỐNG KÊ TỔNG QUAN</b>
@@ -299,3 +322,13 @@ async def cmd_stats_admin(message: Message):
 """
     
     await message.answer(text, parse_mode="HTML")
+
+@denied_router.message(Command(*ADMIN_COMMANDS))
+async def admin_command_denied(message: Message):
+    """Lệnh admin từ người không có quyền"""
+    await message.answer("⛔ Bạn không có quyền truy cập chức năng này!")
+
+@denied_router.callback_query(F.data.startswith(ADMIN_CALLBACK_PREFIXES))
+async def admin_callback_denied(callback: CallbackQuery):
+    """Nút admin từ người không có quyền"""
+    await callback.answer("⛔ Bạn không có quyền!", show_alert=True)
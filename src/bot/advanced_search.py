@@ -5,13 +5,14 @@ from aiogram.types import Message
 from loguru import logger
 from datetime import datetime, timedelta
 
-from src.database.repository import InvoiceRepository
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.async_repository import AsyncInvoiceRepository
 
 router = Router()
-invoice_repo = InvoiceRepository()
 
 @router.message(Command("search_date"))
-async def cmd_search_date(message: Message):
+async def cmd_search_date(message: Message, session: AsyncSession):
     """
     Tìm kiếm theo khoảng thời gian
     Cú pháp: /search_date DD/MM/YYYY DD/MM/YYYY
@@ -28,7 +29,7 @@ async def cmd_search_date(message: Message):
         start_date = datetime.strptime(parts[1], '%d/%m/%Y')
         end_date = datetime.strptime(parts[2], '%d/%m/%Y')
         
-        invoices = invoice_repo.get_by_date_range(start_date, end_date)
+        invoices = await AsyncInvoiceRepository.get_by_date_range(session, start_date, end_date)
         
         if not invoices:
             await message.answer(f"❌ Không tìm thấy hóa đơn từ {parts[1]} đến {parts[2]}")
@@ -61,7 +62,7 @@ async def cmd_search_date(message: Message):
         await message.answer(f"❌ Lỗi: {e}")
 
 @router.message(Command("search_amount"))
-async def cmd_search_amount(message: Message):
+async def cmd_search_amount(message: Message, session: AsyncSession):
     """
     Tìm kiếm theo khoảng giá
     Cú pháp: /search_amount min max
@@ -78,7 +79,7 @@ async def cmd_search_amount(message: Message):
         min_amount = float(parts[1])
         max_amount = float(parts[2])
         
-        invoices = invoice_repo.get_by_amount_range(min_amount, max_amount)
+        invoices = await AsyncInvoiceRepository.get_by_amount_range(session, min_amount, max_amount)
         
         if not invoices:
             await message.answer(
@@ -113,7 +114,7 @@ async def cmd_search_amount(message: Message):
         await message.answer(f"❌ Lỗi: {e}")
 
 @router.message(Command("search_supplier"))
-async def cmd_search_supplier(message: Message):
+async def cmd_search_supplier(message: Message, session: AsyncSession):
     """
     Tìm kiếm theo nhà cung cấp
     Cú pháp: /search_supplier tên nhà cung cấp
@@ -129,7 +130,7 @@ async def cmd_search_supplier(message: Message):
             )
             return
         
-        invoices = invoice_repo.search(supplier_name)
+        invoices = await AsyncInvoiceRepository.search(session, supplier_name)
         
         # Filter by supplier_name specifically
         invoices = [inv for inv in invoices if supplier_name.lower() in inv.supplier_name.lower()]
@@ -151,7 +152,7 @@ async def cmd_search_supplier(message: Message):
             text += f"\n{status_icon} #{inv.id} - {inv.invoice_date.strftime('%d/%m/%Y')}\n"
             text += f"   🏢 {inv.supplier_name}\n"
             text += f"   💰 {inv.total_amount:,.0f} VNĐ\n"
-            text += f"   📝 {inv.description[:50]}...\n"
+            text += f"   📝 {(inv.description or '')[:50]}...\n"
         
         if len(invoices) > 10:
             text += f"\n<i>... và {len(invoices) - 10} hóa đơn khác</i>"
@@ -163,7 +164,7 @@ async def cmd_search_supplier(message: Message):
         await message.answer(f"❌ Lỗi: {e}")
 
 @router.message(Command("search_category"))
-async def cmd_search_category(message: Message):
+async def cmd_search_category(message: Message, session: AsyncSession):
     """
     Tìm kiếm theo danh mục
     Cú pháp: /search_category tên danh mục
@@ -178,7 +179,7 @@ async def cmd_search_category(message: Message):
             )
             return
         
-        invoices = invoice_repo.get_by_category(category)
+        invoices = await AsyncInvoiceRepository.get_by_category(session, category)
         
         if not invoices:
             await message.answer(f"❌ Không tìm thấy hóa đơn danh mục '{category}'")
@@ -208,7 +209,7 @@ async def cmd_search_category(message: Message):
         await message.answer(f"❌ Lỗi: {e}")
 
 @router.message(Command("search_status"))
-async def cmd_search_status(message: Message):
+async def cmd_search_status(message: Message, session: AsyncSession):
     """
     Tìm kiếm theo trạng thái
     Cú pháp: /search_status pending|approved|rejected
@@ -227,7 +228,7 @@ async def cmd_search_status(message: Message):
             await message.answer("❌ Trạng thái không hợp lệ! (pending/approved/rejected)")
             return
         
-        invoices = invoice_repo.get_by_status(status)
+        invoices = await AsyncInvoiceRepository.get_by_status(session, status)
         
         if not invoices:
             await message.answer(f"❌ Không tìm thấy hóa đơn trạng thái '{status}'")
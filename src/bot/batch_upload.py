@@ -0,0 +1,182 @@
+"""Upload file ZIP nhiều hóa đơn (ảnh / PDF / XML) qua bot"""
+import asyncio
+import zipfile
+from html import escape
+from aiogram.enums import ParseMode
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+import config
+
+from src.database.async_repository import AsyncInvoiceRepository, AsyncImageHashRepository
+from src.database.repository import inserted_invoices
+from src.database.activity import activity_buffer
+from src.database.duplicates import find_duplicates, describe_matches
+from src.bot.downloads import download_to_memory, FileTooLarge
+from src.bot.notifications import notify_admins
+from src.bot.progress import ProgressReporter
+from src.processor.batch import content_hash, extract_member, list_archive_members
+from src.storage import storage
+
+
+async def handle_zip_upload(progress: ProgressReporter, session: AsyncSession):
+    """
+    Xử lý file ZIP: đọc từng file trong bộ nhớ, OCR/trích xuất song song,
+    bỏ file trùng theo content hash và lưu bằng một lần bulk insert
+    """
+    message = progress.message
+    user = message.from_user
+    try:
+        buffer = await download_to_memory(message.bot, message.document.file_id)
+    except FileTooLarge:
+        await progress.finish(f"❌ File quá lớn! Kích thước tối đa: {config.MAX_FILE_SIZE_MB}MB")
+        return
+
+    try:
+        archive = zipfile.ZipFile(buffer)
+        members, skipped = list_archive_members(archive)
+    except zipfile.BadZipFile:
+        await progress.finish("❌ File ZIP bị lỗi hoặc không đúng định dạng.")
+        return
+    except ValueError as e:
+        await progress.finish(f"❌ {e}")
+        return
+
+    if not members:
+        await progress.finish("❌ Không có file ảnh/PDF/XML nào trong ZIP.")
+        return
+
+    await progress.finish(f"📦 Đang xử lý {len(members)} file trong ZIP...")
+    done = 0
+
+    invoices = []
+    failures = []  # (tên file, lý do)
+    duplicate_files = []
+    seen_hashes = set()
+    semaphore = asyncio.Semaphore(config.BATCH_OCR_WORKERS)
+
+    async def update_progress():
+        try:
+            await progress.update(
+                f"📦 Đang xử lý ZIP: {done}/{len(members)} file\n"
+                f"✅ {len(invoices)} | ♻️ {len(duplicate_files)} trùng | ❌ {len(failures)} lỗi"
+            )
+        except Exception as e:
+            logger.debug(f"Progress update skipped: {e}")
+
+    async def process(filename: str, data: bytes, digest: str):
+        nonlocal done
+        try:
+            invoice_data = await extract_member(filename, data)
+            file_key = await asyncio.to_thread(storage.save, data, digest, filename)
+            invoice_data.update({
+                'created_by_user_id': user.id,
+                'created_by_username': user.username,
+                'file_path': file_key,
+                'content_hash': digest,
+            })
+            invoices.append(invoice_data)
+        except ValueError as e:
+            failures.append((filename, str(e)))
+        except Exception as e:
+            logger.error(f"Error processing {filename} from ZIP: {e}")
+            failures.append((filename, "Lỗi xử lý"))
+        finally:
+            semaphore.release()
+            done += 1
+            await update_progress()
+
+    # Mỗi lần chỉ giải nén tối đa BATCH_OCR_WORKERS file vào bộ nhớ
+    tasks = []
+    with archive:
+        for info in members:
+            await semaphore.acquire()
+            try:
+                data = await asyncio.to_thread(archive.read, info)
+            except Exception as e:
+                semaphore.release()
+                done += 1
+                failures.append((info.filename, f"Không giải nén được: {e}"))
+                continue
+
+            digest = content_hash(data)
+            is_duplicate = (digest in seen_hashes
+                            or await AsyncInvoiceRepository.get_existing_content_hashes(session, [digest]))
+            # Không giữ connection/transaction trong lúc các file đang OCR
+            await session.commit()
+            if is_duplicate:
+                semaphore.release()
+                done += 1
+                duplicate_files.append(info.filename)
+                continue
+            seen_hashes.add(digest)
+            tasks.append(asyncio.create_task(process(info.filename, data, digest)))
+
+        await asyncio.gather(*tasks)
+
+    # Đánh dấu hóa đơn nghi trùng (trùng MST + số sẽ bị bulk insert bỏ qua)
+    suspected = []
+    for invoice_data in invoices:
+        matches = [m for m in await find_duplicates(session, invoice_data) if not m.is_blocking]
+        if matches:
+            invoice_data['notes'] = f"Nghi trùng: {describe_matches(matches)}"
+            suspected.append((invoice_data['invoice_number'], matches))
+
+    # File gốc đã được lưu trong lúc OCR; file của hóa đơn không được insert
+    # (trùng số, hoặc lỗi) bị xóa để không còn object không ai trỏ tới
+    try:
+        result = await AsyncInvoiceRepository.bulk_create(session, invoices)
+        await AsyncImageHashRepository.add_many(
+            session, await AsyncInvoiceRepository.get_image_hashes(session, result.created_ids)
+        )
+        await session.commit()
+    except Exception as e:
+        logger.error(f"Error saving ZIP invoices: {e}")
+        await session.rollback()
+        await asyncio.to_thread(storage.delete_many, [invoice['file_path'] for invoice in invoices])
+        await progress.finish("❌ Lỗi khi lưu dữ liệu. Vui lòng thử lại.")
+        return
+
+    inserted = inserted_invoices(invoices, result)
+    inserted_keys = {invoice['file_path'] for invoice in inserted}
+    await asyncio.to_thread(
+        storage.delete_many,
+        [invoice['file_path'] for invoice in invoices if invoice['file_path'] not in inserted_keys]
+    )
+
+    if result.created_ids:
+        activity_buffer.touch(user.id, username=user.username, first_name=user.first_name,
+                              last_name=user.last_name)
+        activity_buffer.add_submitted(user.id, len(result.created_ids))
+
+    total_amount = sum(invoice['total_amount'] for invoice in inserted)
+    text = f"""
+📦 <b>KẾT QUẢ XỬ LÝ ZIP</b>
+
+✅ Đã lưu: <b>{len(result.created_ids)}</b> hóa đơn
+💰 Tổng tiền: {total_amount:,.0f} VNĐ
+♻️ File trùng nội dung: {len(duplicate_files)}
+🔁 Trùng số hóa đơn: {len(result.duplicates)}
+❌ Lỗi: {len(failures)}
+⏭️ Bỏ qua (không hỗ trợ): {len(skipped)}
+⚠️ Nghi trùng (chờ admin kiểm tra): {len(suspected)}
+"""
+    if result.duplicates:
+        text += "\n<b>Số hóa đơn đã tồn tại:</b> " + escape(', '.join(result.duplicates[:10]))
+        if len(result.duplicates) > 10:
+            text += ", ..."
+        text += "\n"
+    if failures:
+        text += "\n<b>File lỗi:</b>\n"
+        for filename, reason in failures[:10]:
+            text += f"• {escape(filename)}: {escape(reason)}\n"
+        if len(failures) > 10:
+            text += f"<i>... và {len(failures) - 10} file khác</i>\n"
+
+    await progress.finish(text, parse_mode=ParseMode.HTML)
+
+    if suspected:
+        lines = [f"• {number}: {describe_matches(matches)}" for number, matches in suspected[:20]]
+        await notify_admins(
+            session,
+            f"⚠️ ZIP của @{user.username or user.id} có {len(suspected)} hóa đơn nghi trùng:\n" + '\n'.join(lines)
+        )
@@ -0,0 +1,194 @@
+"""
+Duyệt / từ chối nhiều hóa đơn cùng lúc
+
+Admin chọn hóa đơn bằng các nút bật/tắt (danh sách đã chọn lưu trong FSM),
+sau đó cả lựa chọn được duyệt bằng một câu UPDATE có điều kiện status,
+counter cộng một lần và mỗi người gửi chỉ nhận một tin nhắn.
+"""
+from datetime import datetime
+from aiogram import Router, F
+from aiogram.filters import Command
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.async_repository import AsyncInvoiceRepository
+from src.database.activity import activity_buffer
+from src.bot.filters import AdminFilter
+from src.bot.notifications import notify_submitters, status_header
+
+router = Router()
+router.message.filter(AdminFilter())
+router.callback_query.filter(AdminFilter())
+
+# Số hóa đơn mỗi trang của bảng chọn
+BULK_PAGE_SIZE = 10
+
+
+class BulkStates(StatesGroup):
+    """States cho duyệt hàng loạt"""
+    waiting_for_rejection_reason = State()
+
+
+async def _selected(state: FSMContext) -> set:
+    data = await state.get_data()
+    return set(data.get('bulk_selected', []))
+
+
+async def render_selector(session: AsyncSession, state: FSMContext):
+    """Nội dung + bàn phím của bảng chọn hóa đơn (trang hiện tại trong FSM)"""
+    data = await state.get_data()
+    selected = set(data.get('bulk_selected', []))
+    page = data.get('bulk_page', 0)
+
+    pending_count = await AsyncInvoiceRepository.count_by_status(session, 'pending')
+    invoices = await AsyncInvoiceRepository.get_by_status(
+        session, 'pending', limit=BULK_PAGE_SIZE, offset=page * BULK_PAGE_SIZE
+    )
+
+    rows = [
+        [InlineKeyboardButton(
+            text=f"{'☑️' if invoice.id in selected else '⬜'} #{invoice.id} {invoice.invoice_number} - "
+                 f"{invoice.total_amount:,.0f}đ",
+            callback_data=f"bulk_toggle_{invoice.id}"
+        )]
+        for invoice in invoices
+    ]
+
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton(text="◀️", callback_data=f"bulk_page_{page - 1}"))
+    navigation.append(InlineKeyboardButton(text="☑️ Chọn cả trang", callback_data="bulk_select_page"))
+    navigation.append(InlineKeyboardButton(text="⬜ Bỏ chọn", callback_data="bulk_clear"))
+    if (page + 1) * BULK_PAGE_SIZE < pending_count:
+        navigation.append(InlineKeyboardButton(text="▶️", callback_data=f"bulk_page_{page + 1}"))
+    rows.append(navigation)
+
+    if selected:
+        rows.append([
+            InlineKeyboardButton(text=f"✅ Duyệt {len(selected)}", callback_data="bulk_approve"),
+            InlineKeyboardButton(text=f"❌ Từ chối {len(selected)}", callback_data="bulk_reject"),
+        ])
+    if pending_count:
+        rows.append([InlineKeyboardButton(text=f"✅ Duyệt tất cả {pending_count} hóa đơn chờ",
+                                          callback_data="bulk_approve_all")])
+
+    text = (
+        f"☑️ <b>DUYỆT NHIỀU HÓA ĐƠN</b>\n\n"
+        f"⏳ Đang chờ duyệt: {pending_count}\n"
+        f"☑️ Đã chọn: {len(selected)}\n"
+        f"📄 Trang {page + 1}/{max(1, -(-pending_count // BULK_PAGE_SIZE))}"
+    )
+    return text, InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+async def apply_status(session: AsyncSession, invoice_ids, new_status: str,
+                       approver, reason: str = None) -> int:
+    """Đổi trạng thái cả lựa chọn, cộng counter và báo người gửi (qua outbox)"""
+    changes = await AsyncInvoiceRepository.bulk_set_status(
+        session, invoice_ids, new_status, str(approver.id), approver.username, reason
+    )
+
+    await notify_submitters(session, changes, status_header(new_status, approver.username, reason))
+    await session.commit()
+
+    if new_status == 'approved' and changes:
+        activity_buffer.add_approved(approver.id, len(changes))
+    return len(changes)
+
+
+@router.message(Command("bulk"))
+async def cmd_bulk(message: Message, session: AsyncSession, state: FSMContext):
+    """Bảng chọn nhiều hóa đơn chờ duyệt"""
+    await state.update_data(bulk_selected=[], bulk_page=0)
+    text, keyboard = await render_selector(session, state)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@router.callback_query(F.data.startswith("bulk_"))
+async def callback_bulk(callback: CallbackQuery, session: AsyncSession, state: FSMContext):
+    """Bật/tắt chọn, chuyển trang và duyệt/từ chối trên bảng chọn"""
+    action = callback.data[len("bulk_"):]
+    selected = await _selected(state)
+
+    if action.startswith("toggle_"):
+        selected ^= {int(action[len("toggle_"):])}
+        await state.update_data(bulk_selected=sorted(selected))
+    elif action.startswith("page_"):
+        await state.update_data(bulk_page=int(action[len("page_"):]))
+    elif action == "select_page":
+        page = (await state.get_data()).get('bulk_page', 0)
+        invoices = await AsyncInvoiceRepository.get_by_status(
+            session, 'pending', limit=BULK_PAGE_SIZE, offset=page * BULK_PAGE_SIZE
+        )
+        await state.update_data(bulk_selected=sorted(selected | {invoice.id for invoice in invoices}))
+    elif action == "clear":
+        await state.update_data(bulk_selected=[])
+    elif action == "approve_all":
+        pending_count = await AsyncInvoiceRepository.count_by_status(session, 'pending')
+        await callback.message.edit_text(
+            f"⚠️ Duyệt <b>tất cả {pending_count}</b> hóa đơn đang chờ?",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+                InlineKeyboardButton(text="✅ Xác nhận", callback_data="bulk_approve_all_confirm"),
+                InlineKeyboardButton(text="↩️ Quay lại", callback_data="bulk_page_0"),
+            ]]),
+            parse_mode="HTML"
+        )
+        await callback.answer()
+        return
+    elif action in ("approve", "approve_all_confirm"):
+        if action == "approve_all_confirm":
+            invoice_ids = await AsyncInvoiceRepository.get_ids_by_status(session, 'pending')
+        else:
+            invoice_ids = sorted(selected)
+        if not invoice_ids:
+            await callback.answer("Chưa chọn hóa đơn nào!", show_alert=True)
+            return
+        try:
+            count = await apply_status(session, invoice_ids, 'approved', callback.from_user)
+        except Exception as e:
+            logger.error(f"Error bulk approving invoices: {e}")
+            await session.rollback()
+            await callback.answer("❌ Lỗi khi duyệt hóa đơn!", show_alert=True)
+            return
+        await state.update_data(bulk_selected=[], bulk_page=0)
+        await callback.message.answer(
+            f"✅ Đã duyệt {count} hóa đơn"
+            + (f" ({len(invoice_ids) - count} hóa đơn đã được xử lý trước đó)" if count < len(invoice_ids) else "")
+            + f"\n⏰ {datetime.now().strftime('%d/%m/%Y %H:%M')}"
+        )
+    elif action == "reject":
+        if not selected:
+            await callback.answer("Chưa chọn hóa đơn nào!", show_alert=True)
+            return
+        await state.set_state(BulkStates.waiting_for_rejection_reason)
+        await callback.message.answer(f"📝 Nhập lý do từ chối {len(selected)} hóa đơn đã chọn:")
+        await callback.answer()
+        return
+
+    text, keyboard = await render_selector(session, state)
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    except Exception as e:
+        logger.debug(f"Bulk selector not updated: {e}")
+    await callback.answer()
+
+
+@router.message(BulkStates.waiting_for_rejection_reason)
+async def process_bulk_rejection(message: Message, session: AsyncSession, state: FSMContext):
+    """Từ chối các hóa đơn đã chọn với cùng một lý do"""
+    invoice_ids = sorted(await _selected(state))
+    await state.set_state(None)
+    await state.update_data(bulk_selected=[], bulk_page=0)
+
+    try:
+        count = await apply_status(session, invoice_ids, 'rejected', message.from_user, message.text)
+    except Exception as e:
+        logger.error(f"Error bulk rejecting invoices: {e}")
+        await session.rollback()
+        await message.answer("❌ Lỗi khi từ chối hóa đơn!")
+        return
+
+    await message.answer(f"❌ Đã từ chối {count} hóa đơn\n📝 Lý do: {message.text}")
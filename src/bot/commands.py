@@ -21,6 +21,7 @@ Bot này giúp bạn tự động xử lý và quản lý hóa đơn, chứng t
 /stats - Xem thống kê tổng hợp
 /excel - Xuất dữ liệu ra Excel
 /word - Xuất báo cáo Word
+/pdf [MM/YYYY] - Báo cáo PDF theo tháng
 /search [từ khóa] - Tìm kiếm hóa đơn
 /recent - Xem 10 hóa đơn gần nhất
 
@@ -59,10 +60,12 @@ async def cmd_help(message: Message):
 <b>📊 XUẤT FILE:</b>
 /excel - Xuất Excel
 /word - Xuất báo cáo Word
+/pdf [MM/YYYY] - Báo cáo PDF theo tháng
 
 <b>🔐 ADMIN (Chỉ Admin/Accountant):</b>
 /admin - Admin panel
 /pending - Xem hóa đơn chờ duyệt
+/bulk - Duyệt/từ chối nhiều hóa đơn
 /users - Quản lý users
 /set_role @username role - Phân quyền
 /stats_admin - Thống kê chi tiết
@@ -77,5 +80,6 @@ async def cmd_help(message: Message):
 • Ảnh rõ ràng, không bị mờ
 • Hỗ trợ tiếng Việt + Anh
 • File tối đa: 20MB
+• Gửi nhiều hóa đơn: nén ảnh/PDF/XML thành 1 file ZIP
 """
     await message.answer(help_text, parse_mode=ParseMode.HTML)
@@ -0,0 +1,44 @@
+"""
+Tải file Telegram thẳng vào bộ nhớ
+
+Ảnh / PDF / ZIP được đọc theo từng chunk vào BytesIO rồi đưa thẳng cho OCR
+(``ocr_processor.process_bytes``) và storage, không ghi file tạm rồi đọc lại.
+Buffer có giới hạn MAX_FILE_SIZE_MB: file lớn hơn (``file_size`` của Telegram
+có thể thiếu hoặc sai) bị dừng ngay khi vượt ngưỡng thay vì tải hết.
+"""
+from io import BytesIO
+
+from aiogram import Bot
+import config
+
+
+class FileTooLarge(Exception):
+    """File tải về vượt quá giới hạn"""
+
+
+class BoundedBuffer(BytesIO):
+    """BytesIO báo lỗi khi ghi quá max_bytes"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__()
+        self.max_bytes = max_bytes
+
+    def write(self, data) -> int:
+        if self.tell() + len(data) > self.max_bytes:
+            raise FileTooLarge(f"File exceeds {self.max_bytes} bytes")
+        return super().write(data)
+
+
+async def download_to_memory(bot: Bot, file_id: str, max_bytes: int = None) -> BytesIO:
+    """
+    Tải file theo file_id vào bộ nhớ
+
+    Returns:
+        BytesIO đã seek về đầu
+
+    Raises:
+        FileTooLarge: file lớn hơn max_bytes (mặc định MAX_FILE_SIZE_MB)
+    """
+    buffer = BoundedBuffer(max_bytes or config.MAX_FILE_SIZE_MB * 1024 * 1024)
+    await bot.download(file_id, destination=buffer)
+    return buffer
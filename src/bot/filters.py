@@ -0,0 +1,21 @@
+"""Filters cho các router của bot"""
+from typing import Union
+
+from aiogram.filters import BaseFilter
+from aiogram.types import Message, CallbackQuery
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.permissions import permission_cache
+
+
+class AdminFilter(BaseFilter):
+    """
+    Chỉ cho admin/accountant đi qua, quyền lấy từ permission_cache
+
+    Cần DbSessionMiddleware (tham số ``session``) để load quyền khi cache miss.
+    Update bị chặn sẽ đi tiếp xuống các router sau (xem admin.denied_router).
+    """
+
+    async def __call__(self, event: Union[Message, CallbackQuery], session: AsyncSession) -> bool:
+        permission = await permission_cache.get_or_load(session, event.from_user.id)
+        return bool(permission and permission.is_admin)
@@ -0,0 +1,85 @@
+"""
+FSM storage cho aiogram, chọn bằng config.FSM_STORAGE
+
+- ``sql`` (mặc định): bảng fsm_states trong database của bot; nhiều instance
+  sau cùng một webhook dùng chung state (vd: đang chờ lý do từ chối)
+- ``redis``: RedisStorage của aiogram (cần package ``redis``), REDIS_URL trỏ
+  tới Redis hoặc server tương thích (Valkey, KeyDB...) chạy local khi test
+- ``memory``: MemoryStorage, chỉ dùng được khi chạy một instance
+"""
+import json
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import delete, select
+from loguru import logger
+import config
+
+from src.database import async_db_manager, AsyncDatabaseManager
+from src.database.dialect import upsert_insert
+from src.database.models import FsmState
+
+
+def _storage_key(key: StorageKey) -> str:
+    return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+
+class SQLStorage(BaseStorage):
+    """FSM storage trên SQLAlchemy (SQLite/PostgreSQL), mỗi thao tác một transaction"""
+
+    def __init__(self, db: AsyncDatabaseManager = async_db_manager):
+        self.db = db
+
+    async def _upsert(self, key: StorageKey, **values):
+        table = FsmState.__table__
+        async with self.db.session() as session:
+            stmt = upsert_insert(session.bind.dialect.name, table).values(key=_storage_key(key), **values)
+            await session.execute(stmt.on_conflict_do_update(index_elements=['key'], set_=values))
+            # State và data đều trống (state.clear()) thì xóa row
+            await session.execute(
+                delete(FsmState)
+                .where(FsmState.key == _storage_key(key), FsmState.state.is_(None),
+                       (FsmState.data.is_(None)) | (FsmState.data == '{}'))
+                .execution_options(synchronize_session=False)
+            )
+
+    async def _get(self, key: StorageKey, column) -> Optional[str]:
+        async with self.db.session() as session:
+            result = await session.execute(select(column).where(FsmState.key == _storage_key(key)))
+            return result.scalar()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        await self._upsert(key, state=value)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._get(key, FsmState.state)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._upsert(key, data=json.dumps(data, ensure_ascii=False))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        data = await self._get(key, FsmState.data)
+        return json.loads(data) if data else {}
+
+    async def close(self) -> None:
+        pass  # Engine do async_db_manager quản lý
+
+
+def create_fsm_storage() -> BaseStorage:
+    """FSM storage theo config.FSM_STORAGE"""
+    if config.FSM_STORAGE == 'sql':
+        return SQLStorage()
+    if config.FSM_STORAGE == 'memory':
+        return MemoryStorage()
+    if config.FSM_STORAGE == 'redis':
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+        except ImportError:
+            raise ValueError("FSM_STORAGE=redis cần package redis: pip install redis")
+        logger.info(f"FSM storage: Redis ({config.REDIS_URL})")
+        return RedisStorage.from_url(config.REDIS_URL, state_ttl=config.FSM_STATE_TTL_SECONDS,
+                                     data_ttl=config.FSM_STATE_TTL_SECONDS)
+    raise ValueError(f"FSM_STORAGE không hợp lệ: {config.FSM_STORAGE}")
@@ -1,82 +1,276 @@
+import asyncio
 import os
+from io import BytesIO
 from aiogram import Router, F
-from aiogram.types import Message, FSInputFile
+from aiogram.types import Message, FSInputFile, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.fsm.context import FSMContext
 from aiogram.enums import ParseMode
 from pathlib import Path
 from datetime import datetime, timedelta
 from loguru import logger
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 import config
 
 from src.ocr import ocr_processor
 from src.processor import data_processor
-from src.database import db_manager
 from src.database.models import Invoice, User
-from src.database.repository import InvoiceRepository, UserRepository
+from src.database.async_repository import AsyncInvoiceRepository, AsyncImageHashRepository
+from src.database.activity import activity_buffer
+from src.database.duplicates import (
+    find_content_duplicate, find_duplicates, find_image_duplicates, find_telegram_file_duplicate,
+    describe_matches
+)
+from src.processor.batch import content_hash
+from src.processor.image_hash import dhash
+from src.bot.batch_upload import handle_zip_upload
+from src.bot.downloads import download_to_memory, FileTooLarge
+from src.bot.ingestion import ingestion_queue, QueueFull
+from src.bot.progress import ProgressReporter
+from src.storage import storage
+from src.database import async_db_manager
+from src.processor.concurrency import run_llm, run_ocr
+from src.bot.notifications import notify_admins
 from src.exporter import ExcelExporter, WordExporter, StatisticsExporter
 
 router = Router()
 
+async def reject_resent_file(progress: ProgressReporter, session: AsyncSession, digest: str = None,
+                             file_unique_id: str = None) -> bool:
+    """Trả lời và trả về True nếu file đã được gửi trước đó (bỏ qua OCR)"""
+    matches = (await find_telegram_file_duplicate(session, file_unique_id)
+               or await find_content_duplicate(session, digest))
+    if matches:
+        await progress.finish(
+            f"♻️ File này đã được gửi trước đó: hóa đơn #{matches[0].invoice_id} "
+            f"({matches[0].invoice_number}). Không lưu lại."
+        )
+        return True
+    return False
+
+async def check_duplicates(progress: ProgressReporter, session: AsyncSession, invoice_data: dict):
+    """
+    Kiểm tra trùng trước khi insert
+    
+    Returns:
+        None nếu hóa đơn chắc chắn đã tồn tại (đã trả lời user),
+        ngược lại là danh sách nghi trùng (ghi vào notes của hóa đơn)
+    """
+    matches = await find_duplicates(session, invoice_data)
+    if any(match.is_blocking for match in matches):
+        await reply_invoice_exists(progress, matches)
+        return None
+    if matches:
+        invoice_data['notes'] = f"Nghi trùng: {describe_matches(matches)}"
+    return matches
+
+async def reply_invoice_exists(progress: ProgressReporter, matches):
+    """Báo user hóa đơn đã tồn tại, không lưu"""
+    detail = f": {describe_matches(matches)}" if matches else "."
+    await progress.finish(f"⚠️ Hóa đơn đã tồn tại{detail}")
+
+async def store_original(session: AsyncSession, invoice, data: bytes, digest: str, filename: str):
+    """
+    Lưu file gốc cho hóa đơn vừa insert (chưa commit) rồi commit
+    
+    File chỉ được lưu khi insert đã thành công; commit lỗi thì xóa file vừa
+    lưu để không còn object không có hóa đơn nào trỏ tới.
+    """
+    key = await asyncio.to_thread(storage.save, data, digest, filename)
+    invoice.file_path = key
+    try:
+        await session.commit()
+    except Exception:
+        await asyncio.to_thread(storage.delete_many, [key])
+        raise
+
+async def create_invoice(progress: ProgressReporter, session: AsyncSession, invoice_data: dict):
+    """
+    Insert hóa đơn sau check_duplicates
+    
+    Hai upload cùng MST + số hóa đơn có thể cùng qua bước kiểm tra; insert
+    sau vi phạm uq_invoices_supplier_number và được trả lời như hóa đơn đã
+    tồn tại.
+    
+    Returns:
+        Invoice, hoặc None nếu hóa đơn đã tồn tại (đã rollback và trả lời user)
+    """
+    try:
+        return await AsyncInvoiceRepository.create(session, invoice_data)
+    except IntegrityError as e:
+        logger.info(f"Invoice {invoice_data.get('invoice_number')} inserted concurrently: {e.orig}")
+        await session.rollback()
+        matches = [match for match in await find_duplicates(session, invoice_data) if match.is_blocking]
+        await reply_invoice_exists(progress, matches)
+        return None
+
+def duplicate_warning(matches) -> str:
+    """Dòng cảnh báo nghi trùng thêm vào tin nhắn kết quả"""
+    if not matches:
+        return ""
+    return f"\n⚠️ Hóa đơn có thể bị trùng, admin sẽ kiểm tra: {describe_matches(matches)}\n"
+
+async def flag_duplicates(session: AsyncSession, user, invoice, matches):
+    """Báo admin hóa đơn vừa lưu có thể trùng"""
+    if not matches:
+        return
+    await notify_admins(
+        session,
+        f"⚠️ Hóa đơn #{invoice.id} ({invoice.invoice_number}) của "
+        f"@{user.username or user.id} có thể trùng:\n"
+        f"{describe_matches(matches)}"
+    )
+
+async def enqueue_upload(progress: ProgressReporter, user_id: int, job) -> bool:
+    """
+    Đưa việc xử lý upload vào hàng đợi chia lượt giữa các user
+
+    Returns:
+        False nếu user đã có quá nhiều file đang chờ (đã trả lời user)
+    """
+    try:
+        position = await ingestion_queue.submit(user_id, job)
+    except QueueFull:
+        await progress.finish(
+            f"⏳ Bạn đang có {config.INGEST_MAX_PENDING_PER_USER} file chờ xử lý. "
+            f"Vui lòng gửi tiếp sau khi các file trước xử lý xong."
+        )
+        return False
+    if position:
+        await progress.finish(f"⏳ Đã xếp hàng, vị trí {position}. Bot sẽ xử lý ngay khi tới lượt.")
+    return True
+
 @router.message(F.photo)
-async def handle_photo(message: Message):
+async def handle_photo(message: Message, session: AsyncSession, state: FSMContext):
     """Xử lý ảnh được gửi đến bot"""
+    progress = ProgressReporter(message)
     try:
-        await message.answer("📸 Đang xử lý ảnh của bạn, vui lòng đợi...")
-        
         # Get the largest photo
         photo = message.photo[-1]
         
         # Check file size
         file_size_mb = photo.file_size / (1024 * 1024)
         if file_size_mb > config.MAX_FILE_SIZE_MB:
-            await message.answer(f"❌ File quá lớn! Kích thước tối đa: {config.MAX_FILE_SIZE_MB}MB")
+            await progress.finish(f"❌ File quá lớn! Kích thước tối đa: {config.MAX_FILE_SIZE_MB}MB")
             return
         
-        # Download photo
-        file = await message.bot.get_file(photo.file_id)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        file_path = config.DATA_DIR / f'invoice_{message.from_user.id}_{timestamp}.jpg'
-        
-        await message.bot.download_file(file.file_path, file_path)
-        logger.info(f"Downloaded photo to {file_path}")
+        # Cùng ảnh Telegram đã gửi: không cần tải về
+        if await reject_resent_file(progress, session, file_unique_id=photo.file_unique_id):
+            return
         
-        # Process with OCR
-        await message.answer("🔍 Đang đọc văn bản từ ảnh...")
-        ocr_text = ocr_processor.process_file(str(file_path))
+        await enqueue_upload(progress, message.from_user.id, lambda: ingest_photo(progress, state, photo))
+            
+    except Exception as e:
+        logger.error(f"Error handling photo: {e}")
+        await progress.finish("❌ Có lỗi xảy ra khi xử lý ảnh. Vui lòng thử lại.")
+
+async def ingest_photo(progress: ProgressReporter, state: FSMContext, photo):
+    """Tải ảnh và xử lý (chạy trong hàng đợi, session riêng)"""
+    message = progress.message
+    try:
+        async with async_db_manager.session() as session:
+            await progress.update("📸 Đang xử lý ảnh của bạn, vui lòng đợi...")
+            
+            # Tải ảnh vào bộ nhớ, OCR và storage đọc thẳng từ bytes
+            data = (await download_to_memory(message.bot, photo.file_id)).getvalue()
+            filename = f'{photo.file_unique_id}.jpg'
+            logger.info(f"Downloaded photo {filename} ({len(data)} bytes)")
+            
+            digest = content_hash(data)
+            if await reject_resent_file(progress, session, digest=digest):
+                return
+            
+            # Ảnh gần giống hóa đơn đã có: hỏi trước khi tốn OCR + AI
+            image_hash = await asyncio.to_thread(dhash, BytesIO(data))
+            similar = await find_image_duplicates(session, image_hash, limit=3)
+            if similar:
+                # FSM state không chứa được ảnh: giữ trong file tạm tới khi user chọn
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                file_path = config.TEMP_DIR / f'upload_{message.from_user.id}_{timestamp}_{filename}'
+                await asyncio.to_thread(file_path.write_bytes, data)
+                await state.update_data(pending_photo={
+                    'file_path': str(file_path),
+                    'content_hash': digest,
+                    'image_hash': image_hash,
+                    'telegram_file_id': photo.file_id,
+                    'telegram_file_unique_id': photo.file_unique_id,
+                })
+                buttons = [
+                    [InlineKeyboardButton(text=f"♻️ Dùng hóa đơn #{m.invoice_id} ({m.invoice_number})",
+                                          callback_data=f"photo_reuse_{m.invoice_id}")]
+                    for m in similar
+                ]
+                buttons.append([InlineKeyboardButton(text="🔄 Xử lý như hóa đơn mới",
+                                                     callback_data="photo_reprocess")])
+                await progress.finish(
+                    "🔎 Ảnh này rất giống hóa đơn đã lưu. Dùng lại dữ liệu đã có hay xử lý lại?",
+                    reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons)
+                )
+                return
+            
+            await process_photo(progress, session, message.from_user, data, filename, digest, image_hash,
+                                photo.file_id, photo.file_unique_id)
+            
+    except FileTooLarge:
+        await progress.finish(f"❌ File quá lớn! Kích thước tối đa: {config.MAX_FILE_SIZE_MB}MB")
+    except Exception as e:
+        logger.error(f"Error handling photo: {e}")
+        await progress.finish("❌ Có lỗi xảy ra khi xử lý ảnh. Vui lòng thử lại.")
+
+async def process_photo(progress: ProgressReporter, session: AsyncSession, user, data: bytes, filename: str,
+                        digest: str, image_hash: str, file_id: str = None, file_unique_id: str = None):
+    """OCR + trích xuất + lưu hóa đơn từ ảnh đã tải về"""
+    # Trả connection về pool trước OCR + AI (có thể mất hàng chục giây)
+    await session.commit()
+    
+    # Process with OCR
+    await progress.update("🔍 Đang đọc văn bản từ ảnh...")
+    ocr_text = await run_ocr(ocr_processor.process_bytes, data, filename)
+    
+    if not ocr_text:
+        await progress.finish("❌ Không thể đọc được văn bản từ ảnh. Vui lòng thử lại với ảnh rõ hơn.")
+        return
+    
+    # Extract structured data
+    await progress.update("🤖 Đang phân tích thông tin hóa đơn...")
+    invoice_data = await run_llm(data_processor.extract_invoice_data, ocr_text)
+    
+    if not invoice_data:
+        await progress.finish("❌ Không thể trích xuất thông tin hóa đơn. Vui lòng kiểm tra lại ảnh.")
+        return
+    
+    # Save to database
+    try:
+        # Add invoice data
+        invoice_data['created_by_user_id'] = user.id
+        invoice_data['created_by_username'] = user.username
+        invoice_data['raw_ocr_text'] = ocr_text
+        invoice_data['content_hash'] = digest
+        invoice_data['image_hash'] = image_hash
+        invoice_data['telegram_file_id'] = file_id
+        invoice_data['telegram_file_unique_id'] = file_unique_id
         
-        if not ocr_text:
-            await message.answer("❌ Không thể đọc được văn bản từ ảnh. Vui lòng thử lại với ảnh rõ hơn.")
+        matches = await check_duplicates(progress, session, invoice_data)
+        if matches is None:
             return
         
-        # Extract structured data
-        await message.answer("🤖 Đang phân tích thông tin hóa đơn...")
-        invoice_data = data_processor.extract_invoice_data(ocr_text)
-        
-        if not invoice_data:
-            await message.answer("❌ Không thể trích xuất thông tin hóa đơn. Vui lòng kiểm tra lại ảnh.")
+        invoice = await create_invoice(progress, session, invoice_data)
+        if invoice is None:
             return
+        await AsyncImageHashRepository.add(session, invoice.id, image_hash)
+        await store_original(session, invoice, data, digest, filename)
         
-        # Save to database
-        session = db_manager.get_session()
-        try:
-            # Create or update user
-            user = UserRepository.create_or_update(
-                session,
-                telegram_user_id=message.from_user.id,
-                username=message.from_user.username,
-                first_name=message.from_user.first_name,
-                last_name=message.from_user.last_name
-            )
-            
-            # Add invoice data
-            invoice_data['created_by_user_id'] = message.from_user.id
-            invoice_data['created_by_username'] = message.from_user.username
-            invoice_data['file_path'] = str(file_path)
-            invoice_data['raw_ocr_text'] = ocr_text
-            
-            invoice = InvoiceRepository.create(session, invoice_data)
-            
-            # Send confirmation
-            result_text = f"""
+        # User/counter được ghi theo batch bởi activity buffer
+        activity_buffer.touch(
+            user.id,
+            username=user.username,
+            first_name=user.first_name,
+            last_name=user.last_name
+        )
+        activity_buffer.add_submitted(user.id)
+        
+        # Send confirmation
+        result_text = f"""
 ✅ <b>Đã lưu hóa đơn thành công!</b>
 
 <b>Thông tin:</b>
@@ -88,78 +282,180 @@ async def handle_photo(message: Message):
 📊 Tài khoản: {invoice.account_code}
 📂 Danh mục: {invoice.category}
 
+{duplicate_warning(matches)}
 <i>Sử dụng /search {invoice.invoice_number} để xem chi tiết</i>
 """
-            await message.answer(result_text, parse_mode=ParseMode.HTML)
-            
+        await progress.finish(result_text, parse_mode=ParseMode.HTML)
+        await flag_duplicates(session, user, invoice, matches)
+        
+    except Exception as e:
+        logger.error(f"Error saving invoice: {e}")
+        await session.rollback()
+        await progress.finish("❌ Lỗi khi lưu dữ liệu. Vui lòng thử lại.")
+
+@router.callback_query(F.data.startswith("photo_reuse_"))
+async def callback_photo_reuse(callback: CallbackQuery, session: AsyncSession, state: FSMContext):
+    """Dùng lại dữ liệu của hóa đơn có ảnh gần giống, không OCR lại"""
+    data = await state.get_data()
+    pending = data.pop('pending_photo', None)
+    await state.set_data(data)
+    
+    invoice = await AsyncInvoiceRepository.get_by_id(session, int(callback.data.rsplit("_", 1)[1]))
+    if not pending or not invoice:
+        await callback.answer("❌ Yêu cầu đã hết hạn, vui lòng gửi lại ảnh.", show_alert=True)
+        return
+    
+    # Ảnh mới là bản chụp lại của hóa đơn đã có nên không cần giữ
+    Path(pending['file_path']).unlink(missing_ok=True)
+    
+    await callback.message.edit_text(
+        f"""
+♻️ <b>Đã dùng lại hóa đơn #{invoice.id}</b>
+
+📄 Số HĐ: {invoice.invoice_number}
+📅 Ngày: {invoice.invoice_date.strftime('%d/%m/%Y')}
+🏢 NCC: {invoice.supplier_name}
+💰 Tổng tiền: {invoice.total_amount:,.0f} VNĐ
+📌 Trạng thái: {invoice.status}
+""",
+        parse_mode=ParseMode.HTML
+    )
+    await callback.answer()
+
+@router.callback_query(F.data == "photo_reprocess")
+async def callback_photo_reprocess(callback: CallbackQuery, session: AsyncSession, state: FSMContext):
+    """Xử lý ảnh gần giống như một hóa đơn mới"""
+    data = await state.get_data()
+    pending = data.pop('pending_photo', None)
+    await state.set_data(data)
+    
+    if not pending or not Path(pending['file_path']).exists():
+        await callback.answer("❌ Yêu cầu đã hết hạn, vui lòng gửi lại ảnh.", show_alert=True)
+        return
+    
+    # Sửa tiếp tin nhắn có nút bấm thay vì gửi tin mới
+    progress = ProgressReporter(callback.message, sent=callback.message)
+    await progress.finish("🔄 Đang xử lý như hóa đơn mới...")
+    await callback.answer()
+    
+    async def reprocess():
+        file_path = Path(pending['file_path'])
+        try:
+            data = await asyncio.to_thread(file_path.read_bytes)
+            async with async_db_manager.session() as job_session:
+                await process_photo(
+                    progress, job_session, callback.from_user, data, file_path.name,
+                    pending['content_hash'], pending['image_hash'],
+                    pending.get('telegram_file_id'), pending.get('telegram_file_unique_id')
+                )
         except Exception as e:
-            logger.error(f"Error saving invoice: {e}")
-            await message.answer("❌ Lỗi khi lưu dữ liệu. Vui lòng thử lại.")
+            logger.error(f"Error reprocessing photo: {e}")
+            await progress.finish("❌ Có lỗi xảy ra khi xử lý ảnh. Vui lòng thử lại.")
         finally:
-            session.close()
-            
-    except Exception as e:
-        logger.error(f"Error handling photo: {e}")
-        await message.answer("❌ Có lỗi xảy ra khi xử lý ảnh. Vui lòng thử lại.")
+            file_path.unlink(missing_ok=True)
+    
+    # callback.message là tin của bot, from_user của nó không phải người gửi ảnh
+    if not await enqueue_upload(progress, callback.from_user.id, reprocess):
+        Path(pending['file_path']).unlink(missing_ok=True)
 
 @router.message(F.document)
-async def handle_document(message: Message):
-    """Xử lý file document (PDF)"""
+async def handle_document(message: Message, session: AsyncSession):
+    """Xử lý file document (PDF hoặc ZIP nhiều hóa đơn)"""
+    progress = ProgressReporter(message)
     try:
         document = message.document
+        file_name = (document.file_name or '').lower()
         
-        # Check if PDF
-        if not document.file_name.lower().endswith('.pdf'):
-            await message.answer("❌ Chỉ hỗ trợ file PDF. Vui lòng gửi file đúng định dạng.")
+        # Check if PDF/ZIP
+        if not file_name.endswith(('.pdf', '.zip')):
+            await progress.finish("❌ Chỉ hỗ trợ file PDF hoặc ZIP. Vui lòng gửi file đúng định dạng.")
             return
         
-        await message.answer("📄 Đang xử lý file PDF của bạn...")
-        
         # Check file size
         file_size_mb = document.file_size / (1024 * 1024)
         if file_size_mb > config.MAX_FILE_SIZE_MB:
-            await message.answer(f"❌ File quá lớn! Kích thước tối đa: {config.MAX_FILE_SIZE_MB}MB")
+            await progress.finish(f"❌ File quá lớn! Kích thước tối đa: {config.MAX_FILE_SIZE_MB}MB")
             return
         
-        # Download PDF
-        file = await message.bot.get_file(document.file_id)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        file_path = config.DATA_DIR / f'invoice_{message.from_user.id}_{timestamp}.pdf'
-        
-        await message.bot.download_file(file.file_path, file_path)
-        logger.info(f"Downloaded PDF to {file_path}")
-        
-        # Process similar to photo
-        await message.answer("🔍 Đang đọc văn bản từ PDF...")
-        ocr_text = ocr_processor.process_file(str(file_path))
-        
-        if not ocr_text:
-            await message.answer("❌ Không thể đọc được văn bản từ PDF.")
+        if file_name.endswith('.zip'):
+            await enqueue_upload(progress, message.from_user.id, lambda: ingest_zip(progress))
             return
         
-        await message.answer("🤖 Đang phân tích thông tin hóa đơn...")
-        invoice_data = data_processor.extract_invoice_data(ocr_text)
-        
-        if not invoice_data:
-            await message.answer("❌ Không thể trích xuất thông tin hóa đơn.")
+        if await reject_resent_file(progress, session, file_unique_id=document.file_unique_id):
             return
         
-        # Save to database (similar to photo handler)
-        session = db_manager.get_session()
-        try:
-            user = UserRepository.create_or_update(
-                session,
-                telegram_user_id=message.from_user.id,
-                username=message.from_user.username,
-                first_name=message.from_user.first_name
-            )
+        await enqueue_upload(progress, message.from_user.id, lambda: ingest_pdf(progress))
             
+    except Exception as e:
+        logger.error(f"Error handling document: {e}")
+        await progress.finish("❌ Có lỗi xảy ra khi xử lý file PDF.")
+
+async def ingest_zip(progress: ProgressReporter):
+    """Xử lý ZIP (chạy trong hàng đợi, session riêng)"""
+    try:
+        async with async_db_manager.session() as session:
+            await handle_zip_upload(progress, session)
+    except Exception as e:
+        logger.error(f"Error handling ZIP: {e}")
+        await progress.finish("❌ Có lỗi xảy ra khi xử lý file ZIP.")
+
+async def ingest_pdf(progress: ProgressReporter):
+    """Tải PDF, OCR + trích xuất và lưu (chạy trong hàng đợi, session riêng)"""
+    message = progress.message
+    document = message.document
+    try:
+        async with async_db_manager.session() as session:
+            await progress.update("📄 Đang xử lý file PDF của bạn...")
+            
+            # Tải PDF vào bộ nhớ, OCR và storage đọc thẳng từ bytes
+            data = (await download_to_memory(message.bot, document.file_id)).getvalue()
+            filename = f'{document.file_unique_id}.pdf'
+            logger.info(f"Downloaded PDF {filename} ({len(data)} bytes)")
+            
+            digest = content_hash(data)
+            if await reject_resent_file(progress, session, digest=digest):
+                return
+            # Trả connection về pool trước OCR + AI
+            await session.commit()
+            
+            # Process similar to photo
+            await progress.update("🔍 Đang đọc văn bản từ PDF...")
+            ocr_text = await run_ocr(ocr_processor.process_bytes, data, filename)
+            
+            if not ocr_text:
+                await progress.finish("❌ Không thể đọc được văn bản từ PDF.")
+                return
+            
+            await progress.update("🤖 Đang phân tích thông tin hóa đơn...")
+            invoice_data = await run_llm(data_processor.extract_invoice_data, ocr_text)
+            
+            if not invoice_data:
+                await progress.finish("❌ Không thể trích xuất thông tin hóa đơn.")
+                return
+            
+            # Save to database (similar to photo handler)
             invoice_data['created_by_user_id'] = message.from_user.id
             invoice_data['created_by_username'] = message.from_user.username
-            invoice_data['file_path'] = str(file_path)
             invoice_data['raw_ocr_text'] = ocr_text
+            invoice_data['content_hash'] = digest
+            invoice_data['telegram_file_id'] = document.file_id
+            invoice_data['telegram_file_unique_id'] = document.file_unique_id
+            
+            matches = await check_duplicates(progress, session, invoice_data)
+            if matches is None:
+                return
             
-            invoice = InvoiceRepository.create(session, invoice_data)
+            invoice = await create_invoice(progress, session, invoice_data)
+            if invoice is None:
+                return
+            await store_original(session, invoice, data, digest, filename)
+            
+            activity_buffer.touch(
+                message.from_user.id,
+                username=message.from_user.username,
+                first_name=message.from_user.first_name
+            )
+            activity_buffer.add_submitted(message.from_user.id)
             
             result_text = f"""
 ✅ <b>Đã lưu hóa đơn từ PDF thành công!</b>
@@ -169,12 +465,12 @@ async def handle_document(message: Message):
 📅 Ngày: {invoice.invoice_date.strftime('%d/%m/%Y')}
 🏢 NCC: {invoice.supplier_name}
 💰 Tổng tiền: {invoice.total_amount:,.0f} VNĐ
-"""
-            await message.answer(result_text, parse_mode=ParseMode.HTML)
-            
-        finally:
-            session.close()
+{duplicate_warning(matches)}"""
+            await progress.finish(result_text, parse_mode=ParseMode.HTML)
+            await flag_duplicates(session, message.from_user, invoice, matches)
             
+    except FileTooLarge:
+        await progress.finish(f"❌ File quá lớn! Kích thước tối đa: {config.MAX_FILE_SIZE_MB}MB")
     except Exception as e:
         logger.error(f"Error handling document: {e}")
-        await message.answer("❌ Có lỗi xảy ra khi xử lý file PDF.")
+        await progress.finish("❌ Có lỗi xảy ra khi xử lý file PDF.")
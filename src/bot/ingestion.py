@@ -0,0 +1,125 @@
+"""
+Hàng đợi xử lý upload (ảnh, PDF, ZIP) chia lượt đều giữa các user
+
+Handler chỉ kiểm tra nhanh rồi đưa việc xử lý (tải file, OCR, AI, lưu) vào
+hàng đợi và trả lời ngay; INGEST_WORKERS worker lấy việc theo vòng tròn giữa
+các user: mỗi user có một hàng riêng, worker lấy việc đầu hàng của user kế
+tiếp. Một người gửi 200 ảnh chỉ chiếm một lượt mỗi vòng, người gửi một ảnh
+được xử lý sau tối đa một vòng.
+
+Việc trong hàng đợi nằm trong bộ nhớ: khi tắt bot, main.py chờ xử lý hết
+(tối đa INGEST_DRAIN_TIMEOUT_SECONDS).
+"""
+import asyncio
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List
+
+from loguru import logger
+import config
+
+Job = Callable[[], Awaitable[None]]
+
+
+class QueueFull(Exception):
+    """User đã có quá nhiều việc đang chờ"""
+
+
+class IngestionQueue:
+    """Hàng đợi fair-share theo user với số worker cố định"""
+
+    def __init__(self, workers: int = None, max_pending_per_user: int = None):
+        self.worker_count = workers or config.INGEST_WORKERS
+        self.max_pending_per_user = max_pending_per_user or config.INGEST_MAX_PENDING_PER_USER
+        # Thứ tự key = thứ tự lượt; user vừa được lấy việc chuyển xuống cuối
+        self._queues: Dict[int, Deque[Job]] = OrderedDict()
+        self._busy = 0
+        self._idle = asyncio.Condition()
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _jobs_ahead(self, user_id: int) -> int:
+        """Số việc được lấy trước việc cuối hàng của user (theo vòng tròn)"""
+        own = self._queues[user_id]
+        index = len(own) - 1
+        ahead = index
+        before = True
+        for other_id, queue in self._queues.items():
+            if other_id == user_id:
+                before = False
+                continue
+            # User đứng trước trong vòng được lấy index + 1 việc, đứng sau được index việc
+            ahead += min(len(queue), index + 1 if before else index)
+        return ahead
+
+    async def submit(self, user_id: int, job: Job) -> int:
+        """
+        Thêm việc của user vào hàng đợi
+
+        Returns:
+            Vị trí chờ (1 = việc kế tiếp), 0 nếu có worker rảnh xử lý ngay
+
+        Raises:
+            QueueFull: user đã có max_pending_per_user việc đang chờ
+        """
+        async with self._idle:
+            queue = self._queues.get(user_id)
+            if queue is None:
+                queue = self._queues[user_id] = deque()
+            if len(queue) >= self.max_pending_per_user:
+                raise QueueFull(f"User {user_id} has {len(queue)} pending uploads")
+            queue.append(job)
+            ahead = self._jobs_ahead(user_id)
+            self._idle.notify()
+
+        free = self.worker_count - self._busy
+        return 0 if ahead < free else ahead - free + 1
+
+    async def _next(self) -> Job:
+        async with self._idle:
+            await self._idle.wait_for(lambda: self._queues)
+            user_id, queue = next(iter(self._queues.items()))
+            job = queue.popleft()
+            del self._queues[user_id]
+            if queue:
+                self._queues[user_id] = queue
+            self._busy += 1
+            return job
+
+    async def _worker(self):
+        while True:
+            job = await self._next()
+            try:
+                await job()
+            except Exception as e:
+                logger.error(f"Ingestion job failed: {e}")
+            finally:
+                self._busy -= 1
+
+    def start(self):
+        """Chạy các worker (trong event loop của bot)"""
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"ingestion-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+
+    async def drain(self, timeout: float = None):
+        """Chờ xử lý hết việc đã nhận rồi dừng worker"""
+        if timeout is None:
+            timeout = config.INGEST_DRAIN_TIMEOUT_SECONDS
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (self._queues or self._busy) and loop.time() < deadline:
+            await asyncio.sleep(0.1)
+        if self._queues or self._busy:
+            logger.warning(f"Ingestion drain timed out: {self.pending} queued, {self._busy} running")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+# Global instance
+ingestion_queue = IngestionQueue()
@@ -0,0 +1,113 @@
+"""Middlewares cho Dispatcher"""
+from typing import Any, Awaitable, Callable, Dict, Set, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from loguru import logger
+import config
+
+from src.database import async_db_manager, AsyncDatabaseManager
+from src.bot.rate_limit import TokenBucket
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Một AsyncSession (unit-of-work) cho mỗi update
+
+    Session được inject vào handler qua tham số ``session``; commit khi
+    handler chạy xong, rollback nếu có exception. Connection chỉ được lấy
+    từ pool khi có query đầu tiên.
+    """
+
+    def __init__(self, db: AsyncDatabaseManager = async_db_manager):
+        self.db = db
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        async with self.db.session() as session:
+            data['session'] = session
+            return await handler(event, data)
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Token bucket cho tin nhắn / nút bấm, theo user và theo chat
+
+    Update vượt giới hạn bị bỏ qua, user chỉ nhận một lời nhắc cho mỗi lần
+    bị chặn liên tiếp (nhắc nhiều cũng tốn API call). Ảnh / file không bị
+    chặn: chúng vào hàng đợi xử lý chia lượt giữa các user (src/bot/ingestion.py).
+    """
+
+    # Dọn bucket đã đầy (user không hoạt động) sau mỗi chừng này update
+    PRUNE_EVERY = 1000
+
+    def __init__(self, user_rate: float = None, user_burst: float = None,
+                 chat_rate: float = None, chat_burst: float = None):
+        self.user_limit = (user_rate or config.THROTTLE_USER_RATE, user_burst or config.THROTTLE_USER_BURST)
+        self.chat_limit = (chat_rate or config.THROTTLE_CHAT_RATE, chat_burst or config.THROTTLE_CHAT_BURST)
+        self._buckets: Dict[Tuple[str, int], TokenBucket] = {}
+        self._warned: Set[Tuple[str, int]] = set()
+        self._seen = 0
+
+    def _bucket(self, kind: str, key: int) -> TokenBucket:
+        bucket = self._buckets.get((kind, key))
+        if bucket is None:
+            rate, burst = self.user_limit if kind == 'user' else self.chat_limit
+            bucket = self._buckets[(kind, key)] = TokenBucket(rate, burst)
+        return bucket
+
+    def _prune(self):
+        idle = [key for key, bucket in self._buckets.items() if bucket.delay(bucket.capacity) == 0]
+        for key in idle:
+            del self._buckets[key]
+            self._warned.discard(key)
+
+    def _allow(self, user_id: int, chat_id: int) -> Tuple[bool, Tuple[str, int]]:
+        keys = [('user', user_id)]
+        if chat_id is not None and chat_id != user_id:
+            keys.append(('chat', chat_id))
+        # Kiểm tra hết trước rồi mới lấy token, update bị chặn không tốn token
+        for key in keys:
+            if self._bucket(*key).delay() > 0:
+                return False, key
+        for key in keys:
+            self._bucket(*key).try_acquire()
+            self._warned.discard(key)
+        return True, keys[0]
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if isinstance(event, Message) and (event.photo or event.document):
+            return await handler(event, data)
+
+        user = data.get('event_from_user')
+        if user is None:
+            return await handler(event, data)
+        chat = data.get('event_chat')
+
+        self._seen += 1
+        if self._seen % self.PRUNE_EVERY == 0:
+            self._prune()
+
+        allowed, key = self._allow(user.id, chat.id if chat else None)
+        if allowed:
+            return await handler(event, data)
+
+        logger.debug(f"Throttled update from user {user.id} ({key[0]} limit)")
+        if key not in self._warned:
+            self._warned.add(key)
+            if isinstance(event, CallbackQuery):
+                await event.answer("⏳ Bạn thao tác quá nhanh, vui lòng chờ một chút.")
+            elif isinstance(event, Message):
+                await event.answer("⏳ Bạn gửi quá nhanh, vui lòng chờ vài giây rồi thử lại.")
+        elif isinstance(event, CallbackQuery):
+            await event.answer()  # Tắt vòng quay loading trên nút
+        return None
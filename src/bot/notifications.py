@@ -0,0 +1,81 @@
+"""
+Thông báo cho admin/accountant và người gửi hóa đơn
+
+Các hàm chỉ ghi tin nhắn vào outbox trong session hiện tại (cùng transaction
+với thay đổi dữ liệu), NotificationWorker (src/bot/outbox.py) gửi sau theo
+rate limit của Telegram. Người duyệt không phải chờ gửi tin.
+"""
+from collections import defaultdict
+from typing import Iterable, List, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.database.async_repository import AsyncUserRepository, AsyncNotificationRepository
+from src.database.repository import NotificationRepository, StatusChange
+
+# Số hóa đơn liệt kê tối đa trong một tin nhắn gộp
+MAX_LISTED_INVOICES = 30
+
+
+async def notify_user(session: AsyncSession, chat_id: int, text: str, kind: str = 'message'):
+    """Gửi tin nhắn cho một người (qua outbox)"""
+    await AsyncNotificationRepository.enqueue(session, chat_id, text, kind)
+
+
+async def notify_admins(session: AsyncSession, text: str) -> int:
+    """
+    Gửi tin nhắn tới tất cả admin/accountant (qua outbox)
+
+    Returns:
+        Số admin sẽ nhận tin nhắn
+    """
+    admin_ids = await AsyncUserRepository.get_admin_ids(session)
+    return await AsyncNotificationRepository.enqueue_many(
+        session, [(admin_id, text) for admin_id in admin_ids], kind='admin_alert'
+    )
+
+
+def status_header(new_status: str, username: str, reason: str = None) -> str:
+    """Dòng đầu tin nhắn báo người gửi hóa đơn được duyệt / bị từ chối"""
+    if new_status == 'approved':
+        return f"✅ Hóa đơn của bạn đã được duyệt!\n👤 Người duyệt: @{username}"
+    return (f"❌ Hóa đơn của bạn đã bị từ chối\n📝 Lý do: {reason}\n"
+            f"👤 Người từ chối: @{username}")
+
+
+def submitter_messages(changes: Iterable[StatusChange], header: str) -> List[Tuple[int, str]]:
+    """
+    Một tin nhắn cho mỗi người gửi, liệt kê các hóa đơn của họ vừa đổi
+    trạng thái (duyệt 500 hóa đơn của 5 người = 5 tin nhắn)
+    """
+    numbers_by_user = defaultdict(list)
+    for change in changes:
+        numbers_by_user[change.created_by_user_id].append(change.invoice_number)
+
+    messages = []
+    for user_id, numbers in numbers_by_user.items():
+        listed = ', '.join(f"#{number}" for number in numbers[:MAX_LISTED_INVOICES])
+        if len(numbers) > MAX_LISTED_INVOICES:
+            listed += f" và {len(numbers) - MAX_LISTED_INVOICES} hóa đơn khác"
+        messages.append((user_id, f"{header}\n\n📄 {len(numbers)} hóa đơn: {listed}"))
+    return messages
+
+
+async def notify_submitters(session: AsyncSession, changes: Iterable[StatusChange], header: str) -> int:
+    """
+    Báo người gửi các hóa đơn vừa đổi trạng thái (qua outbox)
+
+    Returns:
+        Số người sẽ nhận tin nhắn
+    """
+    return await AsyncNotificationRepository.enqueue_many(
+        session, submitter_messages(changes, header), kind='invoice_status'
+    )
+
+
+def notify_submitters_sync(session: Session, changes: Iterable[StatusChange], header: str) -> int:
+    """notify_submitters cho code sync (web admin), ghi outbox trong session hiện tại"""
+    return NotificationRepository.enqueue_many(
+        session, submitter_messages(changes, header), kind='invoice_status'
+    )
@@ -0,0 +1,186 @@
+"""
+Worker gửi tin nhắn trong outbox (bảng notification_outbox)
+
+Mỗi vòng worker nhận một lô tin đến hạn, gộp các tin cùng người nhận thành
+một tin (tối đa 4096 ký tự), gửi qua token bucket toàn cục và giãn cách tối
+thiểu giữa hai tin cùng chat, rồi ghi trạng thái:
+
+- thành công: sent
+- 429 Too Many Requests: dừng bucket ``retry_after`` giây, hẹn gửi lại
+  (không tính vào số lần thử)
+- user chặn bot / chat không tồn tại: failed ngay
+- lỗi mạng / server: thử lại với backoff tăng dần, failed sau
+  ``NOTIFY_MAX_ATTEMPTS`` lần
+
+Khi tắt bot (``stop()``) worker dừng sau nhóm đang gửi; trạng thái các tin đã
+gửi luôn được ghi (kể cả khi task bị hủy giữa lô), tin đã nhận mà chưa gửi
+được trả lại outbox ngay thay vì chờ hết lease.
+"""
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError, TelegramNotFound, TelegramRetryAfter
+)
+from loguru import logger
+import config
+
+from src.database import async_db_manager, AsyncDatabaseManager
+from src.database.async_repository import AsyncNotificationRepository, OutboxMessage
+from src.bot.rate_limit import TokenBucket
+
+MAX_MESSAGE_LENGTH = 4096
+DIGEST_SEPARATOR = '\n\n➖➖➖\n\n'
+
+# Thời gian một lô được giữ cho worker đã nhận (quá hạn thì worker khác gửi lại)
+CLAIM_LEASE_SECONDS = 300
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+PURGE_INTERVAL_SECONDS = 3600
+# Thời gian chờ worker gửi nốt nhóm đang gửi khi tắt bot, quá hạn thì hủy task
+STOP_TIMEOUT_SECONDS = 10
+
+
+def coalesce(messages: List[OutboxMessage]) -> List[Tuple[List[int], str]]:
+    """Gộp các tin của một người nhận thành ít tin nhất (mỗi tin <= 4096 ký tự)"""
+    digests = []
+    ids, text = [], ''
+    for message in messages:
+        part = message.text[:MAX_MESSAGE_LENGTH]
+        if text and len(text) + len(DIGEST_SEPARATOR) + len(part) > MAX_MESSAGE_LENGTH:
+            digests.append((ids, text))
+            ids, text = [], ''
+        ids.append(message.id)
+        text = f"{text}{DIGEST_SEPARATOR}{part}" if text else part
+    if ids:
+        digests.append((ids, text))
+    return digests
+
+
+class NotificationWorker:
+    """Gửi tin trong outbox theo rate limit của Telegram"""
+
+    def __init__(self, bot: Bot, db: AsyncDatabaseManager = async_db_manager,
+                 rate: float = None, batch_size: int = None):
+        self.bot = bot
+        self.db = db
+        self.bucket = TokenBucket(rate or config.NOTIFY_RATE_PER_SECOND)
+        self.batch_size = batch_size or config.NOTIFY_BATCH_SIZE
+        self._last_sent: Dict[int, float] = {}
+        self._last_purge = 0.0
+        self._stop = asyncio.Event()
+
+    def stop(self):
+        """Yêu cầu dừng sau nhóm tin đang gửi"""
+        self._stop.set()
+
+    async def _wait_for_chat(self, chat_id: int):
+        """Giãn cách tối thiểu giữa hai tin gửi cùng một chat"""
+        last = self._last_sent.get(chat_id)
+        if last is not None:
+            wait = last + config.NOTIFY_PER_CHAT_INTERVAL_SECONDS - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+    async def deliver_due(self) -> int:
+        """
+        Gửi một lô tin đến hạn
+
+        Returns:
+            Số tin trong outbox đã được xử lý (gửi, hẹn lại hoặc failed)
+        """
+        async with self.db.session() as session:
+            messages = await AsyncNotificationRepository.claim_due(
+                session, self.batch_size, CLAIM_LEASE_SECONDS
+            )
+        if not messages:
+            return 0
+
+        # Chỉ cần nhớ các chat vừa gửi trong khoảng giãn cách
+        cutoff = time.monotonic() - config.NOTIFY_PER_CHAT_INTERVAL_SECONDS
+        self._last_sent = {chat_id: at for chat_id, at in self._last_sent.items() if at > cutoff}
+
+        by_chat = defaultdict(list)
+        for message in messages:
+            by_chat[message.chat_id].append(message)
+
+        attempts = {message.id: message.attempts for message in messages}
+        sent, failed = [], []
+        retries = []  # (ids, next_attempt_at, error, count_attempt)
+        in_flight = []  # nhóm đang gửi khi bị hủy: không biết đã tới chưa, để lease xử lý
+
+        try:
+            for chat_id, chat_messages in by_chat.items():
+                for ids, text in coalesce(chat_messages):
+                    if self._stop.is_set():
+                        break
+                    await self._wait_for_chat(chat_id)
+                    await self.bucket.acquire()
+                    in_flight = ids
+                    try:
+                        await self.bot.send_message(chat_id, text, parse_mode=None)
+                        sent += ids
+                    except TelegramRetryAfter as e:
+                        logger.warning(f"Telegram rate limit hit, pausing {e.retry_after}s")
+                        self.bucket.pause(e.retry_after)
+                        retries.append((ids, datetime.now() + timedelta(seconds=e.retry_after), str(e), False))
+                    except (TelegramForbiddenError, TelegramNotFound, TelegramBadRequest) as e:
+                        logger.warning(f"Cannot notify {chat_id}: {e}")
+                        failed.append((ids, str(e)))
+                    except Exception as e:
+                        attempt = max(attempts[i] for i in ids)
+                        if attempt >= config.NOTIFY_MAX_ATTEMPTS:
+                            logger.error(f"Giving up notifying {chat_id} after {attempt} attempts: {e}")
+                            failed.append((ids, str(e)))
+                        else:
+                            delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempt - 1), BACKOFF_MAX_SECONDS)
+                            retries.append((ids, datetime.now() + timedelta(seconds=delay), str(e), True))
+                    finally:
+                        self._last_sent[chat_id] = time.monotonic()
+                    in_flight = []
+        finally:
+            # Ghi cả khi bị hủy giữa lô: tin đã gửi không bị gửi lại sau khi hết lease
+            done = set(sent).union(*(ids for ids, _ in failed), *(r[0] for r in retries), in_flight)
+            unsent = [message.id for message in messages if message.id not in done]
+            if unsent:
+                retries.append((unsent, datetime.now(), None, False))
+            async with self.db.session() as session:
+                await AsyncNotificationRepository.mark_sent(session, sent)
+                for ids, error in failed:
+                    await AsyncNotificationRepository.mark_failed(session, ids, error)
+                for ids, next_attempt_at, error, count_attempt in retries:
+                    await AsyncNotificationRepository.mark_retry(session, ids, next_attempt_at, error, count_attempt)
+
+        logger.debug(f"Outbox: {len(sent)} sent, {sum(len(ids) for ids, _ in failed)} failed, "
+                     f"{sum(len(r[0]) for r in retries)} rescheduled")
+        return len(messages)
+
+    async def purge(self):
+        """Xóa tin đã gửi quá NOTIFY_RETENTION_DAYS ngày"""
+        older_than = datetime.now() - timedelta(days=config.NOTIFY_RETENTION_DAYS)
+        async with self.db.session() as session:
+            purged = await AsyncNotificationRepository.purge_sent(session, older_than)
+        if purged:
+            logger.info(f"Purged {purged} sent notifications")
+
+    async def run(self):
+        """Vòng lặp gửi (chạy như background task)"""
+        while not self._stop.is_set():
+            try:
+                processed = await self.deliver_due()
+                if time.monotonic() - self._last_purge > PURGE_INTERVAL_SECONDS:
+                    self._last_purge = time.monotonic()
+                    await self.purge()
+            except Exception as e:
+                logger.error(f"Notification worker error: {e}")
+                processed = 0
+            # Còn tin thì lấy lô tiếp ngay, hết thì chờ
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._stop.wait(), config.NOTIFY_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
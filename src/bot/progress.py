@@ -0,0 +1,64 @@
+"""
+Tin nhắn tiến độ dùng chung cho các việc chạy lâu (upload, export)
+
+Mỗi việc chỉ gửi một tin nhắn; các bước sau (đang đọc, đang phân tích, kết
+quả) sửa lại tin đó thay vì gửi tin mới. Các bước trung gian cách nhau chưa
+tới PROGRESS_EDIT_INTERVAL_MS thì bỏ qua (user không kịp đọc), kết quả cuối
+luôn được hiển thị.
+"""
+import time
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+from loguru import logger
+import config
+
+
+class ProgressReporter:
+    """Một tin nhắn tiến độ, sửa lại qua từng bước"""
+
+    def __init__(self, message: Message, min_interval: float = None, sent: Message = None):
+        """
+        Args:
+            message: Tin nhắn của user (trả lời vào chat này)
+            min_interval: Khoảng cách tối thiểu giữa hai lần sửa (giây)
+            sent: Tin nhắn của bot đã có sẵn để sửa tiếp (vd: tin có nút bấm)
+        """
+        self.message = message
+        self.min_interval = (min_interval if min_interval is not None
+                             else config.PROGRESS_EDIT_INTERVAL_MS / 1000)
+        self.sent = sent
+        self._text = sent.text if sent else None
+        self._shown_at = time.monotonic() if sent else 0.0
+
+    async def update(self, text: str, **kwargs) -> bool:
+        """
+        Hiển thị bước mới (bỏ qua nếu vừa sửa trong min_interval)
+
+        Returns:
+            True nếu tin nhắn đã được gửi / sửa
+        """
+        if self.sent is not None and time.monotonic() - self._shown_at < self.min_interval:
+            return False
+        await self._show(text, **kwargs)
+        return True
+
+    async def finish(self, text: str, **kwargs):
+        """Hiển thị kết quả cuối (không bị bỏ qua)"""
+        await self._show(text, **kwargs)
+
+    async def _show(self, text: str, **kwargs):
+        if text == self._text:
+            return
+        if self.sent is None:
+            self.sent = await self.message.answer(text, **kwargs)
+        else:
+            try:
+                await self.sent.edit_text(text, **kwargs)
+            except TelegramBadRequest as e:
+                if 'message is not modified' not in str(e):
+                    # Tin đã bị xóa / không sửa được nữa: gửi tin mới
+                    logger.debug(f"Cannot edit progress message: {e}")
+                    self.sent = await self.message.answer(text, **kwargs)
+        self._text = text
+        self._shown_at = time.monotonic()
@@ -1,82 +1,82 @@
+import asyncio
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message, FSInputFile
 from aiogram.enums import ParseMode
 from datetime import datetime, timedelta
 from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import db_manager
-from src.database.repository import InvoiceRepository
-from src.exporter import ExcelExporter, WordExporter, StatisticsExporter
+from src.database.async_repository import AsyncInvoiceRepository
+from src.exporter import ExcelExporter, WordExporter, StatisticsExporter, PdfExporter
+from src.bot.progress import ProgressReporter
 
 router = Router()
 
 @router.message(Command("search"))
-async def cmd_search(message: Message):
+async def cmd_search(message: Message, session: AsyncSession):
     """Tìm kiếm hóa đơn"""
+    progress = ProgressReporter(message)
     try:
         # Get search keyword
         command_args = message.text.split(maxsplit=1)
         if len(command_args) < 2:
-            await message.answer("❌ Vui lòng nhập từ khóa tìm kiếm.\nVí dụ: /search Công ty ABC")
+            await progress.finish("❌ Vui lòng nhập từ khóa tìm kiếm.\nVí dụ: /search Công ty ABC")
             return
         
         keyword = command_args[1]
-        await message.answer(f"🔍 Đang tìm kiếm: {keyword}...")
-        
-        session = db_manager.get_session()
-        try:
-            invoices = InvoiceRepository.search(session, keyword)
-            
-            if not invoices:
-                await message.answer("❌ Không tìm thấy hóa đơn nào.")
-                return
-            
-            # Send results
-            result_text = f"<b>Tìm thấy {len(invoices)} hóa đơn:</b>\n\n"
-            
-            for inv in invoices[:10]:  # Limit to 10 results
-                result_text += f"""
+        await progress.update(f"🔍 Đang tìm kiếm: {keyword}...")
+        
+        invoices = await AsyncInvoiceRepository.search(session, keyword)
+        
+        if not invoices:
+            await progress.finish("❌ Không tìm thấy hóa đơn nào.")
+            return
+        
+        # Send results
+        result_text = f"<b>Tìm thấy {len(invoices)} hóa đơn:</b>\n\n"
+        
+        for inv in invoices[:10]:  # Limit to 10 results
+            result_text += f"""
 📄 <b>{inv.invoice_number}</b>
 📅 Ngày: {inv.invoice_date.strftime('%d/%m/%Y')}
 🏢 NCC: {inv.supplier_name}
 💰 Tổng: {inv.total_amount:,.0f} VNĐ
 {'—' * 25}
 """
-            
-            if len(invoices) > 10:
-                result_text += f"\n<i>... và {len(invoices) - 10} hóa đơn khác</i>"
-            
-            await message.answer(result_text, parse_mode=ParseMode.HTML)
-            
-        finally:
-            session.close()
-            
+        
+        if len(invoices) > 10:
+            result_text += f"\n<i>... và {len(invoices) - 10} hóa đơn khác</i>"
+        
+        await progress.finish(result_text, parse_mode=ParseMode.HTML)
+        
     except Exception as e:
         logger.error(f"Error in search command: {e}")
-        await message.answer("❌ Có lỗi xảy ra khi tìm kiếm.")
+        await progress.finish("❌ Có lỗi xảy ra khi tìm kiếm.")
 
 @router.message(Command("stats"))
-async def cmd_stats(message: Message):
+async def cmd_stats(message: Message, session: AsyncSession):
     """Hiển thị thống kê"""
+    progress = ProgressReporter(message)
     try:
-        await message.answer("📊 Đang tính toán thống kê...")
+        await progress.update("📊 Đang tính toán thống kê...")
         
-        session = db_manager.get_session()
-        try:
-            # Get invoices from current month
-            now = datetime.now()
-            first_day = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            invoices = InvoiceRepository.get_by_date_range(session, first_day, now)
-            
-            if not invoices:
-                await message.answer("❌ Chưa có dữ liệu trong tháng này.")
-                return
-            
-            # Generate statistics
-            summary = StatisticsExporter.generate_monthly_summary(invoices)
-            
-            stats_text = f"""
+        # Get invoices from current month
+        now = datetime.now()
+        first_day = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        
+        # Aggregate trong database, chỉ lấy top 5 mỗi chiều
+        summary = await session.run_sync(
+            lambda sync_session: StatisticsExporter.generate_summary(
+                sync_session, first_day, now, dimensions=('category', 'account'), top_n=5
+            )
+        )
+        
+        if not summary['total_invoices']:
+            await progress.finish("❌ Chưa có dữ liệu trong tháng này.")
+            return
+        
+        stats_text = f"""
 📊 <b>THỐNG KÊ THÁNG {now.month}/{now.year}</b>
 
 📈 <b>Tổng quan:</b>
@@ -86,113 +86,137 @@ async def cmd_stats(message: Message):
 
 💼 <b>Theo danh mục:</b>
 """
-            
-            for category, amount in list(summary['by_category'].items())[:5]:
-                stats_text += f"• {category}: {amount:,.0f} VNĐ\n"
-            
-            stats_text += f"\n📂 <b>Theo tài khoản:</b>\n"
-            for account, amount in list(summary['by_account'].items())[:5]:
-                stats_text += f"• TK {account}: {amount:,.0f} VNĐ\n"
-            
-            await message.answer(stats_text, parse_mode=ParseMode.HTML)
-            
-        finally:
-            session.close()
-            
+        
+        for category, amount in summary['by_category'].items():
+            stats_text += f"• {category}: {amount:,.0f} VNĐ\n"
+        
+        stats_text += f"\n📂 <b>Theo tài khoản:</b>\n"
+        for account, amount in summary['by_account'].items():
+            stats_text += f"• TK {account}: {amount:,.0f} VNĐ\n"
+        
+        await progress.finish(stats_text, parse_mode=ParseMode.HTML)
+        
     except Exception as e:
         logger.error(f"Error in stats command: {e}")
-        await message.answer("❌ Có lỗi xảy ra khi tính thống kê.")
+        await progress.finish("❌ Có lỗi xảy ra khi tính thống kê.")
 
 @router.message(Command("excel"))
-async def cmd_excel(message: Message):
+async def cmd_excel(message: Message, session: AsyncSession):
     """Xuất dữ liệu ra Excel"""
+    progress = ProgressReporter(message)
     try:
-        await message.answer("📊 Đang tạo file Excel...")
-        
-        session = db_manager.get_session()
-        try:
-            invoices = InvoiceRepository.get_by_user(session, message.from_user.id, limit=1000)
-            
-            if not invoices:
-                await message.answer("❌ Chưa có dữ liệu để xuất.")
-                return
-            
-            # Export to Excel
-            excel_path = ExcelExporter.export_invoices(invoices)
-            
-            # Send file
-            file = FSInputFile(excel_path)
-            await message.answer_document(
-                document=file,
-                caption=f"✅ Đã xuất {len(invoices)} hóa đơn ra Excel!"
-            )
-            
-        finally:
-            session.close()
-            
+        await progress.update("📊 Đang tạo file Excel...")
+        
+        invoices = await AsyncInvoiceRepository.get_by_user(session, message.from_user.id, limit=1000)
+        
+        if not invoices:
+            await progress.finish("❌ Chưa có dữ liệu để xuất.")
+            return
+        
+        # Export to Excel
+        excel_path = await asyncio.to_thread(ExcelExporter.export_invoices, invoices)
+        
+        # Send file
+        await progress.finish(f"✅ Đã xuất {len(invoices)} hóa đơn ra Excel!")
+        await message.answer_document(document=FSInputFile(excel_path))
+        
     except Exception as e:
         logger.error(f"Error in excel command: {e}")
-        await message.answer("❌ Có lỗi xảy ra khi xuất Excel.")
+        await progress.finish("❌ Có lỗi xảy ra khi xuất Excel.")
 
 @router.message(Command("word"))
-async def cmd_word(message: Message):
+async def cmd_word(message: Message, session: AsyncSession):
     """Xuất báo cáo Word"""
+    progress = ProgressReporter(message)
     try:
-        await message.answer("📝 Đang tạo file Word...")
-        
-        session = db_manager.get_session()
-        try:
-            invoices = InvoiceRepository.get_by_user(session, message.from_user.id, limit=1000)
-            
-            if not invoices:
-                await message.answer("❌ Chưa có dữ liệu để xuất.")
-                return
-            
-            # Export to Word
-            word_path = WordExporter.export_invoice_report(invoices)
-            
-            # Send file
-            file = FSInputFile(word_path)
-            await message.answer_document(
-                document=file,
-                caption=f"✅ Đã tạo báo cáo Word với {len(invoices)} hóa đơn!"
-            )
-            
-        finally:
-            session.close()
-            
+        await progress.update("📝 Đang tạo file Word...")
+        
+        invoices = await AsyncInvoiceRepository.get_by_user(session, message.from_user.id, limit=1000)
+        
+        if not invoices:
+            await progress.finish("❌ Chưa có dữ liệu để xuất.")
+            return
+        
+        # Export to Word
+        word_path = await asyncio.to_thread(WordExporter.export_invoice_report, invoices)
+        
+        # Send file
+        await progress.finish(f"✅ Đã tạo báo cáo Word với {len(invoices)} hóa đơn!")
+        await message.answer_document(document=FSInputFile(word_path))
+        
     except Exception as e:
         logger.error(f"Error in word command: {e}")
-        await message.answer("❌ Có lỗi xảy ra khi xuất Word.")
+        await progress.finish("❌ Có lỗi xảy ra khi xuất Word.")
+
+@router.message(Command("pdf"))
+async def cmd_pdf(message: Message, session: AsyncSession):
+    """
+    Xuất báo cáo PDF theo tháng
+    Cú pháp: /pdf [MM/YYYY]
+    """
+    progress = ProgressReporter(message)
+    try:
+        parts = message.text.split()
+        now = datetime.now()
+        if len(parts) > 1:
+            try:
+                first_day = datetime.strptime(parts[1], '%m/%Y')
+            except ValueError:
+                await progress.finish("❌ Định dạng tháng không đúng! Dùng MM/YYYY\nVí dụ: /pdf 12/2025")
+                return
+        else:
+            first_day = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        
+        next_month = (first_day + timedelta(days=32)).replace(day=1)
+        last_moment = next_month - timedelta(microseconds=1)
+        
+        await progress.update("📄 Đang tạo báo cáo PDF...")
+        
+        summary = await session.run_sync(
+            lambda sync_session: StatisticsExporter.generate_summary(sync_session, first_day, last_moment)
+        )
+        
+        if not summary['total_invoices']:
+            await progress.finish(f"❌ Chưa có dữ liệu trong tháng {first_day.strftime('%m/%Y')}.")
+            return
+        
+        # Render trong worker process, không chặn bot
+        pdf_path = await PdfExporter.export_monthly_report_async(
+            summary, f"BÁO CÁO THÁNG {first_day.strftime('%m/%Y')}"
+        )
+        
+        await progress.finish(
+            f"✅ Báo cáo PDF tháng {first_day.strftime('%m/%Y')} ({summary['total_invoices']} hóa đơn)"
+        )
+        await message.answer_document(document=FSInputFile(pdf_path))
+        
+    except Exception as e:
+        logger.error(f"Error in pdf command: {e}")
+        await progress.finish("❌ Có lỗi xảy ra khi xuất PDF.")
 
 @router.message(Command("recent"))
-async def cmd_recent(message: Message):
+async def cmd_recent(message: Message, session: AsyncSession):
     """Hiển thị hóa đơn gần đây"""
     try:
-        session = db_manager.get_session()
-        try:
-            invoices = InvoiceRepository.get_by_user(session, message.from_user.id, limit=10)
-            
-            if not invoices:
-                await message.answer("❌ Chưa có hóa đơn nào.")
-                return
-            
-            result_text = "<b>🕐 10 hóa đơn gần nhất:</b>\n\n"
-            
-            for inv in invoices:
-                result_text += f"""
+        invoices = await AsyncInvoiceRepository.get_by_user(session, message.from_user.id, limit=10)
+        
+        if not invoices:
+            await message.answer("❌ Chưa có hóa đơn nào.")
+            return
+        
+        result_text = "<b>🕐 10 hóa đơn gần nhất:</b>\n\n"
+        
+        for inv in invoices:
+            result_text += f"""
 📄 <b>{inv.invoice_number}</b>
 📅 {inv.invoice_date.strftime('%d/%m/%Y')}
 🏢 {inv.supplier_name}
 💰 {inv.total_amount:,.0f} VNĐ
 {'—' * 25}
 """
-            
-            await message.answer(result_text, parse_mode=ParseMode.HTML)
-            
-        finally:
-            session.close()
-            
+        
+        await message.answer(result_text, parse_mode=ParseMode.HTML)
+        
     except Exception as e:
         logger.error(f"Error in recent command: {e}")
         await message.answer("❌ Có lỗi xảy ra.")
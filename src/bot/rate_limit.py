@@ -0,0 +1,54 @@
+"""
+Token bucket cho các giới hạn tần suất (gửi tin Telegram, ...)
+
+Bucket chứa tối đa ``capacity`` token và được nạp lại ``rate`` token mỗi
+giây; mỗi lượt gửi lấy một token. Cho phép gửi dồn tối đa ``capacity`` tin
+rồi giữ đều ``rate`` tin/giây.
+"""
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Token bucket trong process (không thread-safe, dùng trong event loop)"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, tokens: float = 1.0) -> float:
+        """Số giây phải chờ để có đủ token (0 nếu lấy được ngay)"""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._refill(now)
+        if self._tokens >= tokens:
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Lấy token nếu có, không chờ"""
+        if self.delay(tokens) > 0:
+            return False
+        self._tokens -= tokens
+        return True
+
+    async def acquire(self, tokens: float = 1.0):
+        """Chờ tới khi lấy được token (các coroutine chờ lần lượt theo thứ tự)"""
+        async with self._lock:
+            while (wait := self.delay(tokens)) > 0:
+                await asyncio.sleep(wait)
+            self._tokens -= tokens
+
+    def pause(self, seconds: float):
+        """Ngừng cấp token trong ``seconds`` giây (Telegram trả 429 retry_after)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
@@ -0,0 +1,166 @@
+"""
+Nhận update qua webhook (aiohttp server) thay cho long polling
+
+Telegram POST update tới WEBHOOK_PATH kèm header
+``X-Telegram-Bot-Api-Secret-Token``; request sai secret bị trả 401. Update
+hợp lệ được đưa vào hàng đợi và trả 200 ngay, WEBHOOK_WORKERS worker xử lý
+song song. Hàng đợi đầy hoặc đang tắt thì trả 503 để Telegram gửi lại sau
+(có thể tới instance khác).
+
+Endpoint phụ:
+
+- ``GET /healthz``: process còn sống
+- ``GET /readyz``: sẵn sàng nhận update (worker đang chạy, database kết nối
+  được, chưa tắt); 503 khi đang drain để load balancer ngừng gửi
+"""
+import asyncio
+from typing import Any, Dict, List
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from loguru import logger
+from sqlalchemy import text
+import config
+
+from src.database import async_db_manager
+
+HEALTH_PATH = '/healthz'
+READY_PATH = '/readyz'
+
+
+class QueuedRequestHandler(SimpleRequestHandler):
+    """Webhook handler với số worker cố định và drain khi tắt"""
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str,
+                 workers: int = None, queue_size: int = None, **data: Any):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.worker_count = workers or config.WEBHOOK_WORKERS
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or config.WEBHOOK_QUEUE_SIZE)
+        self.draining = False
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers) and not self.draining
+
+    def start(self):
+        """Chạy các worker (gọi khi app startup)"""
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"webhook-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        logger.info(f"Webhook: {self.worker_count} workers started")
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            try:
+                await self._background_feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"Error handling update {update.get('update_id')}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        if self.draining:
+            return web.Response(status=503, text='Shutting down')
+        update: Dict[str, Any] = await request.json(loads=bot.session.json_loads)
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            logger.warning(f"Webhook queue full, rejecting update {update.get('update_id')}")
+            return web.Response(status=503, text='Busy')
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def drain(self, timeout: float = None):
+        """
+        Ngừng nhận update mới và chờ xử lý hết update đã nhận
+
+        Update còn trong hàng đợi sau ``timeout`` giây bị bỏ (Telegram đã
+        nhận 200 nên sẽ không gửi lại, được log để kiểm tra).
+        """
+        if timeout is None:
+            timeout = config.WEBHOOK_DRAIN_TIMEOUT_SECONDS
+        self.draining = True
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook drain timed out, {self.queue.qsize()} updates dropped")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def close(self):
+        # Bot session do main.py đóng sau khi các background task dừng
+        await self.drain()
+
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({'status': 'ok'})
+
+
+async def ready(request: web.Request) -> web.Response:
+    handler: QueuedRequestHandler = request.app['webhook_handler']
+    status = {'workers': handler.running, 'queued': handler.queue.qsize(), 'database': True}
+    try:
+        async with async_db_manager.session() as session:
+            await session.execute(text('SELECT 1'))
+    except Exception as e:
+        logger.warning(f"Readiness check: database unavailable: {e}")
+        status['database'] = False
+
+    ok = status['workers'] and status['database']
+    return web.json_response(status, status=200 if ok else 503)
+
+
+def create_webhook_app(dispatcher: Dispatcher, bot: Bot, secret_token: str, **data: Any) -> web.Application:
+    """aiohttp app gồm webhook, /healthz, /readyz và startup/shutdown của dispatcher"""
+    app = web.Application()
+    handler = QueuedRequestHandler(dispatcher, bot, secret_token, **data)
+    handler.register(app, path=config.WEBHOOK_PATH)
+    app['webhook_handler'] = handler
+
+    async def on_startup(app: web.Application):
+        handler.start()
+
+    app.on_startup.append(on_startup)
+    app.router.add_get(HEALTH_PATH, health)
+    app.router.add_get(READY_PATH, ready)
+    setup_application(app, dispatcher, bot=bot, **data)
+    return app
+
+
+async def run_webhook(dispatcher: Dispatcher, bot: Bot, stop: asyncio.Event):
+    """
+    Chạy aiohttp server tới khi ``stop`` được set rồi drain và tắt
+
+    Đăng ký webhook với Telegram nếu có WEBHOOK_URL (không xóa khi tắt để
+    các instance khác tiếp tục nhận update).
+    """
+    if not config.WEBHOOK_SECRET:
+        raise ValueError("WEBHOOK_SECRET là bắt buộc khi BOT_MODE=webhook")
+
+    app = create_webhook_app(dispatcher, bot, config.WEBHOOK_SECRET)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Webhook server listening on {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+
+    try:
+        if config.WEBHOOK_URL:
+            await bot.set_webhook(
+                config.WEBHOOK_URL.rstrip('/') + config.WEBHOOK_PATH,
+                secret_token=config.WEBHOOK_SECRET,
+                allowed_updates=dispatcher.resolve_used_update_types(),
+            )
+            logger.info(f"Webhook registered: {config.WEBHOOK_URL}")
+        await stop.wait()
+    finally:
+        logger.info("Webhook server stopping, draining updates...")
+        # /readyz trả 503 ngay, các update đang chờ được xử lý xong trước khi đóng server
+        await app['webhook_handler'].drain()
+        await runner.cleanup()
+
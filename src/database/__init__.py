@@ -1,14 +1,37 @@
+from contextlib import asynccontextmanager
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from config import DATABASE_URL
+from config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE
 from loguru import logger
+from src.database.sqlite_profile import install_sqlite_profile, run_sqlite_maintenance
 
 Base = declarative_base()
 
+def _pool_kwargs(url: str) -> dict:
+    """Tham số connection pool từ config (không áp dụng cho SQLite in-memory)"""
+    if ':memory:' in url:
+        return {}
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+    }
+
+def async_database_url(url: str) -> str:
+    """Chuyển DATABASE_URL sync sang driver async tương ứng"""
+    if url.startswith('sqlite:'):
+        return url.replace('sqlite:', 'sqlite+aiosqlite:', 1)
+    if url.startswith('postgresql://') or url.startswith('postgres://'):
+        return 'postgresql+asyncpg://' + url.split('://', 1)[1]
+    return url
+
 class DatabaseManager:
     def __init__(self):
         """Khởi tạo database engine và session"""
-        self.engine = create_engine(DATABASE_URL, echo=False)
+        self.engine = create_engine(DATABASE_URL, echo=False, **_pool_kwargs(DATABASE_URL))
+        install_sqlite_profile(self.engine)
         self.SessionLocal = sessionmaker(
             autocommit=False, 
             autoflush=False, 
@@ -29,9 +52,76 @@ class DatabaseManager:
         """Xóa tất cả các bảng (sử dụng cẩn thận!)"""
         Base.metadata.drop_all(bind=self.engine)
         logger.warning("All database tables dropped")
+    
+    def dispose_after_fork(self):
+        """
+        Gọi trong process con sau fork (gunicorn post_fork): bỏ các connection
+        kế thừa từ process cha mà không đóng chúng, mỗi worker tự mở pool mới
+        """
+        self.engine.dispose(close=False)
+    
+    def run_maintenance(self):
+        """Bảo trì định kỳ cho SQLite: PRAGMA optimize và checkpoint WAL"""
+        if self.engine.dialect.name != 'sqlite':
+            return
+        with self.engine.connect() as connection:
+            run_sqlite_maintenance(connection)
+
+class AsyncDatabaseManager:
+    """Async engine/session cho bot (aiosqlite / asyncpg)"""
+    
+    def __init__(self, url: str = DATABASE_URL):
+        self.url = async_database_url(url)
+        self._engine = None
+        self._session_factory = None
+    
+    @property
+    def engine(self):
+        """Engine được tạo khi dùng lần đầu (web app/scripts không cần driver async)"""
+        if self._engine is None:
+            from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+            kwargs = _pool_kwargs(self.url)
+            if kwargs and self.url.startswith('sqlite+aiosqlite:'):
+                # aiosqlite mặc định dùng NullPool (không nhận pool_size...)
+                from sqlalchemy.pool import AsyncAdaptedQueuePool
+                kwargs['poolclass'] = AsyncAdaptedQueuePool
+            self._engine = create_async_engine(self.url, echo=False, **kwargs)
+            install_sqlite_profile(self._engine.sync_engine)
+            self._session_factory = async_sessionmaker(
+                self._engine,
+                expire_on_commit=False,
+                autoflush=False
+            )
+            logger.info(f"Async database initialized with URL: {self.url}")
+        return self._engine
+    
+    def get_session(self):
+        """Tạo một AsyncSession (người gọi tự commit/close)"""
+        self.engine  # Khởi tạo engine và session factory nếu chưa có
+        return self._session_factory()
+    
+    @asynccontextmanager
+    async def session(self):
+        """Unit-of-work: commit khi thành công, rollback khi có lỗi"""
+        session = self.get_session()
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+    
+    async def dispose(self):
+        """Đóng tất cả connection trong pool"""
+        if self._engine is not None:
+            await self._engine.dispose()
+            logger.info("Async database engine disposed")
 
 # Global database instance
 db_manager = DatabaseManager()
+async_db_manager = AsyncDatabaseManager()
 
 # Helper function for init_db
 def init_db():
@@ -41,13 +131,24 @@ def init_db():
 
 # Import repositories
 from src.database.repository import UserRepository, InvoiceRepository
+from src.database.async_repository import (
+    AsyncUserRepository, AsyncInvoiceRepository, AsyncImageHashRepository, AsyncNotificationRepository,
+    AsyncJobRepository
+)
 
 # Export all
 __all__ = [
     'Base',
     'DatabaseManager',
+    'AsyncDatabaseManager',
     'db_manager',
+    'async_db_manager',
     'init_db',
     'UserRepository',
-    'InvoiceRepository'
+    'InvoiceRepository',
+    'AsyncUserRepository',
+    'AsyncInvoiceRepository',
+    'AsyncImageHashRepository',
+    'AsyncNotificationRepository',
+    'AsyncJobRepository'
 ]
@@ -0,0 +1,139 @@
+"""
+Buffer hoạt động của user (last_activity, thông tin profile, counter)
+
+Thay vì SELECT + commit bảng users trên mỗi hóa đơn gửi lên / mỗi lần duyệt,
+handler chỉ ghi nhận vào bộ nhớ. Buffer được flush định kỳ bằng một câu
+INSERT ... ON CONFLICT DO UPDATE (executemany) duy nhất, counter được cộng
+nguyên tử ``x = x + n`` nên không mất update khi bot và web admin cùng ghi.
+"""
+import asyncio
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import func
+from loguru import logger
+
+from src.database.dialect import upsert_insert
+from src.database.models import User
+
+PROFILE_FIELDS = ('username', 'first_name', 'last_name')
+
+
+class ActivityBuffer:
+    """Gom update bảng users trong bộ nhớ, flush theo batch"""
+
+    def __init__(self):
+        self._pending: Dict[int, dict] = {}
+
+    def _entry(self, telegram_user_id: int) -> dict:
+        entry = self._pending.get(telegram_user_id)
+        if entry is None:
+            entry = {'submitted': 0, 'approved': 0, 'last_activity': None}
+            entry.update(dict.fromkeys(PROFILE_FIELDS))
+            self._pending[telegram_user_id] = entry
+        return entry
+
+    def touch(self, telegram_user_id: int, username: str = None,
+              first_name: str = None, last_name: str = None):
+        """Ghi nhận user vừa hoạt động (giá trị None giữ nguyên dữ liệu cũ)"""
+        entry = self._entry(telegram_user_id)
+        entry['last_activity'] = datetime.now()
+        for key, value in zip(PROFILE_FIELDS, (username, first_name, last_name)):
+            if value is not None:
+                entry[key] = value
+
+    def add_submitted(self, telegram_user_id: int, count: int = 1):
+        """Cộng số hóa đơn đã gửi"""
+        self._entry(telegram_user_id)['submitted'] += count
+
+    def add_approved(self, telegram_user_id: int, count: int = 1):
+        """Cộng số hóa đơn đã duyệt"""
+        self._entry(telegram_user_id)['approved'] += count
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _restore(self, pending: Dict[int, dict]):
+        """Trả lại các entry flush lỗi, gộp với entry mới phát sinh"""
+        for telegram_user_id, old in pending.items():
+            entry = self._entry(telegram_user_id)
+            entry['submitted'] += old['submitted']
+            entry['approved'] += old['approved']
+            if entry['last_activity'] is None:
+                entry['last_activity'] = old['last_activity']
+            for key in PROFILE_FIELDS:
+                if entry[key] is None:
+                    entry[key] = old[key]
+
+    @staticmethod
+    def _build_statement(dialect_name: str):
+        table = User.__table__
+        stmt = upsert_insert(dialect_name, table)
+        excluded = stmt.excluded
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.telegram_user_id],
+            set_={
+                **{key: func.coalesce(excluded[key], table.c[key]) for key in PROFILE_FIELDS},
+                'last_activity': func.coalesce(excluded.last_activity, table.c.last_activity),
+                'total_invoices_submitted': (
+                    func.coalesce(table.c.total_invoices_submitted, 0) + excluded.total_invoices_submitted
+                ),
+                'total_invoices_approved': (
+                    func.coalesce(table.c.total_invoices_approved, 0) + excluded.total_invoices_approved
+                ),
+            }
+        )
+
+    async def flush(self, db) -> int:
+        """
+        Ghi toàn bộ buffer xuống database trong một transaction
+
+        Args:
+            db: AsyncDatabaseManager
+
+        Returns:
+            Số user được cập nhật
+        """
+        if not self._pending:
+            return 0
+
+        # Đổi buffer trước khi await để update mới không lẫn vào batch này
+        pending, self._pending = self._pending, {}
+        rows = [
+            {
+                'telegram_user_id': telegram_user_id,
+                'username': entry['username'],
+                'first_name': entry['first_name'],
+                'last_name': entry['last_name'],
+                'last_activity': entry['last_activity'],
+                'total_invoices_submitted': entry['submitted'],
+                'total_invoices_approved': entry['approved'],
+            }
+            for telegram_user_id, entry in pending.items()
+        ]
+
+        try:
+            stmt = self._build_statement(db.engine.dialect.name)
+            async with db.session() as session:
+                await session.execute(stmt, rows)
+        except Exception as e:
+            self._restore(pending)
+            logger.warning(f"Activity flush failed ({len(rows)} users), will retry: {e}")
+            return 0
+        except BaseException:
+            # Task bị cancel giữa chừng (lúc tắt bot): giữ lại batch cho lần flush cuối
+            self._restore(pending)
+            raise
+
+        logger.debug(f"Flushed activity for {len(rows)} users")
+        return len(rows)
+
+    async def run(self, db, interval_seconds: float):
+        """Vòng lặp flush định kỳ (chạy như background task)"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            await self.flush(db)
+
+
+# Global buffer instance
+activity_buffer = ActivityBuffer()
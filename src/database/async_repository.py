@@ -0,0 +1,642 @@
+"""
+Async repositories cho bot (AsyncSession)
+
+Cùng API với InvoiceRepository / UserRepository nhưng các hàm là coroutine.
+Các thao tác ghi chỉ flush, việc commit/rollback do
+``AsyncDatabaseManager.session()`` đảm nhận ở cuối unit-of-work.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import case, delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from loguru import logger
+
+from src.database.models import Invoice, InvoiceImageHash, JobRun, Notification, SchedulerLock, User
+from src.database.permissions import ADMIN_ROLES
+from src.database.dialect import upsert_insert
+from src.database.repository import (
+    INVOICE_KEY_COLUMNS, BulkInsertResult, StatusChange,
+    _batches, _dedupe_rows, _invoice_key, _invoice_rows, _status_update
+)
+import config
+
+
+class StatusSummary(NamedTuple):
+    """Một dòng digest theo trạng thái"""
+    status: str
+    recent_count: int
+    recent_amount: float
+    total_count: int
+
+
+class AsyncInvoiceRepository:
+    """Async repository để xử lý các thao tác với Invoice"""
+
+    @staticmethod
+    async def create(session: AsyncSession, invoice_data: dict) -> Invoice:
+        """Tạo mới một invoice"""
+        invoice = Invoice(**invoice_data)
+        session.add(invoice)
+        await session.flush()
+        await session.refresh(invoice)
+        logger.info(f"Created invoice: {invoice.invoice_number}")
+        return invoice
+
+    @staticmethod
+    async def bulk_create(session: AsyncSession, invoices: Iterable[dict],
+                          batch_size: int = None) -> BulkInsertResult:
+        """Insert hàng loạt, bỏ qua số hóa đơn đã tồn tại (xem InvoiceRepository.bulk_create)"""
+        rows, duplicates = _dedupe_rows(_invoice_rows(invoices))
+        if not rows:
+            return BulkInsertResult([], duplicates)
+
+        table = Invoice.__table__
+        stmt = upsert_insert(session.bind.dialect.name, table).on_conflict_do_nothing(
+            index_elements=INVOICE_KEY_COLUMNS
+        ).returning(table.c.id, *(table.c[name] for name in INVOICE_KEY_COLUMNS))
+
+        created_ids = []
+        inserted_keys = []
+        for batch in _batches(rows, batch_size or config.BULK_INSERT_BATCH_SIZE):
+            result = await session.execute(stmt, batch)
+            for invoice_id, tax_code, invoice_number in result:
+                created_ids.append(invoice_id)
+                inserted_keys.append((tax_code, invoice_number))
+
+        created = set(inserted_keys)
+        duplicates += [row['invoice_number'] for row in rows if _invoice_key(row) not in created]
+        logger.info(f"Bulk created {len(created_ids)} invoices ({len(duplicates)} duplicates skipped)")
+        return BulkInsertResult(created_ids, duplicates, inserted_keys)
+
+    @staticmethod
+    async def bulk_set_status(session: AsyncSession, invoice_ids: Iterable[int], new_status: str,
+                              approver_id: str, approver_username: str = None, reason: str = None,
+                              from_status: str = 'pending') -> List[StatusChange]:
+        """Duyệt / từ chối nhiều hóa đơn (xem InvoiceRepository.bulk_set_status)"""
+        invoice_ids = list(invoice_ids)
+        changes = []
+        for batch in _batches(invoice_ids, config.BULK_INSERT_BATCH_SIZE):
+            stmt = _status_update(batch, new_status, from_status, approver_id, approver_username, reason)
+            result = await session.execute(stmt)
+            changes += [StatusChange(*row) for row in result]
+        logger.info(f"Set {len(changes)}/{len(invoice_ids)} invoices to {new_status} by {approver_username}")
+        return changes
+
+    @staticmethod
+    async def set_status(session: AsyncSession, invoice_id: int, new_status: str, approver_id: str,
+                         approver_username: str = None, reason: str = None,
+                         from_status: str = 'pending') -> Optional[StatusChange]:
+        """
+        Duyệt / từ chối một hóa đơn nếu nó còn ở from_status
+
+        Returns:
+            None nếu hóa đơn không tồn tại hoặc đã được người khác xử lý
+        """
+        result = await session.execute(
+            _status_update([invoice_id], new_status, from_status, approver_id, approver_username, reason)
+        )
+        row = result.first()
+        return StatusChange(*row) if row else None
+
+    @staticmethod
+    async def get_ids_by_status(session: AsyncSession, status: str) -> List[int]:
+        """Id các hóa đơn theo trạng thái (index status, created_at, id)"""
+        result = await session.execute(
+            select(Invoice.id).where(Invoice.status == status).order_by(Invoice.created_at.desc(), Invoice.id.desc())
+        )
+        return list(result.scalars())
+
+    @staticmethod
+    async def get_image_hashes(session: AsyncSession, invoice_ids: List[int]) -> List[Tuple[int, str]]:
+        """Các cặp (invoice_id, image_hash) của invoice có ảnh"""
+        if not invoice_ids:
+            return []
+        result = await session.execute(
+            select(Invoice.id, Invoice.image_hash).where(
+                Invoice.id.in_(invoice_ids),
+                Invoice.image_hash.isnot(None)
+            )
+        )
+        return [tuple(row) for row in result.all()]
+
+    @staticmethod
+    async def get_existing_content_hashes(session: AsyncSession, hashes: Iterable[str]) -> Set[str]:
+        """Các content hash đã có trong database (dùng index content_hash)"""
+        hashes = list(hashes)
+        if not hashes:
+            return set()
+        result = await session.execute(
+            select(Invoice.content_hash).where(Invoice.content_hash.in_(hashes))
+        )
+        return set(result.scalars().all())
+
+    @staticmethod
+    async def get_by_id(session: AsyncSession, invoice_id: int) -> Optional[Invoice]:
+        """Lấy invoice theo ID"""
+        return await session.get(Invoice, invoice_id)
+
+    @staticmethod
+    async def set_telegram_file(session: AsyncSession, invoice_id: int, file_id: str,
+                                file_unique_id: str = None):
+        """Lưu file_id mới nhất để lần sau gửi lại không cần upload (giữ file_unique_id gốc)"""
+        await session.execute(
+            update(Invoice).where(Invoice.id == invoice_id).values(
+                telegram_file_id=file_id,
+                telegram_file_unique_id=func.coalesce(Invoice.telegram_file_unique_id, file_unique_id)
+            )
+        )
+
+    @staticmethod
+    async def get_by_invoice_number(session: AsyncSession, invoice_number: str) -> Optional[Invoice]:
+        """Lấy invoice theo số hóa đơn"""
+        result = await session.execute(
+            select(Invoice).where(Invoice.invoice_number == invoice_number).limit(1)
+        )
+        return result.scalars().first()
+
+    @staticmethod
+    async def search(session: AsyncSession, keyword: str) -> List[Invoice]:
+        """Tìm kiếm invoice theo từ khóa"""
+        result = await session.execute(select(Invoice).where(
+            (Invoice.supplier_name.ilike(f'%{keyword}%')) |
+            (Invoice.description.ilike(f'%{keyword}%')) |
+            (Invoice.invoice_number.ilike(f'%{keyword}%'))
+        ))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_by_user(session: AsyncSession, user_id: int, limit: int = 50) -> List[Invoice]:
+        """Lấy danh sách invoice của user"""
+        result = await session.execute(
+            select(Invoice).where(Invoice.created_by_user_id == user_id)
+            .order_by(Invoice.created_at.desc()).limit(limit)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_by_date_range(session: AsyncSession, start_date: datetime, end_date: datetime) -> List[Invoice]:
+        """Lấy danh sách invoice trong khoảng thời gian"""
+        result = await session.execute(
+            select(Invoice).where(
+                Invoice.invoice_date >= start_date,
+                Invoice.invoice_date <= end_date
+            ).order_by(Invoice.invoice_date.desc())
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_all(session: AsyncSession, limit: int = 100) -> List[Invoice]:
+        """Lấy tất cả invoice"""
+        result = await session.execute(
+            select(Invoice).order_by(Invoice.created_at.desc()).limit(limit)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_recent(session: AsyncSession, limit: int = 10) -> List[Invoice]:
+        """Lấy danh sách invoice gần đây nhất"""
+        return await AsyncInvoiceRepository.get_all(session, limit)
+
+    @staticmethod
+    async def update(session: AsyncSession, invoice_id: int, update_data: dict) -> Optional[Invoice]:
+        """Cập nhật invoice"""
+        invoice = await AsyncInvoiceRepository.get_by_id(session, invoice_id)
+        if invoice:
+            for key, value in update_data.items():
+                if hasattr(invoice, key):
+                    setattr(invoice, key, value)
+            await session.flush()
+            logger.info(f"Updated invoice: {invoice.invoice_number}")
+        return invoice
+
+    @staticmethod
+    async def delete(session: AsyncSession, invoice_id: int) -> bool:
+        """Xóa invoice"""
+        invoice = await AsyncInvoiceRepository.get_by_id(session, invoice_id)
+        if invoice:
+            await session.delete(invoice)
+            await session.flush()
+            logger.info(f"Deleted invoice: {invoice.invoice_number}")
+            return True
+        return False
+
+    @staticmethod
+    async def get_by_status(session: AsyncSession, status: str, limit: int = 100,
+                            offset: int = 0) -> List[Invoice]:
+        """Lấy hóa đơn theo trạng thái"""
+        result = await session.execute(
+            select(Invoice).where(Invoice.status == status)
+            .order_by(Invoice.created_at.desc(), Invoice.id.desc()).offset(offset).limit(limit)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def count_by_status(session: AsyncSession, status: str) -> int:
+        """Đếm hóa đơn theo trạng thái"""
+        result = await session.execute(
+            select(func.count(Invoice.id)).where(Invoice.status == status)
+        )
+        return result.scalar_one()
+
+    @staticmethod
+    async def count_all(session: AsyncSession) -> int:
+        """Đếm tổng số hóa đơn"""
+        result = await session.execute(select(func.count(Invoice.id)))
+        return result.scalar_one()
+
+    @staticmethod
+    async def get_total_amount(session: AsyncSession) -> float:
+        """Tính tổng giá trị hóa đơn"""
+        result = await session.execute(select(func.sum(Invoice.total_amount)))
+        return result.scalar() or 0.0
+
+    @staticmethod
+    async def get_total_amount_by_status(session: AsyncSession, status: str) -> float:
+        """Tính tổng giá trị theo trạng thái"""
+        result = await session.execute(
+            select(func.sum(Invoice.total_amount)).where(Invoice.status == status)
+        )
+        return result.scalar() or 0.0
+
+    @staticmethod
+    async def summarize_by_status(session: AsyncSession, since: datetime) -> List[StatusSummary]:
+        """
+        Hóa đơn gửi từ ``since`` theo trạng thái, kèm số hóa đơn đang chờ duyệt
+        (một câu GROUP BY cho digest hằng ngày)
+        """
+        recent = Invoice.created_at >= since
+        result = await session.execute(
+            select(
+                Invoice.status,
+                func.count(case((recent, Invoice.id))),
+                func.coalesce(func.sum(case((recent, Invoice.total_amount))), 0.0),
+                func.count(Invoice.id),
+            )
+            .where(or_(recent, Invoice.status == 'pending'))
+            .group_by(Invoice.status)
+        )
+        return [StatusSummary(*row) for row in result]
+
+    @staticmethod
+    async def pending_overview(session: AsyncSession, older_than: datetime) -> Tuple[int, float, Optional[datetime]]:
+        """Số lượng, tổng tiền và thời điểm gửi sớm nhất của hóa đơn chờ duyệt trước ``older_than``"""
+        result = await session.execute(
+            select(
+                func.count(Invoice.id),
+                func.coalesce(func.sum(Invoice.total_amount), 0.0),
+                func.min(Invoice.created_at),
+            )
+            .where(Invoice.status == 'pending', Invoice.created_at < older_than)
+        )
+        return tuple(result.one())
+
+    @staticmethod
+    async def get_by_amount_range(session: AsyncSession, min_amount: float, max_amount: float) -> List[Invoice]:
+        """Lấy hóa đơn trong khoảng giá"""
+        result = await session.execute(
+            select(Invoice).where(
+                Invoice.total_amount >= min_amount,
+                Invoice.total_amount <= max_amount
+            ).order_by(Invoice.total_amount.desc())
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_by_category(session: AsyncSession, category: str) -> List[Invoice]:
+        """Lấy hóa đơn theo danh mục"""
+        result = await session.execute(
+            select(Invoice).where(Invoice.category.ilike(f'%{category}%'))
+            .order_by(Invoice.created_at.desc())
+        )
+        return list(result.scalars().all())
+
+
+class AsyncUserRepository:
+    """Async repository để xử lý các thao tác với User"""
+
+    @staticmethod
+    async def create_or_update(session: AsyncSession, telegram_user_id: int, **kwargs) -> User:
+        """Tạo mới hoặc cập nhật user"""
+        user = await AsyncUserRepository.get_by_telegram_id(session, telegram_user_id)
+
+        if user:
+            for key, value in kwargs.items():
+                if hasattr(user, key):
+                    setattr(user, key, value)
+            user.last_activity = datetime.now()
+        else:
+            user = User(telegram_user_id=telegram_user_id, **kwargs)
+            session.add(user)
+
+        await session.flush()
+        return user
+
+    @staticmethod
+    async def get_by_telegram_id(session: AsyncSession, telegram_user_id: int) -> Optional[User]:
+        """Lấy user theo Telegram ID"""
+        result = await session.execute(
+            select(User).where(User.telegram_user_id == telegram_user_id).limit(1)
+        )
+        return result.scalars().first()
+
+    @staticmethod
+    async def get_by_username(session: AsyncSession, username: str) -> Optional[User]:
+        """Lấy user theo username"""
+        result = await session.execute(select(User).where(User.username == username).limit(1))
+        return result.scalars().first()
+
+    @staticmethod
+    async def get_all(session: AsyncSession) -> List[User]:
+        """Lấy tất cả users"""
+        result = await session.execute(select(User).order_by(User.created_at.desc()))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_admin_ids(session: AsyncSession) -> List[int]:
+        """Telegram ID của các admin/accountant đang hoạt động"""
+        result = await session.execute(
+            select(User.telegram_user_id).where(
+                User.role.in_(ADMIN_ROLES),
+                User.is_active.isnot(False)
+            )
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def count_all(session: AsyncSession) -> int:
+        """Đếm tổng số users"""
+        result = await session.execute(select(func.count(User.id)))
+        return result.scalar_one()
+
+    @staticmethod
+    async def update_role(session: AsyncSession, user_id: int, new_role: str) -> Optional[User]:
+        """Cập nhật role của user (người gọi commit rồi mới permission_cache.invalidate)"""
+        user = await session.get(User, user_id)
+        if user:
+            user.role = new_role
+            await session.flush()
+            logger.info(f"Updated role for user {user.username}: {new_role}")
+        return user
+
+    @staticmethod
+    async def increment_submitted_count(session: AsyncSession, telegram_user_id: int):
+        """Tăng số lượng hóa đơn đã gửi (UPDATE nguyên tử, không đọc trước)"""
+        await session.execute(
+            update(User).where(User.telegram_user_id == telegram_user_id)
+            .values(total_invoices_submitted=func.coalesce(User.total_invoices_submitted, 0) + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    async def increment_approved_count(session: AsyncSession, telegram_user_id: int):
+        """Tăng số lượng hóa đơn đã duyệt (UPDATE nguyên tử, không đọc trước)"""
+        await session.execute(
+            update(User).where(User.telegram_user_id == telegram_user_id)
+            .values(total_invoices_approved=func.coalesce(User.total_invoices_approved, 0) + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+
+class AsyncImageHashRepository:
+    """Tra cứu ảnh gần giống theo dHash (multi-index Hamming search)"""
+
+    # 4 khối 16-bit: hai hash lệch <= 3 bit chắc chắn trùng ít nhất một khối
+    MAX_DISTANCE = 3
+
+    @staticmethod
+    def split_hash(image_hash: str) -> Tuple[int, int, int, int]:
+        """Tách hash 64-bit thành 4 khối 16-bit"""
+        value = int(image_hash, 16)
+        return tuple((value >> shift) & 0xFFFF for shift in (48, 32, 16, 0))
+
+    @staticmethod
+    def hamming_distance(hash_a: str, hash_b: str) -> int:
+        """Số bit khác nhau giữa hai hash hex"""
+        return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+    @staticmethod
+    async def add_many(session: AsyncSession, hashes: Iterable[Tuple[int, str]]):
+        """Lưu các cặp (invoice_id, image_hash)"""
+        rows = []
+        for invoice_id, image_hash in hashes:
+            if not image_hash:
+                continue
+            chunks = AsyncImageHashRepository.split_hash(image_hash)
+            rows.append({
+                'invoice_id': invoice_id,
+                'image_hash': image_hash,
+                **{f'chunk{i}': chunk for i, chunk in enumerate(chunks)},
+            })
+        if rows:
+            await session.execute(InvoiceImageHash.__table__.insert(), rows)
+
+    @staticmethod
+    async def add(session: AsyncSession, invoice_id: int, image_hash: str):
+        """Lưu hash ảnh của một hóa đơn"""
+        await AsyncImageHashRepository.add_many(session, [(invoice_id, image_hash)])
+
+    @staticmethod
+    async def find_similar(session: AsyncSession, image_hash: str,
+                           max_distance: int = None, limit: int = 5) -> List[Tuple[int, int]]:
+        """
+        Tìm hóa đơn có ảnh gần giống
+
+        Ứng viên là các hash trùng ít nhất một khối 16-bit (4 index lookup),
+        sau đó lọc theo khoảng cách Hamming. max_distance bị giới hạn ở
+        MAX_DISTANCE (mức còn đảm bảo tìm đủ). Số ứng viên được giới hạn bởi
+        IMAGE_HASH_MAX_CANDIDATES: ảnh nền trắng có nhiều khối giống nhau
+        (vd. 0x0000) nên một khối có thể khớp rất nhiều hash.
+
+        Returns:
+            [(invoice_id, distance)] sắp xếp theo khoảng cách tăng dần
+        """
+        if not image_hash:
+            return []
+        if max_distance is None:
+            max_distance = config.IMAGE_HASH_MAX_DISTANCE
+        max_distance = min(max_distance, AsyncImageHashRepository.MAX_DISTANCE)
+
+        chunks = AsyncImageHashRepository.split_hash(image_hash)
+        result = await session.execute(
+            select(InvoiceImageHash.invoice_id, InvoiceImageHash.image_hash).where(or_(
+                InvoiceImageHash.chunk0 == chunks[0],
+                InvoiceImageHash.chunk1 == chunks[1],
+                InvoiceImageHash.chunk2 == chunks[2],
+                InvoiceImageHash.chunk3 == chunks[3],
+            )).limit(config.IMAGE_HASH_MAX_CANDIDATES)
+        )
+
+        matches = {}
+        for invoice_id, candidate in result:
+            distance = AsyncImageHashRepository.hamming_distance(image_hash, candidate)
+            if distance <= max_distance and distance < matches.get(invoice_id, max_distance + 1):
+                matches[invoice_id] = distance
+        return sorted(matches.items(), key=lambda item: item[1])[:limit]
+
+
+class OutboxMessage(NamedTuple):
+    """Tin nhắn outbox vừa được worker nhận gửi"""
+    id: int
+    chat_id: int
+    text: str
+    attempts: int
+
+
+class AsyncNotificationRepository:
+    """Outbox tin nhắn Telegram (ghi cùng transaction, worker gửi sau)"""
+
+    @staticmethod
+    async def enqueue_many(session: AsyncSession, messages: Iterable[Tuple[int, str]],
+                           kind: str = 'message') -> int:
+        """Thêm các cặp (chat_id, text) vào outbox"""
+        now = datetime.now()
+        rows = [
+            {'chat_id': chat_id, 'kind': kind, 'text': text, 'status': 'pending',
+             'attempts': 0, 'next_attempt_at': now, 'created_at': now}
+            for chat_id, text in messages
+        ]
+        if rows:
+            await session.execute(Notification.__table__.insert(), rows)
+        return len(rows)
+
+    @staticmethod
+    async def enqueue(session: AsyncSession, chat_id: int, text: str, kind: str = 'message'):
+        """Thêm một tin nhắn vào outbox"""
+        await AsyncNotificationRepository.enqueue_many(session, [(chat_id, text)], kind)
+
+    @staticmethod
+    async def claim_due(session: AsyncSession, limit: int, lease_seconds: float) -> List[OutboxMessage]:
+        """
+        Nhận các tin đến hạn để gửi
+
+        next_attempt_at được đẩy lên thêm lease_seconds trong cùng câu UPDATE
+        nên hai worker không nhận trùng một tin; worker chết giữa chừng thì
+        tin được gửi lại khi hết lease.
+        """
+        now = datetime.now()
+        due = (
+            select(Notification.id)
+            .where(Notification.status == 'pending', Notification.next_attempt_at <= now)
+            .order_by(Notification.id)
+            .limit(limit)
+        )
+        stmt = (
+            update(Notification)
+            .where(Notification.id.in_(due), Notification.next_attempt_at <= now)
+            .values(next_attempt_at=now + timedelta(seconds=lease_seconds),
+                    attempts=Notification.attempts + 1)
+            .returning(Notification.id, Notification.chat_id, Notification.text, Notification.attempts)
+            .execution_options(synchronize_session=False)
+        )
+        messages = [OutboxMessage(*row) for row in await session.execute(stmt)]
+        return sorted(messages, key=lambda message: message.id)
+
+    @staticmethod
+    async def mark_sent(session: AsyncSession, ids: List[int]):
+        if ids:
+            await session.execute(
+                update(Notification).where(Notification.id.in_(ids))
+                .values(status='sent', sent_at=datetime.now(), last_error=None)
+                .execution_options(synchronize_session=False)
+            )
+
+    @staticmethod
+    async def mark_retry(session: AsyncSession, ids: List[int], next_attempt_at: datetime,
+                         error: str, count_attempt: bool = True):
+        """Hẹn gửi lại (count_attempt=False: lỗi 429 không tính vào số lần thử)"""
+        if ids:
+            values = {'next_attempt_at': next_attempt_at, 'last_error': error}
+            if not count_attempt:
+                values['attempts'] = Notification.attempts - 1
+            await session.execute(
+                update(Notification).where(Notification.id.in_(ids)).values(**values)
+                .execution_options(synchronize_session=False)
+            )
+
+    @staticmethod
+    async def mark_failed(session: AsyncSession, ids: List[int], error: str):
+        if ids:
+            await session.execute(
+                update(Notification).where(Notification.id.in_(ids))
+                .values(status='failed', last_error=error)
+                .execution_options(synchronize_session=False)
+            )
+
+    @staticmethod
+    async def purge_sent(session: AsyncSession, older_than: datetime) -> int:
+        """Xóa tin đã gửi trước older_than"""
+        result = await session.execute(
+            delete(Notification)
+            .where(Notification.status == 'sent', Notification.sent_at < older_than)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+
+class AsyncJobRepository:
+    """Lease leader và nhật ký chạy job của scheduler"""
+
+    @staticmethod
+    async def acquire_lock(session: AsyncSession, name: str, owner: str, ttl_seconds: float) -> bool:
+        """
+        Giữ (hoặc gia hạn) lease ``name`` cho ``owner``
+
+        Chỉ lấy được khi chưa ai giữ, đang do chính owner giữ hoặc lease của
+        instance khác đã hết hạn; một câu UPDATE có điều kiện nên hai instance
+        không cùng thắng.
+
+        Returns:
+            True nếu owner đang là leader
+        """
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        table = SchedulerLock.__table__
+        await session.execute(
+            upsert_insert(session.bind.dialect.name, table)
+            .values(name=name, owner=owner, expires_at=expires_at)
+            .on_conflict_do_nothing(index_elements=['name'])
+        )
+        result = await session.execute(
+            update(SchedulerLock)
+            .where(SchedulerLock.name == name,
+                   or_(SchedulerLock.owner == owner, SchedulerLock.expires_at < now))
+            .values(owner=owner, expires_at=expires_at)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @staticmethod
+    async def release_lock(session: AsyncSession, name: str, owner: str):
+        """Trả lease để instance khác nhận ngay (khi tắt bot)"""
+        await session.execute(
+            delete(SchedulerLock)
+            .where(SchedulerLock.name == name, SchedulerLock.owner == owner)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    async def claim_run(session: AsyncSession, job_name: str, run_key: str, owner: str = None) -> bool:
+        """
+        Đánh dấu job đã chạy cho slot ``run_key``
+
+        Returns:
+            False nếu slot này đã được chạy (job bỏ qua)
+        """
+        result = await session.execute(
+            upsert_insert(session.bind.dialect.name, JobRun.__table__)
+            .values(job_name=job_name, run_key=run_key, owner=owner,
+                    status='done', created_at=datetime.now())
+            .on_conflict_do_nothing(index_elements=['job_name', 'run_key'])
+        )
+        return result.rowcount == 1
+
+    @staticmethod
+    async def mark_failed(session: AsyncSession, job_name: str, run_key: str, owner: str, error: str):
+        """Ghi lại slot chạy lỗi (slot không được chạy lại)"""
+        await session.execute(
+            upsert_insert(session.bind.dialect.name, JobRun.__table__)
+            .values(job_name=job_name, run_key=run_key, owner=owner, status='failed',
+                    error=error, created_at=datetime.now())
+            .on_conflict_do_nothing(index_elements=['job_name', 'run_key'])
+        )
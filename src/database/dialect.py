@@ -0,0 +1,25 @@
+"""
+Helper cho các câu lệnh phụ thuộc dialect (INSERT ... ON CONFLICT)
+
+SQLite và PostgreSQL đều hỗ trợ ON CONFLICT và RETURNING nhưng SQLAlchemy
+dùng hai construct ``insert`` riêng cho từng dialect.
+"""
+from sqlalchemy.dialects import postgresql, sqlite
+
+_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def upsert_insert(dialect_name: str, table):
+    """
+    ``insert(table)`` có ``on_conflict_do_update/do_nothing`` cho dialect
+
+    Raises:
+        NotImplementedError: dialect không hỗ trợ ON CONFLICT
+    """
+    try:
+        return _INSERTS[dialect_name](table)
+    except KeyError:
+        raise NotImplementedError(f"ON CONFLICT không được hỗ trợ cho dialect '{dialect_name}'")
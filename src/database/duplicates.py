@@ -0,0 +1,138 @@
+"""
+Phát hiện hóa đơn trùng trước khi lưu
+
+Mỗi phép kiểm tra là một lookup trên index (O(log n)):
+    - telegram_file_unique_id: cùng file Telegram gửi lại (chưa cần tải về)
+    - content_hash: cùng một file gửi lại
+    - (supplier_tax_code, invoice_number): unique index, insert sẽ bị từ chối
+    - image_hash: ảnh gần giống (nén lại, chụp lại) qua multi-index Hamming
+    - fingerprint (supplier_name, invoice_date, total_amount): hóa đơn gửi
+      lại nhưng AI không đọc được số nên bot tự sinh INV-...
+"""
+from datetime import datetime, time, timedelta
+from typing import List, NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Invoice
+from src.database.async_repository import AsyncImageHashRepository
+from src.processor import DataProcessor
+
+# Lý do trùng; các lý do "chắc chắn" thì không lưu hóa đơn mới
+REASON_SAME_FILE = 'same_file'
+REASON_SAME_NUMBER = 'same_number'
+REASON_SAME_IMAGE = 'same_image'
+REASON_FINGERPRINT = 'fingerprint'
+
+BLOCKING_REASONS = (REASON_SAME_FILE, REASON_SAME_NUMBER)
+
+REASON_LABELS = {
+    REASON_SAME_FILE: 'Cùng file đã gửi',
+    REASON_SAME_NUMBER: 'Trùng MST + số hóa đơn',
+    REASON_SAME_IMAGE: 'Ảnh giống hóa đơn đã có',
+    REASON_FINGERPRINT: 'Trùng nhà cung cấp, ngày và tổng tiền',
+}
+
+# Chênh lệch tổng tiền vẫn coi là trùng (làm tròn khi OCR)
+AMOUNT_TOLERANCE = 1.0
+
+
+class DuplicateMatch(NamedTuple):
+    invoice_id: int
+    invoice_number: str
+    reason: str
+
+    @property
+    def is_blocking(self) -> bool:
+        return self.reason in BLOCKING_REASONS
+
+    @property
+    def label(self) -> str:
+        return REASON_LABELS[self.reason]
+
+
+async def _first(session: AsyncSession, *conditions):
+    result = await session.execute(
+        select(Invoice.id, Invoice.invoice_number).where(*conditions).limit(1)
+    )
+    return result.first()
+
+
+async def find_content_duplicate(session: AsyncSession, content_hash: str) -> List[DuplicateMatch]:
+    """Kiểm tra nhanh theo content hash (gọi trước OCR để bỏ qua file gửi lại)"""
+    if not content_hash:
+        return []
+    row = await _first(session, Invoice.content_hash == content_hash)
+    return [DuplicateMatch(row.id, row.invoice_number, REASON_SAME_FILE)] if row else []
+
+
+async def find_telegram_file_duplicate(session: AsyncSession, file_unique_id: str) -> List[DuplicateMatch]:
+    """Cùng file Telegram đã gửi (file_unique_id), kiểm tra được trước khi tải về"""
+    if not file_unique_id:
+        return []
+    row = await _first(session, Invoice.telegram_file_unique_id == file_unique_id)
+    return [DuplicateMatch(row.id, row.invoice_number, REASON_SAME_FILE)] if row else []
+
+
+async def find_image_duplicates(session: AsyncSession, image_hash: str,
+                                limit: int = 5) -> List[DuplicateMatch]:
+    """Hóa đơn có ảnh gần giống (gọi trước OCR để đề nghị dùng lại kết quả)"""
+    similar = await AsyncImageHashRepository.find_similar(session, image_hash, limit=limit)
+    if not similar:
+        return []
+    invoice_ids = [invoice_id for invoice_id, _ in similar]
+    result = await session.execute(
+        select(Invoice.id, Invoice.invoice_number).where(Invoice.id.in_(invoice_ids))
+    )
+    numbers = dict(result.all())
+    return [
+        DuplicateMatch(invoice_id, numbers[invoice_id], REASON_SAME_IMAGE)
+        for invoice_id in invoice_ids if invoice_id in numbers
+    ]
+
+
+async def find_duplicates(session: AsyncSession, invoice_data: dict) -> List[DuplicateMatch]:
+    """
+    Tìm các hóa đơn đã có có thể trùng với invoice_data
+
+    Returns:
+        Danh sách DuplicateMatch (mỗi hóa đơn cũ chỉ xuất hiện một lần)
+    """
+    matches = await find_content_duplicate(session, invoice_data.get('content_hash'))
+
+    invoice_number = invoice_data.get('invoice_number')
+    if invoice_number and not DataProcessor.is_generated_invoice_number(invoice_number):
+        row = await _first(
+            session,
+            Invoice.supplier_tax_code == (invoice_data.get('supplier_tax_code') or ''),
+            Invoice.invoice_number == invoice_number
+        )
+        if row:
+            matches.append(DuplicateMatch(row.id, row.invoice_number, REASON_SAME_NUMBER))
+
+    matches += await find_image_duplicates(session, invoice_data.get('image_hash'), limit=1)
+
+    invoice_date = invoice_data.get('invoice_date')
+    total_amount = invoice_data.get('total_amount')
+    if invoice_data.get('supplier_name') and isinstance(invoice_date, datetime) and total_amount:
+        day_start = datetime.combine(invoice_date.date(), time.min)
+        row = await _first(
+            session,
+            Invoice.supplier_name == invoice_data['supplier_name'],
+            Invoice.invoice_date >= day_start,
+            Invoice.invoice_date < day_start + timedelta(days=1),
+            Invoice.total_amount.between(total_amount - AMOUNT_TOLERANCE, total_amount + AMOUNT_TOLERANCE)
+        )
+        if row:
+            matches.append(DuplicateMatch(row.id, row.invoice_number, REASON_FINGERPRINT))
+
+    unique = {}
+    for match in matches:
+        unique.setdefault(match.invoice_id, match)
+    return list(unique.values())
+
+
+def describe_matches(matches: List[DuplicateMatch]) -> str:
+    """Mô tả ngắn cho tin nhắn bot / ghi chú hóa đơn"""
+    return '; '.join(f"#{m.invoice_id} ({m.invoice_number}): {m.label}" for m in matches)
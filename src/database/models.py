@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Text, Boolean, Index, ForeignKey
 from sqlalchemy.sql import func
 from datetime import datetime
 from src.database import Base
@@ -6,11 +6,23 @@ from src.database import Base
 class Invoice(Base):
     """Model lưu trữ thông tin hóa đơn"""
     __tablename__ = 'invoices'
+    __table_args__ = (
+        # Số hóa đơn chỉ duy nhất trong phạm vi một nhà cung cấp (MST)
+        Index('uq_invoices_supplier_number', 'supplier_tax_code', 'invoice_number', unique=True),
+        # Fingerprint phát hiện hóa đơn gửi lại với số tự sinh
+        Index('ix_invoices_fingerprint', 'supplier_name', 'invoice_date', 'total_amount'),
+        # Keyset pagination: (cột sort, id) cho web admin / API
+        Index('ix_invoices_created_at_id', 'created_at', 'id'),
+        Index('ix_invoices_status_created_at_id', 'status', 'created_at', 'id'),
+        Index('ix_invoices_user_created_at_id', 'created_by_user_id', 'created_at', 'id'),
+        Index('ix_invoices_invoice_date_id', 'invoice_date', 'id'),
+        Index('ix_invoices_total_amount_id', 'total_amount', 'id'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     
     # Thông tin cơ bản
-    invoice_number = Column(String(100), unique=True, nullable=False, index=True)
+    invoice_number = Column(String(100), nullable=False, index=True)
     invoice_date = Column(DateTime, nullable=False)
     supplier_name = Column(String(255), nullable=False)
     supplier_tax_code = Column(String(50))
@@ -40,6 +52,10 @@ class Invoice(Base):
     # File gốc
     file_path = Column(String(500))  # Đường dẫn file ảnh gốc
     raw_ocr_text = Column(Text)  # Text OCR gốc
+    content_hash = Column(String(64), index=True)  # SHA-256 nội dung file gốc
+    image_hash = Column(String(16), index=True)  # dHash 64-bit (hex) của ảnh
+    telegram_file_id = Column(String(200))  # Gửi lại ảnh qua Telegram không cần upload
+    telegram_file_unique_id = Column(String(100), index=True)  # Cùng file gửi lại => cùng id
     
     # Metadata
     created_by_user_id = Column(Integer, nullable=False)
@@ -78,6 +94,27 @@ class Invoice(Base):
             'notes': self.notes
         }
 
+class InvoiceImageHash(Base):
+    """
+    dHash 64-bit của ảnh hóa đơn, tách thành 4 khối 16-bit có index riêng
+    
+    Hai hash lệch nhau <= 3 bit chắc chắn trùng ít nhất một khối (nguyên lý
+    Dirichlet), nên tìm ảnh gần giống chỉ cần 4 lookup trên index rồi tính
+    khoảng cách Hamming trên vài ứng viên.
+    """
+    __tablename__ = 'invoice_image_hashes'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    invoice_id = Column(Integer, ForeignKey('invoices.id', ondelete='CASCADE'), nullable=False, index=True)
+    image_hash = Column(String(16), nullable=False)
+    chunk0 = Column(Integer, nullable=False, index=True)
+    chunk1 = Column(Integer, nullable=False, index=True)
+    chunk2 = Column(Integer, nullable=False, index=True)
+    chunk3 = Column(Integer, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<InvoiceImageHash {self.image_hash} -> {self.invoice_id}>"
+
 class User(Base):
     """Model lưu trữ thông tin user"""
     __tablename__ = 'users'
@@ -97,3 +134,77 @@ class User(Base):
     
     def __repr__(self):
         return f"<User {self.username} ({self.role})>"
+
+class Notification(Base):
+    """
+    Outbox tin nhắn Telegram chờ gửi
+    
+    Handler chỉ ghi tin nhắn vào bảng trong cùng transaction với thay đổi dữ
+    liệu (duyệt/từ chối...), worker gửi theo rate limit của Telegram và ghi
+    lại trạng thái. Tin nhắn của cùng một người được gộp khi gửi.
+    """
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        # Worker lấy tin đến hạn: WHERE status = 'pending' AND next_attempt_at <= now
+        Index('ix_notification_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    chat_id = Column(BigInteger, nullable=False, index=True)
+    kind = Column(String(50), default='message')  # invoice_status, admin_alert, ...
+    text = Column(Text, nullable=False)
+    status = Column(String(20), default='pending', nullable=False)  # pending, sent, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.now, nullable=False)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.now)
+    sent_at = Column(DateTime)
+    
+    def __repr__(self):
+        return f"<Notification #{self.id} -> {self.chat_id} ({self.status})>"
+
+class JobRun(Base):
+    """
+    Mỗi lần chạy job định kỳ (theo slot lịch), unique (job_name, run_key)
+    
+    Job chỉ chạy khi insert được row của slot đó, nên restart bot hay hai
+    instance cùng chạy cũng không gửi trùng.
+    """
+    __tablename__ = 'job_runs'
+    __table_args__ = (
+        Index('uq_job_runs_name_key', 'job_name', 'run_key', unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_name = Column(String(100), nullable=False)
+    run_key = Column(String(100), nullable=False)  # vd: 2024-05-01T18:00
+    owner = Column(String(100))
+    status = Column(String(20), default='done')  # done, failed
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.now)
+    
+    def __repr__(self):
+        return f"<JobRun {self.job_name} {self.run_key} ({self.status})>"
+
+class SchedulerLock(Base):
+    """Lease chọn leader cho scheduler (chỉ một instance chạy job)"""
+    __tablename__ = 'scheduler_locks'
+    
+    name = Column(String(100), primary_key=True)
+    owner = Column(String(100), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<SchedulerLock {self.name} -> {self.owner}>"
+
+class FsmState(Base):
+    """State FSM của aiogram (dùng chung giữa các instance bot, xem src/bot/fsm_storage.py)"""
+    __tablename__ = 'fsm_states'
+    
+    key = Column(String(255), primary_key=True)  # bot:chat:user:thread:destiny
+    state = Column(String(255))
+    data = Column(Text)  # JSON
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    
+    def __repr__(self):
+        return f"<FsmState {self.key} ({self.state})>"
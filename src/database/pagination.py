@@ -0,0 +1,57 @@
+"""
+Keyset pagination (seek method)
+
+Trang sau được lấy bằng điều kiện (sort_col, id) < (giá trị, id) của dòng
+cuối trang trước thay vì OFFSET, nên mọi trang đều là một range scan trên
+index (sort_col, id) với chi phí không đổi dù bảng lớn đến đâu.
+
+Cursor là JSON [giá trị, id] mã hóa base64 url-safe, client chỉ cần gửi lại
+nguyên văn.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from sqlalchemy import DateTime, tuple_
+
+
+def encode_cursor(value: Any, row_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, column) -> Tuple[Any, int]:
+    """
+    Giải mã cursor cho cột sort
+
+    Raises:
+        ValueError: cursor không hợp lệ
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, row_id = json.loads(raw)
+        if isinstance(column.type, DateTime) and value is not None:
+            value = datetime.fromisoformat(value)
+        return value, int(row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Cursor không hợp lệ: {cursor}") from e
+
+
+def keyset_filter(column, id_column, cursor: Optional[str], descending: bool = True):
+    """Điều kiện WHERE để lấy các dòng sau cursor (None nếu là trang đầu)"""
+    if not cursor:
+        return None
+    value, row_id = decode_cursor(cursor, column)
+    key = tuple_(column, id_column)
+    bound = tuple_(value, row_id)
+    return key < bound if descending else key > bound
+
+
+def keyset_order(column, id_column, descending: bool = True):
+    """ORDER BY khớp với index (column, id)"""
+    if descending:
+        return column.desc(), id_column.desc()
+    return column.asc(), id_column.asc()
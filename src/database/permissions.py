@@ -0,0 +1,71 @@
+"""
+Cache quyền của user trong process (telegram_user_id -> role, is_active)
+
+Admin bấm nút duyệt liên tục thì mỗi lần kiểm tra quyền không cần query
+bảng users. Entry hết hạn sau ``config.PERMISSION_CACHE_TTL_SECONDS`` và bị
+xóa ngay khi role thay đổi qua UserRepository.update_role. Các process khác
+(web admin) chỉ thấy thay đổi sau khi TTL hết hạn.
+"""
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import config
+
+from src.database.models import User
+
+ADMIN_ROLES = ('admin', 'accountant')
+
+
+class Permission(NamedTuple):
+    role: str
+    is_active: bool
+
+    @property
+    def is_admin(self) -> bool:
+        # is_active NULL (dữ liệu cũ) được coi là đang hoạt động
+        return self.is_active is not False and self.role in ADMIN_ROLES
+
+
+class PermissionCache:
+    """Cache TTL cho quyền user (kể cả user không tồn tại)"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[int, Tuple[float, Optional[Permission]]] = {}
+
+    def get(self, telegram_user_id: int) -> Tuple[bool, Optional[Permission]]:
+        """Trả về (hit, permission)"""
+        entry = self._entries.get(telegram_user_id)
+        if entry is None or entry[0] < time.monotonic():
+            return False, None
+        return True, entry[1]
+
+    def set(self, telegram_user_id: int, permission: Optional[Permission]):
+        self._entries[telegram_user_id] = (time.monotonic() + self.ttl_seconds, permission)
+
+    def invalidate(self, telegram_user_id: int = None):
+        """Xóa entry của một user, hoặc toàn bộ cache nếu không truyền ID"""
+        if telegram_user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(telegram_user_id, None)
+
+    async def get_or_load(self, session: AsyncSession, telegram_user_id: int) -> Optional[Permission]:
+        """Lấy quyền từ cache, query database (chỉ 2 cột) khi miss"""
+        hit, permission = self.get(telegram_user_id)
+        if hit:
+            return permission
+
+        result = await session.execute(
+            select(User.role, User.is_active).where(User.telegram_user_id == telegram_user_id)
+        )
+        row = result.first()
+        permission = Permission(row.role, row.is_active) if row else None
+        self.set(telegram_user_id, permission)
+        return permission
+
+
+# Global cache instance
+permission_cache = PermissionCache(config.PERMISSION_CACHE_TTL_SECONDS)
@@ -1,8 +1,186 @@
+from sqlalchemy import func, cast, update, Integer
 from sqlalchemy.orm import Session
-from src.database.models import Invoice, User
+from src.database.models import Invoice, Notification, User
+from src.database.permissions import permission_cache
+from src.database.dialect import upsert_insert
+from src.database.pagination import encode_cursor, keyset_filter, keyset_order
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
 from loguru import logger
+import config
+
+# Các chiều có thể dùng để tổng hợp thống kê
+AGGREGATE_DIMENSIONS = {
+    'category': Invoice.category,
+    'account': Invoice.account_code,
+    'supplier': Invoice.supplier_name,
+    'status': Invoice.status,
+    'user': Invoice.created_by_username,
+}
+
+AGGREGATE_PERIODS = ('day', 'week', 'month', 'quarter', 'year')
+
+def _period_bucket(session: Session, period: str):
+    """Biểu thức SQL nhóm invoice_date theo kỳ (day/week/month/quarter/year)"""
+    if period not in AGGREGATE_PERIODS:
+        raise ValueError(f"Kỳ không hợp lệ: {period} ({'/'.join(AGGREGATE_PERIODS)})")
+    
+    column = Invoice.invoice_date
+    if session.bind.dialect.name == 'sqlite':
+        if period == 'quarter':
+            month = cast(func.strftime('%m', column), Integer)
+            return func.printf('%s-Q%d', func.strftime('%Y', column), (month + 2) // 3)
+        if period == 'week':
+            # Tuần ISO như PostgreSQL (IYYY-"W"IW): năm và số tuần lấy theo
+            # ngày thứ Năm của tuần (SQLite < 3.46 không có %G/%V)
+            thursday = func.date(column, '-3 days', 'weekday 4')
+            week = (cast(func.strftime('%j', thursday), Integer) - 1) // 7 + 1
+            return func.printf('%s-W%02d', func.strftime('%Y', thursday), week)
+        fmt = {'day': '%Y-%m-%d', 'month': '%Y-%m', 'year': '%Y'}[period]
+        return func.strftime(fmt, column)
+    
+    # PostgreSQL
+    fmt = {'day': 'YYYY-MM-DD', 'week': 'IYYY-"W"IW', 'month': 'YYYY-MM',
+           'quarter': 'YYYY-"Q"Q', 'year': 'YYYY'}[period]
+    return func.to_char(column, fmt)
+
+class BulkInsertResult(NamedTuple):
+    """Kết quả bulk_create / bulk_upsert"""
+    created_ids: List[int]
+    duplicates: List[str]  # Số hóa đơn đã tồn tại (bỏ qua hoặc được cập nhật)
+    created_keys: List[tuple] = []  # (MST, số hóa đơn) của các row mới, xem _invoice_key
+
+def _invoice_rows(invoices: Iterable[dict]) -> List[dict]:
+    """
+    Chuẩn hóa dữ liệu cho executemany: mọi row cùng tập cột, cột thiếu lấy
+    default của model (executemany không áp dụng default theo từng row)
+    """
+    columns = Invoice.__table__.columns
+    now = datetime.now()
+    defaults = {}
+    for column in columns:
+        if column.primary_key or column.default is None:
+            continue
+        if column.default.is_scalar:
+            defaults[column.name] = column.default.arg
+        elif column.default.is_clause_element:
+            defaults[column.name] = now  # func.now()
+    
+    names = [column.name for column in columns if not column.primary_key]
+    rows = []
+    for data in invoices:
+        row = {name: data[name] if name in data else defaults.get(name) for name in names}
+        # NULL không bao giờ trùng trong unique index nên chuẩn hóa về ''
+        row['supplier_tax_code'] = row['supplier_tax_code'] or ''
+        rows.append(row)
+    return rows
+
+# Khóa duy nhất của hóa đơn (unique index uq_invoices_supplier_number)
+INVOICE_KEY_COLUMNS = ('supplier_tax_code', 'invoice_number')
+
+def _invoice_key(row) -> tuple:
+    """Khóa của row đã chuẩn hóa hoặc dict dữ liệu gốc (MST None = '')"""
+    return (row.get('supplier_tax_code') or '', row['invoice_number'])
+
+def inserted_invoices(invoices: Iterable[dict], result: BulkInsertResult) -> List[dict]:
+    """
+    Các dict đầu vào của bulk_create đã thực sự được insert
+
+    So theo (MST, số hóa đơn) như _invoice_key: số hóa đơn trùng của nhà cung
+    cấp khác không bị tính nhầm, row trùng trong cùng input chỉ tính row đầu.
+    """
+    remaining = set(result.created_keys)
+    inserted = []
+    for data in invoices:
+        key = _invoice_key(data)
+        if key in remaining:
+            remaining.discard(key)
+            inserted.append(data)
+    return inserted
+
+def _batches(rows: List[dict], size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def _dedupe_rows(rows: List[dict]):
+    """Tách các row trùng (MST, số hóa đơn) trong cùng input (giữ row đầu tiên)"""
+    seen = set()
+    unique, duplicates = [], []
+    for row in rows:
+        if _invoice_key(row) in seen:
+            duplicates.append(row['invoice_number'])
+        else:
+            seen.add(_invoice_key(row))
+            unique.append(row)
+    return unique, duplicates
+
+# Cột được phép sort trong list_page, mỗi cột có index (cột, id)
+INVOICE_SORT_COLUMNS = {
+    'created_at': Invoice.created_at,
+    'invoice_date': Invoice.invoice_date,
+    'total_amount': Invoice.total_amount,
+    'id': Invoice.id,
+}
+
+# Cột được phép lọc bằng giá trị (đều là cột đầu của một index)
+INVOICE_FILTER_COLUMNS = {
+    'status': Invoice.status,
+    'supplier_tax_code': Invoice.supplier_tax_code,
+    'created_by_user_id': Invoice.created_by_user_id,
+    'invoice_number': Invoice.invoice_number,
+}
+
+# Các field client có thể chọn (projection), không trả raw_ocr_text / items
+INVOICE_API_FIELDS = {
+    name: getattr(Invoice, name).label(name) for name in (
+        'id', 'invoice_number', 'invoice_date', 'supplier_name', 'supplier_tax_code',
+        'subtotal', 'tax_amount', 'total_amount', 'account_code', 'category', 'status',
+        'approved_by_username', 'approved_at', 'rejection_reason', 'created_by_user_id',
+        'created_by_username', 'created_at', 'notes'
+    )
+}
+INVOICE_API_FIELDS['has_image'] = Invoice.file_path.isnot(None).label('has_image')
+
+INVOICE_DEFAULT_FIELDS = (
+    'id', 'invoice_number', 'invoice_date', 'supplier_name', 'supplier_tax_code',
+    'category', 'total_amount', 'status', 'created_by_username', 'has_image'
+)
+
+class StatusChange(NamedTuple):
+    """Một hóa đơn vừa được đổi trạng thái (RETURNING của bulk_set_status)"""
+    invoice_id: int
+    invoice_number: str
+    created_by_user_id: int
+
+def _status_update(invoice_ids: Sequence[int], new_status: str, from_status: str,
+                   approver_id: str, approver_username: str, reason: str = None):
+    """
+    UPDATE ... WHERE id IN (...) AND status = from_status RETURNING ...
+    
+    Điều kiện status chặn duyệt/từ chối hai lần khi hai admin bấm cùng lúc:
+    hóa đơn đã được người khác xử lý sẽ không có trong RETURNING.
+    """
+    now = datetime.now()
+    values = {
+        'status': new_status,
+        'approved_by': approver_id,
+        'approved_by_username': approver_username,
+        'approved_at': now,
+        'updated_at': now,
+    }
+    if new_status == 'rejected':
+        values['rejection_reason'] = reason
+    return update(Invoice).where(
+        Invoice.id.in_(invoice_ids),
+        Invoice.status == from_status
+    ).values(**values).returning(
+        Invoice.id, Invoice.invoice_number, Invoice.created_by_user_id
+    ).execution_options(synchronize_session=False)
+
+class InvoicePage(NamedTuple):
+    """Một trang kết quả của list_page"""
+    items: List[dict]
+    next_cursor: Optional[str]  # None nếu là trang cuối
 
 class InvoiceRepository:
     """Repository để xử lý các thao tác với Invoice"""
@@ -17,6 +195,96 @@ class InvoiceRepository:
         logger.info(f"Created invoice: {invoice.invoice_number}")
         return invoice
     
+    @staticmethod
+    def bulk_create(session: Session, invoices: Iterable[dict],
+                    batch_size: int = None) -> BulkInsertResult:
+        """
+        Insert hàng loạt trong một transaction (ZIP/XML, import từ Excel)
+        
+        Dùng INSERT ... ON CONFLICT(supplier_tax_code, invoice_number) DO NOTHING RETURNING theo
+        batch executemany; hóa đơn đã tồn tại được bỏ qua và trả về trong
+        ``duplicates``. Rollback toàn bộ nếu có lỗi.
+        """
+        rows, duplicates = _dedupe_rows(_invoice_rows(invoices))
+        if not rows:
+            return BulkInsertResult([], duplicates)
+        
+        table = Invoice.__table__
+        stmt = upsert_insert(session.bind.dialect.name, table).on_conflict_do_nothing(
+            index_elements=INVOICE_KEY_COLUMNS
+        ).returning(table.c.id, *(table.c[name] for name in INVOICE_KEY_COLUMNS))
+        
+        created_ids = []
+        inserted_keys = []
+        try:
+            for batch in _batches(rows, batch_size or config.BULK_INSERT_BATCH_SIZE):
+                for invoice_id, tax_code, invoice_number in session.execute(stmt, batch):
+                    created_ids.append(invoice_id)
+                    inserted_keys.append((tax_code, invoice_number))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        
+        created = set(inserted_keys)
+        duplicates += [row['invoice_number'] for row in rows if _invoice_key(row) not in created]
+        logger.info(f"Bulk created {len(created_ids)} invoices ({len(duplicates)} duplicates skipped)")
+        return BulkInsertResult(created_ids, duplicates, inserted_keys)
+    
+    @staticmethod
+    def bulk_upsert(session: Session, invoices: Iterable[dict],
+                    update_fields: Sequence[str] = None,
+                    batch_size: int = None) -> BulkInsertResult:
+        """
+        Insert hoặc cập nhật hàng loạt theo (MST, số hóa đơn) trong một transaction
+        
+        Args:
+            update_fields: Các cột được ghi đè khi trùng (mặc định: mọi cột
+                trừ id, khóa, status/duyệt và created_*)
+        
+        Returns:
+            BulkInsertResult, ``duplicates`` là các hóa đơn đã được cập nhật
+        """
+        rows, _ = _dedupe_rows(_invoice_rows(invoices))
+        if not rows:
+            return BulkInsertResult([], [])
+        
+        table = Invoice.__table__
+        if update_fields is None:
+            protected = {'id', 'invoice_number', 'supplier_tax_code', 'status', 'approved_by', 'approved_by_username',
+                         'approved_at', 'rejection_reason', 'created_by_user_id',
+                         'created_by_username', 'created_at'}
+            update_fields = [c.name for c in table.columns if c.name not in protected]
+        
+        stmt = upsert_insert(session.bind.dialect.name, table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=INVOICE_KEY_COLUMNS,
+            set_={name: stmt.excluded[name] for name in update_fields}
+        ).returning(table.c.id, *(table.c[name] for name in INVOICE_KEY_COLUMNS))
+        
+        created_ids, duplicates, created_keys = [], [], []
+        try:
+            for batch in _batches(rows, batch_size or config.BULK_INSERT_BATCH_SIZE):
+                # RETURNING không phân biệt insert/update nên tra trước các khóa đã có
+                existing = {
+                    (tax_code, number) for tax_code, number in session.query(
+                        Invoice.supplier_tax_code, Invoice.invoice_number
+                    ).filter(Invoice.invoice_number.in_([row['invoice_number'] for row in batch]))
+                }
+                for invoice_id, tax_code, invoice_number in session.execute(stmt, batch):
+                    if (tax_code, invoice_number) in existing:
+                        duplicates.append(invoice_number)
+                    else:
+                        created_ids.append(invoice_id)
+                        created_keys.append((tax_code, invoice_number))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        
+        logger.info(f"Bulk upserted {len(created_ids)} new, {len(duplicates)} updated invoices")
+        return BulkInsertResult(created_ids, duplicates, created_keys)
+    
     @staticmethod
     def get_by_id(session: Session, invoice_id: int) -> Optional[Invoice]:
         """Lấy invoice theo ID"""
@@ -56,6 +324,88 @@ class InvoiceRepository:
         """Lấy tất cả invoice"""
         return session.query(Invoice).order_by(Invoice.created_at.desc()).limit(limit).all()
     
+    @staticmethod
+    def bulk_set_status(session: Session, invoice_ids: Iterable[int], new_status: str,
+                        approver_id: str, approver_username: str = None, reason: str = None,
+                        from_status: str = 'pending', commit: bool = True) -> List[StatusChange]:
+        """
+        Duyệt / từ chối nhiều hóa đơn bằng UPDATE theo tập (mỗi batch một câu)
+        
+        Args:
+            commit: False để người gọi ghi thêm outbox / counter trong cùng
+                transaction rồi tự commit
+        
+        Returns:
+            Các hóa đơn thực sự được đổi (bỏ qua hóa đơn không còn ở from_status)
+        """
+        invoice_ids = list(invoice_ids)
+        changes = []
+        try:
+            for batch in _batches(invoice_ids, config.BULK_INSERT_BATCH_SIZE):
+                stmt = _status_update(batch, new_status, from_status, approver_id, approver_username, reason)
+                changes += [StatusChange(*row) for row in session.execute(stmt)]
+            if commit:
+                session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        logger.info(f"Set {len(changes)}/{len(invoice_ids)} invoices to {new_status} by {approver_username}")
+        return changes
+    
+    @staticmethod
+    def list_page(session: Session, fields: Sequence[str] = None, sort: str = 'created_at',
+                  descending: bool = True, cursor: str = None, limit: int = 50,
+                  filters: dict = None, date_from: datetime = None, date_to: datetime = None) -> InvoicePage:
+        """
+        Lấy một trang hóa đơn bằng keyset pagination (không OFFSET)
+        
+        Args:
+            fields: Các field cần lấy (INVOICE_API_FIELDS)
+            sort: Cột sort (INVOICE_SORT_COLUMNS)
+            cursor: next_cursor của trang trước
+            filters: {cột: giá trị} (INVOICE_FILTER_COLUMNS)
+            date_from, date_to: Khoảng invoice_date
+        
+        Raises:
+            ValueError: field / cột sort / cột lọc / cursor không hợp lệ
+        """
+        sort_column = INVOICE_SORT_COLUMNS.get(sort)
+        if sort_column is None:
+            raise ValueError(f"Không sort được theo: {sort}")
+        fields = list(fields or INVOICE_DEFAULT_FIELDS)
+        unknown = [name for name in fields if name not in INVOICE_API_FIELDS]
+        if unknown:
+            raise ValueError(f"Field không hợp lệ: {', '.join(unknown)}")
+        
+        query = session.query(
+            *(INVOICE_API_FIELDS[name] for name in fields),
+            sort_column.label('cursor_value'),
+            Invoice.id.label('cursor_id')
+        )
+        for name, value in (filters or {}).items():
+            if name not in INVOICE_FILTER_COLUMNS:
+                raise ValueError(f"Không lọc được theo: {name}")
+            query = query.filter(INVOICE_FILTER_COLUMNS[name] == value)
+        if date_from:
+            query = query.filter(Invoice.invoice_date >= date_from)
+        if date_to:
+            query = query.filter(Invoice.invoice_date <= date_to)
+        
+        after = keyset_filter(sort_column, Invoice.id, cursor, descending)
+        if after is not None:
+            query = query.filter(after)
+        
+        # Lấy dư 1 dòng để biết còn trang sau không (không cần COUNT)
+        rows = query.order_by(*keyset_order(sort_column, Invoice.id, descending)).limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]._mapping
+            next_cursor = encode_cursor(last['cursor_value'], last['cursor_id'])
+        
+        items = [{name: row._mapping[name] for name in fields} for row in rows]
+        return InvoicePage(items, next_cursor)
+    
     @staticmethod
     def get_recent(session: Session, limit: int = 10) -> List[Invoice]:
         """Lấy danh sách invoice gần đây nhất"""
@@ -136,24 +486,56 @@ class UserRepository:
             user.role = new_role
             session.commit()
             session.refresh(user)
+            permission_cache.invalidate(user.telegram_user_id)
             logger.info(f"Updated role for user {user.username}: {new_role}")
         return user
     
     @staticmethod
     def increment_submitted_count(session: Session, telegram_user_id: int):
-        """Tăng số lượng hóa đơn đã gửi"""
-        user = UserRepository.get_by_telegram_id(session, telegram_user_id)
-        if user:
-            user.total_invoices_submitted = (user.total_invoices_submitted or 0) + 1
-            session.commit()
+        """Tăng số lượng hóa đơn đã gửi (UPDATE nguyên tử, không đọc trước)"""
+        session.query(User).filter(User.telegram_user_id == telegram_user_id).update(
+            {User.total_invoices_submitted: func.coalesce(User.total_invoices_submitted, 0) + 1},
+            synchronize_session=False
+        )
+        session.commit()
     
     @staticmethod
     def increment_approved_count(session: Session, telegram_user_id: int):
-        """Tăng số lượng hóa đơn đã duyệt"""
-        user = UserRepository.get_by_telegram_id(session, telegram_user_id)
-        if user:
-            user.total_invoices_approved = (user.total_invoices_approved or 0) + 1
-            session.commit()
+        """Tăng số lượng hóa đơn đã duyệt (UPDATE nguyên tử, không đọc trước)"""
+        session.query(User).filter(User.telegram_user_id == telegram_user_id).update(
+            {User.total_invoices_approved: func.coalesce(User.total_invoices_approved, 0) + 1},
+            synchronize_session=False
+        )
+        session.commit()
+    
+    @staticmethod
+    def add_approved_counts(session: Session, counts: Dict[int, int]):
+        """
+        Cộng số hóa đơn đã duyệt cho nhiều user (UPDATE nguyên tử, không commit:
+        chạy trong transaction của người gọi)
+        """
+        for telegram_user_id, count in counts.items():
+            session.query(User).filter(User.telegram_user_id == telegram_user_id).update(
+                {User.total_invoices_approved: func.coalesce(User.total_invoices_approved, 0) + count},
+                synchronize_session=False
+            )
+
+
+class NotificationRepository:
+    """Outbox tin nhắn Telegram cho code sync (web admin)"""
+    
+    @staticmethod
+    def enqueue_many(session: Session, messages: Iterable[Tuple[int, str]], kind: str = 'message') -> int:
+        """Thêm các cặp (chat_id, text) vào outbox (không commit: cùng transaction với người gọi)"""
+        now = datetime.now()
+        rows = [
+            {'chat_id': chat_id, 'kind': kind, 'text': text, 'status': 'pending',
+             'attempts': 0, 'next_attempt_at': now, 'created_at': now}
+            for chat_id, text in messages
+        ]
+        if rows:
+            session.execute(Notification.__table__.insert(), rows)
+        return len(rows)
 
 class InvoiceRepositoryExtended:
     """Extended methods cho InvoiceRepository"""
@@ -191,6 +573,43 @@ class InvoiceRepositoryExtended:
         ).scalar()
         return result or 0.0
     
+    @staticmethod
+    def aggregate_amounts(session: Session, dimensions: List[str], start_date: datetime = None,
+                          end_date: datetime = None, period: str = None, status: str = None,
+                          limit: int = None) -> List:
+        """
+        Tổng hợp số lượng và tổng tiền ngay trong database (GROUP BY)
+        
+        Args:
+            dimensions: Các chiều trong AGGREGATE_DIMENSIONS
+            period: Nhóm thêm theo kỳ (day/week/month/quarter/year)
+            limit: Chỉ lấy top N nhóm có tổng tiền lớn nhất
+            
+        Returns:
+            Danh sách row (*dimensions, [period], count, total_amount),
+            sắp xếp giảm dần theo total_amount
+        """
+        group_cols = [AGGREGATE_DIMENSIONS[d].label(d) for d in dimensions]
+        if period:
+            group_cols.append(_period_bucket(session, period).label('period'))
+        
+        total = func.coalesce(func.sum(Invoice.total_amount), 0.0).label('total_amount')
+        query = session.query(*group_cols, func.count(Invoice.id).label('count'), total)
+        
+        if start_date:
+            query = query.filter(Invoice.invoice_date >= start_date)
+        if end_date:
+            query = query.filter(Invoice.invoice_date <= end_date)
+        if status:
+            query = query.filter(Invoice.status == status)
+        if group_cols:
+            query = query.group_by(*group_cols)
+        
+        query = query.order_by(total.desc())
+        if limit:
+            query = query.limit(limit)
+        return query.all()
+    
     @staticmethod
     def get_by_amount_range(session: Session, min_amount: float, max_amount: float) -> List[Invoice]:
         """Lấy hóa đơn trong khoảng giá"""
@@ -0,0 +1,68 @@
+"""
+SQLite production profile
+
+Bot và web admin dùng chung một file SQLite. Mỗi connection mới được áp
+dụng các PRAGMA trong config (WAL, synchronous=NORMAL, busy_timeout, mmap,
+cache, temp_store) để reader không bị writer chặn và writer chờ lock thay
+vì lỗi "database is locked" ngay lập tức. SQLITE_FOREIGN_KEYS bật kiểm tra
+khóa ngoại (mặc định SQLite tắt) để ON DELETE CASCADE có hiệu lực.
+"""
+from typing import List, Tuple
+
+from sqlalchemy import event
+from loguru import logger
+import config
+
+
+def sqlite_pragmas() -> List[Tuple[str, object]]:
+    """Danh sách (pragma, giá trị) theo config"""
+    return [
+        ('journal_mode', config.SQLITE_JOURNAL_MODE),
+        ('synchronous', config.SQLITE_SYNCHRONOUS),
+        ('busy_timeout', config.SQLITE_BUSY_TIMEOUT_MS),
+        ('mmap_size', config.SQLITE_MMAP_SIZE),
+        ('cache_size', config.SQLITE_CACHE_SIZE),
+        ('temp_store', config.SQLITE_TEMP_STORE),
+        ('foreign_keys', 'ON' if config.SQLITE_FOREIGN_KEYS else 'OFF'),
+    ]
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """Listener 'connect': áp dụng PRAGMA cho connection DB-API mới"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in sqlite_pragmas():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def install_sqlite_profile(engine) -> bool:
+    """
+    Gắn profile vào engine (sync engine, hoặc ``async_engine.sync_engine``)
+
+    Returns:
+        True nếu engine là SQLite và profile được bật
+    """
+    if engine.dialect.name != 'sqlite' or not config.SQLITE_PROFILE_ENABLED:
+        return False
+    event.listen(engine, 'connect', apply_sqlite_pragmas)
+    logger.info(
+        "SQLite profile: " + ', '.join(f'{name}={value}' for name, value in sqlite_pragmas())
+    )
+    return True
+
+
+def run_sqlite_maintenance(connection):
+    """
+    PRAGMA optimize + checkpoint WAL (PASSIVE không chặn reader/writer)
+
+    Args:
+        connection: SQLAlchemy Connection
+    """
+    connection.exec_driver_sql('PRAGMA optimize')
+    if config.SQLITE_JOURNAL_MODE.upper() == 'WAL':
+        busy, log_frames, checkpointed = connection.exec_driver_sql(
+            'PRAGMA wal_checkpoint(PASSIVE)'
+        ).fetchone()
+        logger.debug(f"WAL checkpoint: {checkpointed}/{log_frames} frames (busy={busy})")
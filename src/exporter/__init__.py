@@ -1,15 +1,16 @@
 import pandas as pd
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
 from datetime import datetime
 from typing import List
 from pathlib import Path
 from loguru import logger
 import config
 
+from src.database.repository import InvoiceRepository
+from src.exporter.word_report import WordReportBuilder
+from src.exporter.pdf_report import PdfExporter
+
 class ExcelExporter:
     """Xuất dữ liệu ra file Excel"""
     
@@ -52,7 +53,7 @@ class ExcelExporter:
             # Generate output path if not provided
             if not output_path:
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                output_path = config.DATA_DIR / f'invoices_export_{timestamp}.xlsx'
+                output_path = config.TEMP_DIR / f'invoices_export_{timestamp}.xlsx'
             
             # Create Excel file with formatting
             wb = Workbook()
@@ -122,76 +123,27 @@ class WordExporter:
     """Xuất dữ liệu ra file Word"""
     
     @staticmethod
-    def export_invoice_report(invoices: List, output_path: str = None) -> str:
+    def export_invoice_report(invoices: List, output_path: str = None, group_by: str = 'month') -> str:
         """
         Xuất báo cáo hóa đơn ra Word
         
         Args:
             invoices: Danh sách invoice objects
             output_path: Đường dẫn file output (optional)
+            group_by: Nhóm section theo 'month', 'category' hoặc 'supplier'
             
         Returns:
             Đường dẫn file Word đã tạo
         """
         try:
-            doc = Document()
-            
-            # Title
-            title = doc.add_heading('BÁO CÁO HÓA ĐƠN', 0)
-            title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            
-            # Date range
-            date_range = doc.add_paragraph()
-            date_range.add_run(f'Ngày xuất báo cáo: {datetime.now().strftime("%d/%m/%Y %H:%M")}')
-            date_range.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            
-            doc.add_paragraph()  # Blank line
-            
-            # Summary statistics
-            doc.add_heading('Tổng quan', 1)
-            total_invoices = len(invoices)
-            total_amount = sum(inv.total_amount for inv in invoices)
-            
-            summary = doc.add_paragraph()
-            summary.add_run(f'Tổng số hóa đơn: ').bold = True
-            summary.add_run(f'{total_invoices}\n')
-            summary.add_run(f'Tổng giá trị: ').bold = True
-            summary.add_run(f'{total_amount:,.0f} VNĐ\n')
-            
-            doc.add_paragraph()  # Blank line
-            
-            # Invoice details
-            doc.add_heading('Chi tiết hóa đơn', 1)
-            
-            # Create table
-            table = doc.add_table(rows=1, cols=6)
-            table.style = 'Light Grid Accent 1'
-            
-            # Header row
-            header_cells = table.rows[0].cells
-            headers = ['Số HĐ', 'Ngày', 'Nhà cung cấp', 'Mô tả', 'Tài khoản', 'Tổng tiền']
-            for i, header in enumerate(headers):
-                header_cells[i].text = header
-                header_cells[i].paragraphs[0].runs[0].font.bold = True
-            
-            # Data rows
-            for inv in invoices:
-                row_cells = table.add_row().cells
-                row_cells[0].text = inv.invoice_number
-                row_cells[1].text = inv.invoice_date.strftime('%d/%m/%Y') if inv.invoice_date else ''
-                row_cells[2].text = inv.supplier_name
-                row_cells[3].text = inv.description[:50] + '...' if len(inv.description) > 50 else inv.description
-                row_cells[4].text = inv.account_code or ''
-                row_cells[5].text = f'{inv.total_amount:,.0f}'
-            
             # Generate output path if not provided
             if not output_path:
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                output_path = config.DATA_DIR / f'invoices_report_{timestamp}.docx'
+                output_path = config.TEMP_DIR / f'invoices_report_{timestamp}.docx'
             
-            # Save file
-            doc.save(output_path)
-            logger.info(f"Exported invoice report to Word: {output_path}")
+            builder = WordReportBuilder(group_by=group_by)
+            builder.build(invoices, output_path)
+            logger.info(f"Exported {len(invoices)} invoices to Word report: {output_path}")
             
             return str(output_path)
             
@@ -202,18 +154,104 @@ class WordExporter:
 class StatisticsExporter:
     """Xuất thống kê và báo cáo"""
     
+    # Chiều mặc định -> key trong dict summary
+    DEFAULT_DIMENSIONS = ('category', 'account', 'supplier')
+    
+    @staticmethod
+    def _label(value) -> str:
+        """Nhãn hiển thị cho nhóm (NULL/rỗng gộp thành N/A)"""
+        return str(value) if value not in (None, '') else 'N/A'
+    
     @staticmethod
     def generate_monthly_summary(invoices: List) -> dict:
-        """Tạo báo cáo tổng hợp theo tháng"""
-        df = pd.DataFrame([inv.to_dict() for inv in invoices])
+        """Tạo báo cáo tổng hợp từ danh sách invoice objects đã load sẵn"""
+        # Chỉ lấy các cột cần thiết thay vì to_dict() toàn bộ object
+        df = pd.DataFrame({
+            'total_amount': [inv.total_amount or 0.0 for inv in invoices],
+            'category': [inv.category for inv in invoices],
+            'account_code': [inv.account_code for inv in invoices],
+            'supplier_name': [inv.supplier_name for inv in invoices],
+        })
         
         summary = {
             'total_invoices': len(invoices),
-            'total_amount': df['total_amount'].sum(),
-            'average_amount': df['total_amount'].mean(),
-            'by_category': df.groupby('category')['total_amount'].sum().to_dict(),
-            'by_account': df.groupby('account_code')['total_amount'].sum().to_dict(),
-            'by_supplier': df.groupby('supplier_name')['total_amount'].sum().to_dict()
+            'total_amount': float(df['total_amount'].sum()),
+            'average_amount': float(df['total_amount'].mean()) if len(df) else 0.0,
+        }
+        for key, column in [('by_category', 'category'), ('by_account', 'account_code'),
+                            ('by_supplier', 'supplier_name')]:
+            summary[key] = df.groupby(column)['total_amount'].sum().sort_values(ascending=False).to_dict()
+        
+        return summary
+    
+    @staticmethod
+    def generate_summary(session, start_date: datetime = None, end_date: datetime = None,
+                         dimensions=DEFAULT_DIMENSIONS, top_n: int = None, status: str = None) -> dict:
+        """
+        Tạo báo cáo tổng hợp bằng aggregate trong database
+        
+        Không load Invoice objects: mỗi chiều là một câu GROUP BY trả về
+        tối đa top_n dòng, nên bộ nhớ không phụ thuộc số lượng hóa đơn.
+        
+        Args:
+            session: Database session
+            start_date, end_date: Khoảng invoice_date (optional)
+            dimensions: Các chiều cần tổng hợp (category/account/supplier/status/user)
+            top_n: Chỉ giữ N nhóm lớn nhất mỗi chiều (optional)
+            status: Lọc theo trạng thái (optional)
+            
+        Returns:
+            Dict cùng định dạng generate_monthly_summary, các nhóm sắp xếp giảm dần
+        """
+        overall = InvoiceRepository.aggregate_amounts(
+            session, [], start_date, end_date, status=status
+        )[0]
+        count = overall.count or 0
+        total = float(overall.total_amount or 0)
+        
+        summary = {
+            'total_invoices': count,
+            'total_amount': total,
+            'average_amount': total / count if count else 0.0,
         }
         
+        for dimension in dimensions:
+            rows = InvoiceRepository.aggregate_amounts(
+                session, [dimension], start_date, end_date, status=status, limit=top_n
+            )
+            grouped = {}
+            for row in rows:
+                label = StatisticsExporter._label(row[0])
+                grouped[label] = grouped.get(label, 0.0) + float(row.total_amount)
+            summary[f'by_{dimension}'] = grouped
+        
         return summary
+    
+    @staticmethod
+    def aggregate(session, dimensions: List[str], period: str = None, start_date: datetime = None,
+                  end_date: datetime = None, top_n: int = None, status: str = None) -> pd.DataFrame:
+        """
+        Bảng tổng hợp theo nhiều chiều và kỳ bất kỳ
+        
+        Args:
+            dimensions: Danh sách chiều (category/account/supplier/status/user)
+            period: day/week/month/quarter/year (optional)
+            top_n: Top N nhóm theo tổng tiền (trong từng kỳ nếu có period)
+            
+        Returns:
+            DataFrame với các cột dimensions, [period], count, total_amount
+        """
+        # Có period thì top N tính theo từng kỳ, không giới hạn được trong SQL
+        limit = top_n if not period else None
+        rows = InvoiceRepository.aggregate_amounts(
+            session, list(dimensions), start_date, end_date, period=period, status=status, limit=limit
+        )
+        columns = list(dimensions) + (['period'] if period else []) + ['count', 'total_amount']
+        df = pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns)
+        
+        if period:
+            df = df.sort_values(['period', 'total_amount'], ascending=[True, False])
+            if top_n:
+                df = df.groupby('period', sort=False).head(top_n)
+        
+        return df.reset_index(drop=True)
@@ -0,0 +1,369 @@
+"""
+Xuất báo cáo PDF hàng tháng (không cần LibreOffice)
+
+Báo cáo được vẽ trực tiếp bằng reportlab canvas trong một process riêng
+để việc render không chặn event loop của bot hay worker của Flask. Các bảng
+được vẽ lần lượt từng dòng, sang trang mới khi hết chỗ, nên không có bước
+dựng layout (flowables) trước khi vẽ. Reportlab vẫn giữ các trang trong bộ
+nhớ tới khi save() ghi file.
+
+Tối đa PDF_WORKERS process render được giữ lại dùng cho các lần export sau.
+Process render quá PDF_RENDER_TIMEOUT bị kill và thay bằng process mới.
+"""
+import asyncio
+import multiprocessing
+import queue
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+from loguru import logger
+import config
+
+PAGE_MARGIN = 56  # ~2cm
+ROW_HEIGHT = 16
+CHART_TOP_N = 10
+
+# Font hỗ trợ tiếng Việt (Helvetica mặc định không có dấu)
+_FONT_CANDIDATES = [
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/TTF/DejaVuSans.ttf',
+    'C:/Windows/Fonts/arial.ttf',
+    '/Library/Fonts/Arial.ttf',
+]
+
+def _register_fonts() -> Tuple[str, str]:
+    """Đăng ký font TTF, trả về (regular, bold)"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    candidates = [config.PDF_FONT_PATH] if config.PDF_FONT_PATH else []
+    for path in candidates + _FONT_CANDIDATES:
+        if not Path(path).exists():
+            continue
+        pdfmetrics.registerFont(TTFont('Report', path))
+        bold_path = Path(path).with_name(Path(path).stem + '-Bold' + Path(path).suffix)
+        if bold_path.exists():
+            pdfmetrics.registerFont(TTFont('Report-Bold', str(bold_path)))
+            return 'Report', 'Report-Bold'
+        return 'Report', 'Report'
+
+    logger.warning("No TTF font found for PDF report, Vietnamese text may not render")
+    return 'Helvetica', 'Helvetica-Bold'
+
+
+class _PageWriter:
+    """Vẽ nội dung theo dòng, tự động sang trang"""
+
+    def __init__(self, output_path: str, title: str):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+
+        self.font, self.bold = _register_fonts()
+        self.width, self.height = A4
+        self.title = title
+        self.page = 0
+        self.canvas = canvas.Canvas(str(output_path), pagesize=A4, pageCompression=1)
+        self.canvas.setTitle(title)
+        self._start_page()
+
+    def _start_page(self):
+        self.page += 1
+        self.y = self.height - PAGE_MARGIN
+        self.canvas.setFont(self.bold, 9)
+        self.canvas.drawString(PAGE_MARGIN, self.y, self.title)
+        self.canvas.setFont(self.font, 9)
+        self.canvas.drawRightString(self.width - PAGE_MARGIN, self.y, f'Trang {self.page}')
+        self.canvas.line(PAGE_MARGIN, self.y - 4, self.width - PAGE_MARGIN, self.y - 4)
+        self.y -= 28
+
+    def ensure_space(self, height: float):
+        if self.y - height < PAGE_MARGIN:
+            self.canvas.showPage()
+            self._start_page()
+
+    def heading(self, text: str, size: int = 14):
+        self.ensure_space(size + ROW_HEIGHT * 2)
+        self.canvas.setFont(self.bold, size)
+        self.canvas.drawString(PAGE_MARGIN, self.y, text)
+        self.y -= size + 8
+
+    def line(self, label: str, value: str):
+        self.ensure_space(ROW_HEIGHT)
+        self.canvas.setFont(self.font, 11)
+        self.canvas.drawString(PAGE_MARGIN, self.y, label)
+        self.canvas.setFont(self.bold, 11)
+        self.canvas.drawRightString(self.width - PAGE_MARGIN, self.y, value)
+        self.y -= ROW_HEIGHT
+
+    def table(self, headers: Tuple[str, str, str], rows: Iterable[Tuple[str, float, float]]):
+        """Bảng 3 cột: tên, số tiền, tỷ lệ; tiêu đề lặp lại ở mỗi trang"""
+        right = self.width - PAGE_MARGIN
+        amount_x = right - 70
+
+        def draw_header():
+            self.canvas.setFont(self.bold, 10)
+            self.canvas.drawString(PAGE_MARGIN, self.y, headers[0])
+            self.canvas.drawRightString(amount_x, self.y, headers[1])
+            self.canvas.drawRightString(right, self.y, headers[2])
+            self.canvas.line(PAGE_MARGIN, self.y - 4, right, self.y - 4)
+            self.y -= ROW_HEIGHT
+
+        self.ensure_space(ROW_HEIGHT * 2)
+        draw_header()
+        for name, amount, percent in rows:
+            if self.y - ROW_HEIGHT < PAGE_MARGIN:
+                self.canvas.showPage()
+                self._start_page()
+                draw_header()
+            self.canvas.setFont(self.font, 10)
+            self.canvas.drawString(PAGE_MARGIN, self.y, str(name)[:60])
+            self.canvas.drawRightString(amount_x, self.y, f'{amount:,.0f}')
+            self.canvas.drawRightString(right, self.y, f'{percent:.1f}%')
+            self.y -= ROW_HEIGHT
+        self.y -= ROW_HEIGHT
+
+    def bar_chart(self, items: Iterable[Tuple[str, float]]):
+        """Biểu đồ cột ngang cho top N nhóm"""
+        from reportlab.graphics import renderPDF
+        from reportlab.graphics.charts.barcharts import HorizontalBarChart
+        from reportlab.graphics.shapes import Drawing
+
+        items = list(items)
+        if not items:
+            return
+        chart_height = 20 * len(items) + 20
+        self.ensure_space(chart_height + ROW_HEIGHT)
+
+        drawing = Drawing(self.width - 2 * PAGE_MARGIN, chart_height)
+        chart = HorizontalBarChart()
+        chart.x = 170
+        chart.y = 10
+        chart.width = drawing.width - chart.x - 10
+        chart.height = chart_height - 20
+        # HorizontalBarChart vẽ từ dưới lên, đảo ngược để mục lớn nhất ở trên
+        chart.data = [[amount for _, amount in reversed(items)]]
+        chart.categoryAxis.categoryNames = [str(name)[:30] for name, _ in reversed(items)]
+        chart.categoryAxis.labels.fontName = self.font
+        chart.categoryAxis.labels.fontSize = 8
+        chart.valueAxis.labels.fontName = self.font
+        chart.valueAxis.labels.fontSize = 7
+        chart.valueAxis.valueMin = 0
+        chart.valueAxis.labelTextFormat = lambda v: f'{v / 1_000_000:,.1f}tr'
+        drawing.add(chart)
+
+        renderPDF.draw(drawing, self.canvas, PAGE_MARGIN, self.y - chart_height)
+        self.y -= chart_height + ROW_HEIGHT
+
+    def save(self):
+        self.canvas.save()
+
+
+def _sorted_rows(values: dict, total: float):
+    """Sắp xếp giảm dần theo số tiền, trả về iterator (tên, số tiền, %)"""
+    for name, amount in sorted(values.items(), key=lambda kv: kv[1] or 0, reverse=True):
+        amount = float(amount or 0)
+        yield name, amount, (amount / total * 100 if total else 0.0)
+
+
+def render_monthly_report(summary: dict, title: str, output_path: str) -> str:
+    """
+    Render báo cáo PDF (chạy trong worker process)
+
+    Args:
+        summary: Dict thống kê từ StatisticsExporter
+        title: Tiêu đề báo cáo
+        output_path: Đường dẫn file output
+
+    Returns:
+        Đường dẫn file PDF đã tạo
+    """
+    total = float(summary.get('total_amount') or 0)
+    writer = _PageWriter(output_path, title)
+
+    writer.heading(title, 18)
+    writer.line('Ngày xuất báo cáo', datetime.now().strftime('%d/%m/%Y %H:%M'))
+    writer.line('Số lượng hóa đơn', f"{summary.get('total_invoices', 0):,}")
+    writer.line('Tổng giá trị', f'{total:,.0f} VNĐ')
+    writer.line('Trung bình', f"{float(summary.get('average_amount') or 0):,.0f} VNĐ/HĐ")
+    writer.y -= ROW_HEIGHT
+
+    by_category = summary.get('by_category') or {}
+    writer.heading(f'Top {CHART_TOP_N} danh mục chi phí')
+    writer.bar_chart((name, amount) for name, amount, _ in
+                     list(_sorted_rows(by_category, total))[:CHART_TOP_N])
+
+    sections = [
+        ('Theo danh mục', 'Danh mục', by_category),
+        ('Theo tài khoản', 'Tài khoản', summary.get('by_account') or {}),
+        ('Theo nhà cung cấp', 'Nhà cung cấp', summary.get('by_supplier') or {}),
+    ]
+    for heading, label, values in sections:
+        if not values:
+            continue
+        writer.heading(heading)
+        writer.table((label, 'Số tiền (VNĐ)', 'Tỷ lệ'), _sorted_rows(values, total))
+
+    writer.save()
+    return str(output_path)
+
+
+def _serve(conn):
+    """Vòng lặp của process render: nhận tham số, trả (ok, kết quả / lỗi)"""
+    while True:
+        try:
+            args = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send((True, render_monthly_report(*args)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+
+class _RenderWorker:
+    """Một process render, dùng lại được cho nhiều lần export"""
+
+    def __init__(self):
+        # spawn: tránh fork process đang chạy event loop / thread pool
+        context = multiprocessing.get_context('spawn')
+        self._conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child_conn,), daemon=True,
+                                       name='pdf-render')
+        self.process.start()
+        child_conn.close()
+
+    def render(self, args: tuple, timeout: float) -> str:
+        """
+        Render trong process này (blocking)
+
+        Raises:
+            TimeoutError: quá ``timeout`` giây (process đã bị kill)
+            RuntimeError: render lỗi hoặc process đã chết
+        """
+        try:
+            self._conn.send(args)
+            finished = self._conn.poll(timeout)
+            if finished:
+                ok, value = self._conn.recv()
+        except (EOFError, OSError) as e:
+            self.kill()
+            raise RuntimeError(f"PDF render process exited: {e}")
+        if not finished:
+            self.kill()
+            raise TimeoutError(f"PDF render exceeded {timeout}s")
+        if not ok:
+            raise RuntimeError(value)
+        return value
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self._conn.close()
+
+
+class _RenderPool:
+    """Tối đa PDF_WORKERS process render; process treo / chết được thay mới"""
+
+    def __init__(self, size: int):
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: "queue.SimpleQueue[_RenderWorker]" = queue.SimpleQueue()
+
+    def _take(self) -> _RenderWorker:
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return _RenderWorker()
+            if worker.alive:
+                return worker
+            worker.kill()
+
+    def render(self, *args) -> str:
+        with self._slots:
+            worker = self._take()
+            try:
+                return worker.render(args, config.PDF_RENDER_TIMEOUT)
+            finally:
+                # Worker bị kill do timeout thì bỏ, lần sau tạo process mới
+                if worker.alive:
+                    self._idle.put(worker)
+
+
+_pool: Optional[_RenderPool] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> _RenderPool:
+    """Pool dùng chung, khởi tạo lần đầu khi cần"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _RenderPool(config.PDF_WORKERS)
+        return _pool
+
+
+def _to_plain(summary: dict) -> dict:
+    """Chuyển các giá trị numpy/pandas sang kiểu Python để gửi qua process"""
+    plain = {}
+    for key, value in summary.items():
+        if isinstance(value, dict):
+            plain[key] = {str(k): float(v or 0) for k, v in value.items()}
+        elif hasattr(value, 'item'):
+            plain[key] = value.item()
+        else:
+            plain[key] = value
+    return plain
+
+
+class PdfExporter:
+    """Xuất báo cáo PDF"""
+
+    @staticmethod
+    def _output_path(output_path: Optional[str]) -> str:
+        if output_path:
+            return str(output_path)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return str(config.TEMP_DIR / f'monthly_report_{timestamp}.pdf')
+
+    @staticmethod
+    def export_monthly_report(summary: dict, title: str, output_path: str = None) -> str:
+        """
+        Xuất báo cáo PDF trong worker process (blocking)
+
+        Args:
+            summary: Dict thống kê từ StatisticsExporter
+            title: Tiêu đề báo cáo
+            output_path: Đường dẫn file output (optional)
+
+        Returns:
+            Đường dẫn file PDF đã tạo
+        """
+        try:
+            output_path = PdfExporter._output_path(output_path)
+            result = _get_pool().render(_to_plain(summary), title, output_path)
+            logger.info(f"Exported PDF report: {result}")
+            return result
+        except Exception as e:
+            logger.error(f"Error exporting to PDF: {e}")
+            raise
+
+    @staticmethod
+    async def export_monthly_report_async(summary: dict, title: str, output_path: str = None) -> str:
+        """Giống export_monthly_report nhưng không chặn event loop"""
+        try:
+            output_path = PdfExporter._output_path(output_path)
+            # Process render tự áp dụng PDF_RENDER_TIMEOUT, thread chỉ chờ kết quả
+            result = await asyncio.to_thread(
+                _get_pool().render, _to_plain(summary), title, output_path
+            )
+            logger.info(f"Exported PDF report: {result}")
+            return result
+        except Exception as e:
+            logger.error(f"Error exporting to PDF: {e}")
+            raise
@@ -0,0 +1,253 @@
+"""
+Engine tạo báo cáo Word theo nhóm (tháng / danh mục / nhà cung cấp)
+
+Bảng chi tiết được sinh trực tiếp dưới dạng XML (WordprocessingML) thay vì
+gọi ``table.add_row()`` cho từng hóa đơn, nên chi phí tăng tuyến tính theo
+số dòng. Khi dữ liệu vượt ``config.WORD_REPORT_DETAIL_LIMIT`` dòng, báo cáo
+chỉ gồm các dòng tổng hợp cho mỗi nhóm.
+"""
+import re
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional
+from xml.sax.saxutils import escape
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from loguru import logger
+import config
+
+# Ký tự điều khiển không hợp lệ trong XML (thường gặp trong text OCR)
+_INVALID_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+TABLE_STYLE = 'Light Grid Accent 1'
+TEMPLATE_NAME = 'invoice_report.docx'
+
+
+def _month_key(inv):
+    if not inv.invoice_date:
+        return ('9999-99', 'Không rõ ngày')
+    return (inv.invoice_date.strftime('%Y-%m'), f'Tháng {inv.invoice_date.strftime("%m/%Y")}')
+
+
+def _category_key(inv):
+    label = inv.category or 'Chưa phân loại'
+    return (label.lower(), label)
+
+
+def _supplier_key(inv):
+    label = inv.supplier_name or 'N/A'
+    return (label.lower(), label)
+
+
+# group_by -> (hàm lấy (sort_key, label), tiêu đề nhóm)
+GROUPINGS = {
+    'month': (_month_key, 'Theo tháng'),
+    'category': (_category_key, 'Theo danh mục'),
+    'supplier': (_supplier_key, 'Theo nhà cung cấp'),
+}
+
+
+class _Group:
+    """Tích lũy số liệu của một nhóm trong một lần duyệt"""
+    __slots__ = ('label', 'count', 'subtotal', 'tax_amount', 'total_amount', 'rows')
+
+    def __init__(self, label: str):
+        self.label = label
+        self.count = 0
+        self.subtotal = 0.0
+        self.tax_amount = 0.0
+        self.total_amount = 0.0
+        self.rows = []
+
+
+def _clean(value) -> str:
+    """Chuyển giá trị sang text an toàn cho XML"""
+    if value is None:
+        return ''
+    return escape(_INVALID_XML_CHARS.sub('', str(value)))
+
+
+def _short(text: Optional[str], length: int = 50) -> str:
+    """Cắt ngắn mô tả, chấp nhận None"""
+    if not text:
+        return ''
+    return text[:length] + '...' if len(text) > length else text
+
+
+def _cell_xml(text: str, bold: bool = False, align_right: bool = False) -> str:
+    ppr = '<w:pPr><w:jc w:val="right"/></w:pPr>' if align_right else ''
+    rpr = '<w:rPr><w:b/></w:rPr>' if bold else ''
+    return (
+        '<w:tc><w:tcPr><w:tcW w:w="0" w:type="auto"/></w:tcPr>'
+        f'<w:p>{ppr}<w:r>{rpr}<w:t xml:space="preserve">{text}</w:t></w:r></w:p></w:tc>'
+    )
+
+
+def build_table_xml(headers: List[str], rows: Iterable[tuple], style_id: Optional[str] = None,
+                    right_aligned: Iterable[int] = ()) -> str:
+    """
+    Sinh XML cho một bảng Word
+
+    Args:
+        headers: Tiêu đề cột
+        rows: Các dòng dữ liệu (tuple text đã làm sạch)
+        style_id: Style ID của bảng (optional)
+        right_aligned: Chỉ số các cột căn phải (cột tiền)
+
+    Returns:
+        Chuỗi XML của phần tử ``w:tbl``
+    """
+    right_aligned = set(right_aligned)
+    style = f'<w:tblStyle w:val="{style_id}"/>' if style_id else ''
+    parts = [
+        f'<w:tbl {nsdecls("w")}>',
+        f'<w:tblPr>{style}<w:tblW w:w="0" w:type="auto"/><w:tblLook w:val="04A0"/></w:tblPr>',
+        '<w:tblGrid>', '<w:gridCol/>' * len(headers), '</w:tblGrid>',
+        # Dòng tiêu đề lặp lại ở đầu mỗi trang
+        '<w:tr><w:trPr><w:tblHeader/></w:trPr>',
+    ]
+    parts.extend(_cell_xml(_clean(h), bold=True) for h in headers)
+    parts.append('</w:tr>')
+
+    for row in rows:
+        parts.append('<w:tr>')
+        parts.extend(_cell_xml(value, align_right=i in right_aligned) for i, value in enumerate(row))
+        parts.append('</w:tr>')
+
+    parts.append('</w:tbl>')
+    return ''.join(parts)
+
+
+class WordReportBuilder:
+    """Tạo báo cáo Word từ template với các section theo nhóm"""
+
+    DETAIL_HEADERS = ['Số HĐ', 'Ngày', 'Nhà cung cấp', 'Mô tả', 'Tài khoản', 'Tổng tiền']
+    SUMMARY_HEADERS = ['Nhóm', 'Số HĐ', 'Tiền trước thuế', 'Tiền thuế', 'Tổng tiền', 'Trung bình']
+
+    def __init__(self, group_by: str = 'month', detail_limit: Optional[int] = None,
+                 template_path: Optional[str] = None):
+        if group_by not in GROUPINGS:
+            raise ValueError(f"group_by không hợp lệ: {group_by} (month/category/supplier)")
+        self.group_by = group_by
+        self.detail_limit = config.WORD_REPORT_DETAIL_LIMIT if detail_limit is None else detail_limit
+        self.template_path = Path(template_path) if template_path else config.TEMPLATES_DIR / TEMPLATE_NAME
+
+    def _new_document(self):
+        """Mở template nếu có, ngược lại dùng template mặc định của python-docx"""
+        if self.template_path.exists():
+            logger.debug(f"Using Word template: {self.template_path}")
+            return Document(str(self.template_path))
+        return Document()
+
+    @staticmethod
+    def _style_id(doc) -> Optional[str]:
+        try:
+            return doc.styles[TABLE_STYLE].style_id
+        except KeyError:
+            return None
+
+    @staticmethod
+    def _append_table(doc, table_xml: str):
+        """Chèn bảng XML vào cuối body (trước sectPr)"""
+        anchor = doc.add_paragraph()
+        anchor._p.addprevious(parse_xml(table_xml))
+
+    def _collect(self, invoices: Iterable, with_rows: bool):
+        """Gom nhóm hóa đơn trong một lần duyệt"""
+        key_func = GROUPINGS[self.group_by][0]
+        groups = {}
+        for inv in invoices:
+            sort_key, label = key_func(inv)
+            group = groups.get(sort_key)
+            if group is None:
+                group = groups[sort_key] = _Group(label)
+            total = inv.total_amount or 0.0
+            group.count += 1
+            group.subtotal += inv.subtotal or 0.0
+            group.tax_amount += inv.tax_amount or 0.0
+            group.total_amount += total
+            if with_rows:
+                group.rows.append((
+                    _clean(inv.invoice_number),
+                    inv.invoice_date.strftime('%d/%m/%Y') if inv.invoice_date else '',
+                    _clean(inv.supplier_name),
+                    _clean(_short(inv.description)),
+                    _clean(inv.account_code),
+                    f'{total:,.0f}',
+                ))
+        return OrderedDict(sorted(groups.items()))
+
+    def build(self, invoices: List, output_path: str) -> str:
+        """
+        Tạo file báo cáo
+
+        Args:
+            invoices: Danh sách invoice objects
+            output_path: Đường dẫn file output
+
+        Returns:
+            Đường dẫn file Word đã tạo
+        """
+        with_rows = len(invoices) <= self.detail_limit
+        groups = self._collect(invoices, with_rows)
+
+        doc = self._new_document()
+        style_id = self._style_id(doc)
+
+        title = doc.add_heading('BÁO CÁO HÓA ĐƠN', 0)
+        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+        date_range = doc.add_paragraph()
+        date_range.add_run(f'Ngày xuất báo cáo: {datetime.now().strftime("%d/%m/%Y %H:%M")}')
+        date_range.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+        # Tổng quan
+        doc.add_heading('Tổng quan', 1)
+        total_amount = sum(g.total_amount for g in groups.values())
+        summary = doc.add_paragraph()
+        summary.add_run('Tổng số hóa đơn: ').bold = True
+        summary.add_run(f'{len(invoices)}\n')
+        summary.add_run('Tổng giá trị: ').bold = True
+        summary.add_run(f'{total_amount:,.0f} VNĐ')
+
+        # Bảng tổng hợp theo nhóm
+        doc.add_heading(f'Tổng hợp {GROUPINGS[self.group_by][1].lower()}', 1)
+        summary_rows = (
+            (
+                _clean(g.label),
+                f'{g.count:,}',
+                f'{g.subtotal:,.0f}',
+                f'{g.tax_amount:,.0f}',
+                f'{g.total_amount:,.0f}',
+                f'{(g.total_amount / g.count if g.count else 0):,.0f}',
+            )
+            for g in groups.values()
+        )
+        self._append_table(doc, build_table_xml(
+            self.SUMMARY_HEADERS, summary_rows, style_id, right_aligned=(1, 2, 3, 4, 5)
+        ))
+
+        if not with_rows:
+            note = doc.add_paragraph()
+            note.add_run(
+                f'Báo cáo có {len(invoices):,} hóa đơn (vượt {self.detail_limit:,}), '
+                'chỉ hiển thị số liệu tổng hợp. Dùng /excel để xem chi tiết.'
+            ).italic = True
+        else:
+            # Chi tiết từng nhóm
+            doc.add_heading('Chi tiết hóa đơn', 1)
+            for group in groups.values():
+                doc.add_heading(group.label, 2)
+                subtotal = doc.add_paragraph()
+                subtotal.add_run(f'{group.count} hóa đơn - Tổng: ')
+                subtotal.add_run(f'{group.total_amount:,.0f} VNĐ').bold = True
+                self._append_table(doc, build_table_xml(
+                    self.DETAIL_HEADERS, group.rows, style_id, right_aligned=(5,)
+                ))
+
+        doc.save(output_path)
+        return str(output_path)
@@ -1,3 +1,4 @@
+from io import BytesIO
 from pathlib import Path
 from typing import Optional
 from loguru import logger
@@ -32,12 +33,14 @@ class OCRProcessor:
             self.reader = None
             self.mode = "fallback"
     
-    def extract_text_from_image(self, image_path: str) -> Optional[str]:
+    IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']
+    
+    def extract_text_from_image(self, image_path) -> Optional[str]:
         """
         Trích xuất text từ hình ảnh
         
         Args:
-            image_path: Đường dẫn đến file ảnh
+            image_path: Đường dẫn đến file ảnh hoặc file-like object (BytesIO)
             
         Returns:
             Text được trích xuất hoặc None nếu có lỗi
@@ -84,23 +87,27 @@ class OCRProcessor:
             logger.error(f"Error extracting text from image: {e}")
             return None
     
-    def extract_text_from_pdf(self, pdf_path: str) -> Optional[str]:
+    def extract_text_from_pdf(self, pdf_path: str = None, pdf_bytes: bytes = None) -> Optional[str]:
         """
         Trích xuất text từ PDF
         
         Args:
             pdf_path: Đường dẫn đến file PDF
+            pdf_bytes: Nội dung PDF trong bộ nhớ (thay cho pdf_path)
             
         Returns:
             Text được trích xuất hoặc None nếu có lỗi
         """
         try:
-            from pdf2image import convert_from_path
+            from pdf2image import convert_from_path, convert_from_bytes
             
-            logger.info(f"Converting PDF to images: {pdf_path}")
+            logger.info(f"Converting PDF to images: {pdf_path or f'<{len(pdf_bytes)} bytes>'}")
             
             # Convert PDF sang images
-            images = convert_from_path(pdf_path)
+            if pdf_bytes is not None:
+                images = convert_from_bytes(pdf_bytes)
+            else:
+                images = convert_from_path(pdf_path)
             
             all_text = []
             for i, image in enumerate(images):
@@ -142,11 +149,31 @@ class OCRProcessor:
         # Check file extension
         if path.suffix.lower() == '.pdf':
             return self.extract_text_from_pdf(file_path)
-        elif path.suffix.lower() in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']:
+        elif path.suffix.lower() in self.IMAGE_EXTENSIONS:
             return self.extract_text_from_image(file_path)
         else:
             logger.error(f"Unsupported file format: {path.suffix}")
             return None
+    
+    def process_bytes(self, data: bytes, filename: str) -> Optional[str]:
+        """
+        Xử lý nội dung file trong bộ nhớ (VD: file trong ZIP), không ghi ra đĩa
+        
+        Args:
+            data: Nội dung file
+            filename: Tên file, dùng để nhận dạng định dạng
+            
+        Returns:
+            Text được trích xuất hoặc None nếu có lỗi
+        """
+        suffix = Path(filename).suffix.lower()
+        if suffix == '.pdf':
+            return self.extract_text_from_pdf(pdf_bytes=data)
+        elif suffix in self.IMAGE_EXTENSIONS:
+            return self.extract_text_from_image(BytesIO(data))
+        else:
+            logger.error(f"Unsupported file format: {suffix}")
+            return None
 
 # Global OCR instance
 ocr_processor = OCRProcessor()
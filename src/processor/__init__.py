@@ -1,5 +1,6 @@
 import json
 import re
+import xml.etree.ElementTree as ET
 from datetime import datetime
 from typing import Optional, Dict
 from loguru import logger
@@ -62,6 +63,69 @@ class DataProcessor:
             logger.error(f"Error extracting invoice data: {e}")
             return None
     
+    def extract_invoice_data_from_xml(self, xml_content: bytes) -> Optional[Dict]:
+        """
+        Đọc hóa đơn điện tử XML (định dạng HDon theo TT78/NĐ123), không cần AI
+        
+        Args:
+            xml_content: Nội dung file XML
+            
+        Returns:
+            Dictionary chứa thông tin hóa đơn hoặc None nếu không đúng định dạng
+        """
+        try:
+            root = ET.fromstring(xml_content)
+        except ET.ParseError as e:
+            logger.error(f"Invalid invoice XML: {e}")
+            return None
+        
+        # Bỏ namespace để tìm theo tên thẻ
+        for element in root.iter():
+            if isinstance(element.tag, str) and '}' in element.tag:
+                element.tag = element.tag.split('}', 1)[1]
+        
+        general = root.find('.//TTChung')
+        content = root.find('.//NDHDon')
+        if general is None or content is None:
+            logger.warning("XML is not an e-invoice (missing TTChung/NDHDon)")
+            return None
+        
+        def text(parent, path):
+            if parent is None:
+                return None
+            value = parent.findtext(path)
+            return value.strip() if value else None
+        
+        def amount(parent, path):
+            value = text(parent, path)
+            try:
+                return float(value) if value else 0.0
+            except ValueError:
+                return self._parse_amount(value)
+        
+        seller = content.find('NBan')
+        totals = content.find('TToan')
+        item_names = [text(item, 'THHDVu') for item in content.iter('HHDVu')]
+        item_names = [name for name in item_names if name]
+        tax_rate = text(content, './/TSuat') or '10'
+        
+        data = {
+            'invoice_number': text(general, 'SHDon'),
+            'invoice_date': (text(general, 'NLap') or '')[:10] or None,
+            'supplier_name': text(seller, 'Ten') or 'N/A',
+            'supplier_tax_code': text(seller, 'MST') or '',
+            'supplier_address': text(seller, 'DChi') or '',
+            'subtotal': amount(totals, 'TgTCThue'),
+            'tax_rate': self._parse_amount(tax_rate.rstrip('%')),
+            'tax_amount': amount(totals, 'TgTThue'),
+            'total_amount': amount(totals, 'TgTTTBSo'),
+            'description': ', '.join(item_names),
+            'items': json.dumps(item_names, ensure_ascii=False),
+        }
+        invoice_data = self._validate_and_clean(data)
+        logger.info(f"Extracted XML invoice data: {invoice_data['invoice_number']}")
+        return invoice_data
+    
     def _create_extraction_prompt(self, ocr_text: str) -> str:
         """Tạo prompt cho AI"""
         return f"""
@@ -138,7 +202,9 @@ Trả về CHÍNH XÁC theo định dạng JSON sau (không thêm text nào khá
         
         # Supplier info
         cleaned['supplier_name'] = str(data.get('supplier_name', 'N/A')).strip()
-        cleaned['supplier_tax_code'] = str(data.get('supplier_tax_code', '')).strip()
+        # MST là một phần của khóa (supplier_tax_code, invoice_number): null -> ''
+        tax_code = str(data.get('supplier_tax_code') or '').strip()
+        cleaned['supplier_tax_code'] = '' if tax_code.lower() in ['none', 'null'] else tax_code
         cleaned['supplier_address'] = str(data.get('supplier_address', '')).strip()
         
         # Financial data
@@ -177,6 +243,11 @@ Trả về CHÍNH XÁC theo định dạng JSON sau (không thêm text nào khá
         except:
             return 0.0
     
+    @staticmethod
+    def is_generated_invoice_number(invoice_number: str) -> bool:
+        """Số hóa đơn do bot tự sinh (AI không đọc được số)"""
+        return bool(re.fullmatch(r'INV-\d{14}', invoice_number or ''))
+    
     def _generate_invoice_number(self) -> str:
         """Tạo số hóa đơn tự động"""
         timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
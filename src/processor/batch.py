@@ -0,0 +1,95 @@
+"""
+Xử lý file ZIP chứa nhiều hóa đơn (ảnh, PDF, XML hóa đơn điện tử)
+
+Archive được đọc trực tiếp trong bộ nhớ bằng zipfile, từng file được giải
+nén khi cần xử lý, không giải nén toàn bộ ra đĩa. OCR và gọi AI chạy trong
+thread pool qua giới hạn đồng thời chung của bot (src/processor/concurrency.py).
+"""
+import asyncio
+import hashlib
+import zipfile
+from io import BytesIO
+from pathlib import Path
+from typing import List, Tuple
+import config
+
+from src.ocr import ocr_processor, OCRProcessor
+from src.processor import data_processor
+from src.processor.concurrency import run_llm, run_ocr
+from src.processor.image_hash import dhash
+
+SUPPORTED_EXTENSIONS = tuple(OCRProcessor.IMAGE_EXTENSIONS) + ('.pdf', '.xml')
+
+# Tỷ lệ nén tối đa cho một file (chống zip bomb)
+MAX_COMPRESSION_RATIO = 100
+
+
+def content_hash(data: bytes) -> str:
+    """SHA-256 của nội dung file, dùng để phát hiện file gửi trùng"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def list_archive_members(archive: zipfile.ZipFile) -> Tuple[List[zipfile.ZipInfo], List[str]]:
+    """
+    Lấy danh sách file hóa đơn trong ZIP (chỉ đọc central directory)
+
+    Returns:
+        (members, skipped): file được hỗ trợ và tên các file bị bỏ qua
+
+    Raises:
+        ValueError: ZIP vượt giới hạn số file / dung lượng giải nén
+    """
+    members, skipped = [], []
+    total_size = 0
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        name = Path(info.filename)
+        if name.name.startswith('.') or '__MACOSX' in name.parts:
+            continue
+        if name.suffix.lower() not in SUPPORTED_EXTENSIONS:
+            skipped.append(info.filename)
+            continue
+        if info.compress_size and info.file_size / info.compress_size > MAX_COMPRESSION_RATIO:
+            raise ValueError(f"File {info.filename} có tỷ lệ nén bất thường")
+
+        members.append(info)
+        total_size += info.file_size
+
+    if len(members) > config.ZIP_MAX_FILES:
+        raise ValueError(f"ZIP có {len(members)} file, tối đa {config.ZIP_MAX_FILES} file")
+    if total_size > config.ZIP_MAX_UNCOMPRESSED_MB * 1024 * 1024:
+        raise ValueError(f"Dung lượng giải nén vượt quá {config.ZIP_MAX_UNCOMPRESSED_MB}MB")
+    return members, skipped
+
+
+async def extract_member(filename: str, data: bytes) -> dict:
+    """
+    Trích xuất thông tin hóa đơn từ một file trong ZIP
+
+    XML hóa đơn điện tử được đọc trực tiếp, ảnh/PDF qua OCR + AI.
+
+    Returns:
+        invoice_data (đã có raw_ocr_text)
+
+    Raises:
+        ValueError: không đọc được hóa đơn (message dùng cho báo cáo)
+    """
+    if Path(filename).suffix.lower() == '.xml':
+        invoice_data = await asyncio.to_thread(data_processor.extract_invoice_data_from_xml, data)
+        if not invoice_data:
+            raise ValueError("XML không đúng định dạng hóa đơn điện tử")
+        invoice_data['raw_ocr_text'] = data.decode('utf-8', errors='replace')
+        return invoice_data
+
+    ocr_text = await run_ocr(ocr_processor.process_bytes, data, filename)
+    if not ocr_text:
+        raise ValueError("Không đọc được văn bản")
+
+    invoice_data = await run_llm(data_processor.extract_invoice_data, ocr_text)
+    if not invoice_data:
+        raise ValueError("Không trích xuất được thông tin hóa đơn")
+    invoice_data['raw_ocr_text'] = ocr_text
+    if Path(filename).suffix.lower() in OCRProcessor.IMAGE_EXTENSIONS:
+        invoice_data['image_hash'] = await asyncio.to_thread(dhash, BytesIO(data))
+    return invoice_data
@@ -0,0 +1,28 @@
+"""
+Giới hạn số OCR / gọi AI chạy đồng thời trong process bot
+
+OCR (EasyOCR) chiếm CPU/RAM và API AI có quota theo phút, nên dù có bao
+nhiêu upload cùng lúc cũng chỉ OCR_CONCURRENCY / LLM_CONCURRENCY việc chạy
+song song. Các hàm sync được chạy qua asyncio.to_thread, không chặn event loop.
+"""
+import asyncio
+from typing import Any, Callable, TypeVar
+
+import config
+
+T = TypeVar('T')
+
+ocr_slots = asyncio.Semaphore(config.OCR_CONCURRENCY)
+llm_slots = asyncio.Semaphore(config.LLM_CONCURRENCY)
+
+
+async def run_ocr(func: Callable[..., T], *args: Any) -> T:
+    """Chạy bước OCR trong thread khi có slot trống"""
+    async with ocr_slots:
+        return await asyncio.to_thread(func, *args)
+
+
+async def run_llm(func: Callable[..., T], *args: Any) -> T:
+    """Chạy bước trích xuất bằng AI trong thread khi có slot trống"""
+    async with llm_slots:
+        return await asyncio.to_thread(func, *args)
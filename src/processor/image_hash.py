@@ -0,0 +1,37 @@
+"""
+Perceptual hash (dHash) cho ảnh hóa đơn
+
+Hai file khác nhau của cùng một ảnh (nén lại, resize khi gửi qua Telegram)
+có content hash khác nhau nhưng dHash gần như giống nhau.
+"""
+from typing import Optional
+from loguru import logger
+from PIL import Image
+
+HASH_SIZE = 8  # 8x8 bit = 64-bit hash
+
+
+def dhash(image_source) -> Optional[str]:
+    """
+    Tính difference hash 64-bit
+
+    Args:
+        image_source: Đường dẫn hoặc file-like object (BytesIO)
+
+    Returns:
+        Chuỗi hex 16 ký tự, None nếu không đọc được ảnh
+    """
+    try:
+        with Image.open(image_source) as image:
+            gray = image.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+            pixels = list(gray.getdata())
+    except Exception as e:
+        logger.warning(f"Cannot compute image hash: {e}")
+        return None
+
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f'{value:016x}'
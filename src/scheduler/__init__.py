@@ -0,0 +1,127 @@
+"""
+Scheduler chạy job định kỳ trong process bot
+
+Mỗi vòng (SCHEDULER_TICK_SECONDS) scheduler gia hạn lease trong bảng
+scheduler_locks; chỉ instance đang giữ lease (leader) chạy job. Mỗi slot lịch
+của job được ghi vào job_runs (unique theo job + slot) trong cùng transaction
+với tin nhắn outbox của job, nên slot chỉ chạy một lần dù restart bot, vòng
+lặp trễ hay leader đổi giữa chừng.
+"""
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, List, NamedTuple
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+import config
+
+from src.database import async_db_manager, AsyncDatabaseManager
+from src.database.async_repository import AsyncJobRepository
+from src.scheduler.cron import CronSchedule
+from src.scheduler import jobs
+
+LOCK_NAME = 'scheduler'
+
+# Slot bị lỡ (bot tắt, vòng lặp trễ) trong khoảng này vẫn được chạy bù
+MISFIRE_GRACE_SECONDS = 600
+
+
+class Job(NamedTuple):
+    """Job định kỳ: ``func(session, slot)`` chạy trong transaction của slot"""
+    name: str
+    schedule: CronSchedule
+    func: Callable[[AsyncSession, datetime], Awaitable[Any]]
+
+
+def default_jobs() -> List[Job]:
+    """Các job theo config"""
+    return [
+        Job('daily_summary', CronSchedule(config.DAILY_SUMMARY_CRON), jobs.daily_summary),
+        Job('pending_reminder', CronSchedule(config.PENDING_REMINDER_CRON), jobs.pending_reminder),
+        Job('budget_check', CronSchedule(config.BUDGET_ALERT_CRON), jobs.budget_alerts),
+    ]
+
+
+class Scheduler:
+    """Chạy job theo lịch cron, một leader giữa các instance bot"""
+
+    def __init__(self, job_list: List[Job] = None, db: AsyncDatabaseManager = async_db_manager,
+                 owner: str = None):
+        self.jobs = job_list if job_list is not None else default_jobs()
+        self.db = db
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+    async def acquire_leadership(self) -> bool:
+        """Giữ/gia hạn lease leader"""
+        async with self.db.session() as session:
+            leader = await AsyncJobRepository.acquire_lock(
+                session, LOCK_NAME, self.owner, config.SCHEDULER_LOCK_TTL_SECONDS
+            )
+        if leader != self.is_leader:
+            logger.info(f"Scheduler {self.owner}: {'is now' if leader else 'is no longer'} leader")
+        self.is_leader = leader
+        return leader
+
+    async def release(self):
+        """Trả lease khi tắt bot"""
+        if not self.is_leader:
+            return
+        async with self.db.session() as session:
+            await AsyncJobRepository.release_lock(session, LOCK_NAME, self.owner)
+        self.is_leader = False
+
+    async def run_job(self, job: Job, slot: datetime) -> bool:
+        """
+        Chạy job cho một slot nếu slot đó chưa chạy
+
+        Returns:
+            True nếu job đã chạy xong ở lần gọi này
+        """
+        run_key = slot.strftime('%Y-%m-%dT%H:%M')
+        try:
+            async with self.db.session() as session:
+                if not await AsyncJobRepository.claim_run(session, job.name, run_key, self.owner):
+                    return False
+                result = await job.func(session, slot)
+        except Exception as e:
+            logger.error(f"Job {job.name} ({run_key}) failed: {e}")
+            # Ghi slot lỗi để không chạy lại liên tục trong khoảng bù
+            async with self.db.session() as session:
+                await AsyncJobRepository.mark_failed(session, job.name, run_key, self.owner, str(e))
+            return False
+
+        logger.info(f"Job {job.name} ({run_key}) done: {result}")
+        return True
+
+    async def run_due(self, now: datetime = None) -> List[str]:
+        """Chạy các job có slot đến hạn (nếu đang là leader)"""
+        now = now or datetime.now()
+        if not await self.acquire_leadership():
+            return []
+
+        ran = []
+        for job in self.jobs:
+            slot = job.schedule.previous_slot(now, timedelta(seconds=MISFIRE_GRACE_SECONDS))
+            if slot and await self.run_job(job, slot):
+                ran.append(job.name)
+        return ran
+
+    async def run(self):
+        """Vòng lặp scheduler (chạy như background task)"""
+        now = datetime.now()
+        for job in self.jobs:
+            logger.info(f"Job {job.name} ({job.schedule.expression}): next run {job.schedule.next_after(now)}")
+
+        while True:
+            try:
+                await self.run_due()
+            except Exception as e:
+                logger.error(f"Scheduler error: {e}")
+            await asyncio.sleep(config.SCHEDULER_TICK_SECONDS)
+
+
+__all__ = ['CronSchedule', 'Job', 'Scheduler', 'default_jobs']
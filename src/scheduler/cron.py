@@ -0,0 +1,104 @@
+"""
+Biểu thức cron 5 trường: phút giờ ngày tháng thứ
+
+Hỗ trợ ``*``, danh sách (``9,14``), khoảng (``1-5``) và bước (``*/15``,
+``0-30/10``). Thứ theo quy ước cron: 0 (hoặc 7) = Chủ nhật. Khi cả ngày
+trong tháng và thứ đều bị giới hạn thì khớp một trong hai (như cron).
+"""
+from datetime import datetime, timedelta
+from typing import FrozenSet, Optional, Tuple
+
+# (min, max) của từng trường
+FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+# Tìm slot kế tiếp trong tối đa 4 năm (đủ cho '0 0 29 2 *')
+MAX_LOOKAHEAD_DAYS = 366 * 4 + 1
+
+
+def _parse_field(spec: str, low: int, high: int) -> FrozenSet[int]:
+    values = set()
+    for part in spec.split(','):
+        expr, _, step_spec = part.partition('/')
+        step = int(step_spec) if step_spec else 1
+        if step < 1:
+            raise ValueError(f"Bước không hợp lệ: '{part}'")
+
+        if expr == '*':
+            start, end = low, high
+        elif '-' in expr:
+            start, end = (int(value) for value in expr.split('-', 1))
+        else:
+            start = int(expr)
+            end = high if step_spec else start
+
+        if not low <= start <= end <= high:
+            raise ValueError(f"Giá trị ngoài khoảng {low}-{high}: '{part}'")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronSchedule:
+    """Lịch chạy theo biểu thức cron"""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Biểu thức cron cần 5 trường: '{expression}'")
+
+        try:
+            parsed: Tuple[FrozenSet[int], ...] = tuple(
+                _parse_field(spec, low, high) for spec, (low, high) in zip(fields, FIELD_RANGES)
+            )
+        except ValueError as e:
+            raise ValueError(f"Biểu thức cron không hợp lệ '{expression}': {e}")
+
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def _day_matches(self, dt: datetime) -> bool:
+        if dt.month not in self.months:
+            return False
+        day_ok = dt.day in self.days
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        if self._any_day:
+            return weekday_ok
+        if self._any_weekday:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def matches(self, dt: datetime) -> bool:
+        return self._day_matches(dt) and dt.hour in self.hours and dt.minute in self.minutes
+
+    def next_after(self, dt: datetime) -> datetime:
+        """Slot đầu tiên sau ``dt`` (tính theo phút)"""
+        start = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(MAX_LOOKAHEAD_DAYS):
+            if self._day_matches(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"Biểu thức cron không bao giờ khớp: '{self.expression}'")
+
+    def previous_slot(self, dt: datetime, within: timedelta) -> Optional[datetime]:
+        """
+        Slot gần nhất <= ``dt`` trong khoảng ``within`` trở lại (None nếu không có)
+
+        Dùng để không bỏ lỡ slot khi vòng lặp scheduler bị trễ một chút.
+        """
+        candidate = dt.replace(second=0, microsecond=0)
+        earliest = dt - within
+        while candidate >= earliest:
+            if self.matches(candidate):
+                return candidate
+            candidate -= timedelta(minutes=1)
+        return None
+
+    def __repr__(self):
+        return f"<CronSchedule '{self.expression}'>"
@@ -0,0 +1,143 @@
+"""
+Các job định kỳ: tổng kết ngày, nhắc duyệt hóa đơn, cảnh báo ngân sách
+
+Mỗi job tính số liệu bằng một câu query tổng hợp rồi ghi tin vào outbox
+trong cùng transaction với JobRun của slot, NotificationWorker gửi theo
+rate limit. Người nhận là admin/accountant đang hoạt động.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+import config
+
+from src.database.repository import InvoiceRepository
+from src.database.async_repository import (
+    AsyncInvoiceRepository, AsyncJobRepository, AsyncUserRepository, AsyncNotificationRepository
+)
+
+STATUS_LABELS = {
+    'pending': '⏳ Chờ duyệt',
+    'approved': '✅ Đã duyệt',
+    'rejected': '❌ Từ chối',
+}
+
+# Key tổng ngân sách trong MONTHLY_BUDGETS
+TOTAL_BUDGET_KEY = '*'
+
+
+def parse_budgets(spec: str) -> Dict[str, float]:
+    """'Danh mục=số tiền;...' -> {danh mục: số tiền}, bỏ qua phần sai cú pháp"""
+    budgets = {}
+    for part in spec.split(';'):
+        category, _, amount = part.partition('=')
+        category = category.strip()
+        try:
+            budgets[category] = float(amount.replace(',', '').strip())
+        except ValueError:
+            if part.strip():
+                logger.warning(f"Bỏ qua ngân sách không hợp lệ: '{part}'")
+    return {category: amount for category, amount in budgets.items() if category and amount > 0}
+
+
+def parse_thresholds(spec: str) -> List[float]:
+    return sorted(float(value) for value in spec.split(',') if value.strip())
+
+
+async def _send_to_admins(session: AsyncSession, text: str, kind: str) -> int:
+    admin_ids = await AsyncUserRepository.get_admin_ids(session)
+    return await AsyncNotificationRepository.enqueue_many(
+        session, [(admin_id, text) for admin_id in admin_ids], kind=kind
+    )
+
+
+async def daily_summary(session: AsyncSession, slot: datetime) -> int:
+    """Tổng kết hóa đơn gửi trong ngày và số hóa đơn còn chờ duyệt"""
+    day_start = slot.replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = await AsyncInvoiceRepository.summarize_by_status(session, day_start)
+
+    submitted = sum(row.recent_count for row in rows)
+    amount = sum(row.recent_amount for row in rows)
+    pending = sum(row.total_count for row in rows if row.status == 'pending')
+
+    lines = [
+        f"📊 TỔNG KẾT NGÀY {slot.strftime('%d/%m/%Y')}",
+        "",
+        f"📥 Hóa đơn mới: {submitted} ({amount:,.0f} VNĐ)",
+    ]
+    for row in sorted(rows, key=lambda row: row.status or ''):
+        if row.recent_count:
+            label = STATUS_LABELS.get(row.status, row.status)
+            lines.append(f"  • {label}: {row.recent_count} ({row.recent_amount:,.0f} VNĐ)")
+    lines.append(f"⏳ Đang chờ duyệt: {pending}")
+
+    return await _send_to_admins(session, '\n'.join(lines), kind='daily_summary')
+
+
+async def pending_reminder(session: AsyncSession, slot: datetime) -> int:
+    """Nhắc admin khi có hóa đơn chờ duyệt quá PENDING_REMINDER_MIN_AGE_HOURS giờ"""
+    older_than = slot - timedelta(hours=config.PENDING_REMINDER_MIN_AGE_HOURS)
+    count, amount, oldest = await AsyncInvoiceRepository.pending_overview(session, older_than)
+    if not count:
+        return 0
+
+    waiting_days = (slot - oldest).days if oldest else 0
+    text = (
+        f"⏰ NHẮC DUYỆT HÓA ĐƠN\n\n"
+        f"Có {count} hóa đơn ({amount:,.0f} VNĐ) chờ duyệt quá "
+        f"{config.PENDING_REMINDER_MIN_AGE_HOURS:g} giờ, lâu nhất {waiting_days} ngày.\n"
+        f"Dùng /pending hoặc /bulk để duyệt."
+    )
+    return await _send_to_admins(session, text, kind='pending_reminder')
+
+
+def _month_spending(rows) -> Tuple[Dict[str, float], float]:
+    """Chi tiêu theo danh mục (không tính hóa đơn bị từ chối) và tổng"""
+    by_category: Dict[str, float] = {}
+    for category, status, _count, amount in rows:
+        if status == 'rejected':
+            continue
+        by_category[category or 'Khác'] = by_category.get(category or 'Khác', 0.0) + amount
+    return by_category, sum(by_category.values())
+
+
+async def budget_alerts(session: AsyncSession, slot: datetime) -> int:
+    """
+    Cảnh báo khi chi tiêu trong tháng vượt ngưỡng ngân sách (MONTHLY_BUDGETS)
+
+    Mỗi (tháng, danh mục, ngưỡng) chỉ cảnh báo một lần.
+    """
+    budgets = parse_budgets(config.MONTHLY_BUDGETS)
+    if not budgets:
+        return 0
+
+    month_start = slot.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    rows = await session.run_sync(
+        lambda sync_session: InvoiceRepository.aggregate_amounts(
+            sync_session, ['category', 'status'], start_date=month_start
+        )
+    )
+    by_category, total = _month_spending(rows)
+
+    alerts = []
+    month = month_start.strftime('%Y-%m')
+    for category, budget in budgets.items():
+        spent = total if category == TOTAL_BUDGET_KEY else by_category.get(category, 0.0)
+        reached = [t for t in parse_thresholds(config.BUDGET_ALERT_THRESHOLDS) if spent >= budget * t]
+        if not reached:
+            continue
+        threshold = reached[-1]
+        # Chỉ báo ngưỡng cao nhất vừa đạt, mỗi ngưỡng một lần trong tháng
+        if not await AsyncJobRepository.claim_run(session, 'budget_alert', f"{month}:{category}:{threshold:g}"):
+            continue
+        name = 'Tổng chi' if category == TOTAL_BUDGET_KEY else category
+        icon = '🚨' if threshold >= 1 else '⚠️'
+        alerts.append(
+            f"{icon} {name}: {spent:,.0f} / {budget:,.0f} VNĐ ({spent / budget:.0%} ngân sách)"
+        )
+
+    if not alerts:
+        return 0
+    text = f"💰 CẢNH BÁO NGÂN SÁCH THÁNG {month_start.strftime('%m/%Y')}\n\n" + '\n'.join(alerts)
+    return await _send_to_admins(session, text, kind='budget_alert')
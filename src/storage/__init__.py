@@ -0,0 +1,164 @@
+"""
+Lưu trữ file gốc hóa đơn
+
+File được đặt tên theo SHA-256 của nội dung gốc và chia thư mục theo
+prefix ('invoices/ab/cd/<hash>.webp'): gửi lại cùng file không tạo bản
+mới, và mỗi thư mục chỉ chứa vài file nên không chậm dần khi dữ liệu lớn.
+Ảnh được nén lại (WebP/AVIF) sau khi OCR xong, PDF giữ nguyên.
+
+Invoice.file_path lưu storage key; hóa đơn cũ còn đường dẫn tuyệt đối
+trong DATA_DIR vẫn đọc được (xem migrate_storage.py để chuyển sang).
+"""
+import mimetypes
+import os
+from io import BytesIO
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+from loguru import logger
+from PIL import Image
+import config
+
+from src.storage.backends import StorageBackend, LocalStorage, S3Storage
+from src.storage.retention import sweep_temp_files
+from src.storage.thumbnails import create_thumbnail, thumbnail_path
+
+# AVIF cần plugin pillow-avif-plugin (tự đăng ký với Pillow khi import)
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+KEY_PREFIX = 'invoices'
+
+# Ảnh được nén lại khi lưu; PDF/XML và ảnh đã là WebP giữ nguyên
+RECOMPRESS_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
+
+IMAGE_FORMAT_EXTENSIONS = {'WEBP': '.webp', 'AVIF': '.avif'}
+
+
+def object_key(digest: str, extension: str) -> str:
+    """Key theo hash nội dung, 2 cấp thư mục (65536 thư mục con)"""
+    return f"{KEY_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+class FileStorage:
+    """Lưu/đọc file gốc hóa đơn qua một StorageBackend"""
+
+    def __init__(self, backend: StorageBackend, image_format: str = 'WEBP', image_quality: int = 80):
+        self.backend = backend
+        self.image_format = image_format
+        self.image_quality = image_quality
+
+        Image.init()  # Image.SAVE chỉ có đủ plugin sau init()
+        if image_format in IMAGE_FORMAT_EXTENSIONS and image_format not in Image.SAVE:
+            logger.warning(f"Pillow không hỗ trợ lưu {image_format}, dùng WEBP")
+            self.image_format = 'WEBP'
+
+    def _recompress(self, data: bytes, extension: str) -> Tuple[bytes, str]:
+        """Nén lại ảnh; giữ bản gốc nếu không nhỏ hơn hoặc không đọc được"""
+        if self.image_format not in IMAGE_FORMAT_EXTENSIONS or extension not in RECOMPRESS_EXTENSIONS:
+            return data, extension
+
+        try:
+            with Image.open(BytesIO(data)) as image:
+                if image.mode not in ('RGB', 'RGBA', 'L'):
+                    image = image.convert('RGB')
+                output = BytesIO()
+                image.save(output, format=self.image_format, quality=self.image_quality)
+        except Exception as e:
+            logger.warning(f"Cannot recompress image, storing original: {e}")
+            return data, extension
+
+        compressed = output.getvalue()
+        if len(compressed) >= len(data):
+            return data, extension
+        return compressed, IMAGE_FORMAT_EXTENSIONS[self.image_format]
+
+    def save(self, data: bytes, digest: str, filename: str) -> str:
+        """
+        Lưu file gốc (blocking, gọi qua asyncio.to_thread từ bot)
+
+        Args:
+            data: Nội dung file
+            digest: SHA-256 của data (content_hash)
+            filename: Tên file gốc (lấy phần mở rộng)
+
+        Returns:
+            Storage key để lưu vào Invoice.file_path
+        """
+        stored, extension = self._recompress(data, Path(filename).suffix.lower())
+        key = object_key(digest, extension)
+        content_type = mimetypes.guess_type(key)[0]
+        self.backend.put(key, stored, content_type)
+        logger.debug(f"Stored {filename} as {key} ({len(data)} -> {len(stored)} bytes)")
+
+        # Tạo sẵn thumbnail cho web admin từ bản gốc (chất lượng tốt hơn bản đã nén)
+        try:
+            create_thumbnail(key, data)
+        except OSError as e:
+            logger.warning(f"Cannot cache thumbnail for {key}: {e}")
+        return key
+
+    @staticmethod
+    def _legacy_path(ref: str) -> Optional[Path]:
+        """Hóa đơn cũ lưu đường dẫn tuyệt đối thay vì key"""
+        return Path(ref) if os.path.isabs(ref) else None
+
+    def read(self, ref: str) -> bytes:
+        legacy = self._legacy_path(ref)
+        if legacy:
+            return legacy.read_bytes()
+        return self.backend.get(ref)
+
+    def exists(self, ref: str) -> bool:
+        legacy = self._legacy_path(ref)
+        if legacy:
+            return legacy.exists()
+        return self.backend.exists(ref)
+
+    def delete(self, ref: str):
+        """Xóa file gốc và thumbnail đã cache của nó"""
+        legacy = self._legacy_path(ref)
+        if legacy:
+            legacy.unlink(missing_ok=True)
+        else:
+            self.backend.delete(ref)
+        thumbnail_path(ref).unlink(missing_ok=True)
+
+    def delete_many(self, refs: Iterable[str]):
+        """Xóa các file vừa lưu nhưng không có hóa đơn nào trỏ tới (blocking)"""
+        for ref in refs:
+            try:
+                self.delete(ref)
+            except Exception as e:
+                logger.warning(f"Cannot delete unreferenced file {ref}: {e}")
+
+    def local_path(self, ref: str) -> Optional[Path]:
+        legacy = self._legacy_path(ref)
+        if legacy:
+            return legacy if legacy.exists() else None
+        return self.backend.local_path(ref)
+
+
+def create_backend() -> StorageBackend:
+    """Tạo backend theo config.STORAGE_BACKEND"""
+    if config.STORAGE_BACKEND == 'local':
+        return LocalStorage(config.STORAGE_DIR)
+    if config.STORAGE_BACKEND == 's3':
+        return S3Storage(
+            config.S3_BUCKET,
+            endpoint_url=config.S3_ENDPOINT_URL,
+            access_key_id=config.S3_ACCESS_KEY_ID,
+            secret_access_key=config.S3_SECRET_ACCESS_KEY,
+            region=config.S3_REGION
+        )
+    raise ValueError(f"STORAGE_BACKEND không hợp lệ: {config.STORAGE_BACKEND}")
+
+
+# Global instance
+storage = FileStorage(create_backend(), config.STORAGE_IMAGE_FORMAT, config.STORAGE_IMAGE_QUALITY)
+
+__all__ = [
+    'StorageBackend', 'LocalStorage', 'S3Storage', 'FileStorage',
+    'object_key', 'storage', 'sweep_temp_files'
+]
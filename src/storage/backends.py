@@ -0,0 +1,126 @@
+"""
+Backend lưu trữ file gốc hóa đơn
+
+Key là đường dẫn tương đối dạng 'invoices/ab/cd/<sha256>.webp'. Mọi backend
+chỉ cần put/get/exists/delete; FileStorage lo việc đặt tên và nén ảnh.
+"""
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+from loguru import logger
+
+# boto3 chỉ cần khi dùng S3 / MinIO
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+    BOTO3_AVAILABLE = True
+except ImportError:
+    BOTO3_AVAILABLE = False
+
+
+class StorageBackend:
+    """Interface chung của các backend lưu trữ"""
+
+    name = 'base'
+
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None):
+        raise NotImplementedError
+
+    def get(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """Đường dẫn trên đĩa nếu backend là local (gửi file không cần đọc vào RAM)"""
+        return None
+
+
+class LocalStorage(StorageBackend):
+    """Lưu trên đĩa, chia thư mục theo prefix của hash"""
+
+    name = 'local'
+
+    def __init__(self, root: Path):
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None):
+        path = self._path(key)
+        if path.exists():
+            # Cùng key = cùng nội dung
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Ghi file tạm rồi rename để không bao giờ đọc phải file ghi dở
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    def get(self, key: str) -> bytes:
+        return self._path(key).read_bytes()
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def delete(self, key: str):
+        self._path(key).unlink(missing_ok=True)
+
+    def local_path(self, key: str) -> Optional[Path]:
+        path = self._path(key)
+        return path if path.exists() else None
+
+
+class S3Storage(StorageBackend):
+    """Lưu trên S3 hoặc dịch vụ tương thích S3 (MinIO chạy local qua endpoint_url)"""
+
+    name = 's3'
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None,
+                 access_key_id: Optional[str] = None, secret_access_key: Optional[str] = None,
+                 region: Optional[str] = None):
+        if not BOTO3_AVAILABLE:
+            raise RuntimeError("STORAGE_BACKEND=s3 cần cài boto3: pip install boto3")
+        self.bucket = bucket
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            region_name=region
+        )
+        logger.info(f"S3 storage: bucket={bucket} endpoint={endpoint_url or 'AWS'}")
+
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None):
+        extra = {'ContentType': content_type} if content_type else {}
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, **extra)
+
+    def get(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
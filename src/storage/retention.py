@@ -0,0 +1,54 @@
+"""
+Dọn file tạm (ảnh vừa tải về chờ xử lý, file export Excel/Word/PDF)
+
+File gốc hóa đơn nằm trong storage và không bao giờ bị xóa ở đây.
+"""
+import os
+import time
+from pathlib import Path
+from typing import Optional
+from loguru import logger
+import config
+
+# File export do phiên bản cũ ghi thẳng vào DATA_DIR
+LEGACY_TEMP_PATTERNS = ('invoices_export_*.xlsx', 'invoices_report_*.docx', 'monthly_report_*.pdf')
+
+
+def _remove_if_expired(path: Path, cutoff: float) -> bool:
+    try:
+        if path.stat().st_mtime >= cutoff:
+            return False
+        path.unlink()
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.warning(f"Cannot remove temp file {path}: {e}")
+        return False
+
+
+def sweep_temp_files(max_age_hours: Optional[float] = None) -> int:
+    """
+    Xóa file tạm cũ hơn TEMP_FILE_RETENTION_HOURS
+
+    Returns:
+        Số file đã xóa
+    """
+    if max_age_hours is None:
+        max_age_hours = config.TEMP_FILE_RETENTION_HOURS
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+
+    with os.scandir(config.TEMP_DIR) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False) and _remove_if_expired(Path(entry.path), cutoff):
+                removed += 1
+
+    for pattern in LEGACY_TEMP_PATTERNS:
+        for path in config.DATA_DIR.glob(pattern):
+            if _remove_if_expired(path, cutoff):
+                removed += 1
+
+    if removed:
+        logger.info(f"Removed {removed} temp files older than {max_age_hours}h")
+    return removed
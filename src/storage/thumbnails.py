@@ -0,0 +1,79 @@
+"""
+Thumbnail ảnh hóa đơn cho web admin
+
+Thumbnail được tạo ngay khi lưu file gốc (FileStorage.save) hoặc khi web
+yêu cầu lần đầu, rồi cache trên đĩa local trong THUMBNAIL_DIR. Đây chỉ là
+cache: xóa đi sẽ được tạo lại từ file gốc.
+"""
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+from loguru import logger
+from PIL import Image
+import config
+
+THUMBNAIL_FORMAT = 'WEBP'
+THUMBNAIL_QUALITY = 70
+
+
+def thumbnail_path(ref: str) -> Path:
+    """Đường dẫn cache của thumbnail cho một file (storage key hoặc đường dẫn cũ)"""
+    name = hashlib.sha1(ref.encode('utf-8')).hexdigest()
+    return config.THUMBNAIL_DIR / name[:2] / f'{name}.webp'
+
+
+def _render(data: bytes, extension: str) -> Optional[bytes]:
+    """Thu nhỏ ảnh (hoặc trang đầu của PDF) về THUMBNAIL_MAX_SIZE"""
+    size = config.THUMBNAIL_MAX_SIZE
+    try:
+        if extension == '.pdf':
+            from pdf2image import convert_from_bytes
+            pages = convert_from_bytes(data, first_page=1, last_page=1, size=(size, None))
+            if not pages:
+                return None
+            image = pages[0]
+        else:
+            image = Image.open(BytesIO(data))
+
+        with image:
+            image.draft('RGB', (size, size))  # JPEG: decode thẳng ở độ phân giải nhỏ
+            if image.mode not in ('RGB', 'RGBA', 'L'):
+                image = image.convert('RGB')
+            image.thumbnail((size, size))
+            output = BytesIO()
+            image.save(output, format=THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+            return output.getvalue()
+    except Exception as e:
+        logger.warning(f"Cannot create thumbnail: {e}")
+        return None
+
+
+def create_thumbnail(ref: str, data: bytes) -> Optional[Path]:
+    """Tạo thumbnail từ nội dung file gốc (bỏ qua nếu đã có)"""
+    path = thumbnail_path(ref)
+    if path.exists():
+        return path
+
+    thumbnail = _render(data, Path(ref).suffix.lower())
+    if thumbnail is None:
+        return None
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.part')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(thumbnail)
+    os.replace(tmp_path, path)
+    return path
+
+
+def get_thumbnail(storage, ref: str) -> Optional[Path]:
+    """Thumbnail đã cache, tạo từ file gốc trong storage nếu chưa có"""
+    path = thumbnail_path(ref)
+    if path.exists():
+        return path
+    if not storage.exists(ref):
+        return None
+    return create_thumbnail(ref, storage.read(ref))
@@ -3,8 +3,11 @@ Web Admin Panel for Telegram Accounting Bot
 Quản lý users, roles, và invoices qua giao diện web
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file, abort
 from functools import wraps
+from collections import Counter
+from io import BytesIO
+import mimetypes
 import sys
 import os
 from datetime import datetime, timedelta
@@ -14,16 +17,43 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.database import init_db, UserRepository, InvoiceRepository, db_manager
 from src.database.models import User, Invoice
+from src.database.repository import INVOICE_FILTER_COLUMNS, INVOICE_SORT_COLUMNS
+from src.bot.notifications import notify_submitters_sync, status_header
+from src.exporter import PdfExporter, StatisticsExporter
+from src.storage import storage
+from src.storage.thumbnails import get_thumbnail
+import config
+
+# Nén response gzip/brotli (optional, cài Flask-Compress)
+try:
+    from flask_compress import Compress
+    COMPRESS_AVAILABLE = True
+except ImportError:
+    COMPRESS_AVAILABLE = False
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-this-in-production'  # Change this!
 
+# File static có version (mtime) trong URL nên được cache lâu ở browser
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = config.WEB_STATIC_MAX_AGE
+
+if COMPRESS_AVAILABLE:
+    # Ảnh (webp/jpeg) đã nén sẵn, chỉ nén HTML/JSON/CSS/JS
+    app.config['COMPRESS_MIMETYPES'] = [
+        'text/html', 'text/css', 'application/javascript', 'application/json'
+    ]
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    Compress(app)
+
 # Initialize database
 init_db()
 
 # Simple authentication - Admin password
 ADMIN_PASSWORD = "admin123"  # Change this in production!
 
+# Số dòng tối đa mỗi trang của /api/invoices
+API_PAGE_MAX_LIMIT = 200
+
 
 def login_required(f):
     """Decorator to require login"""
@@ -184,7 +214,12 @@ def set_role(telegram_user_id):
     
     session = db_manager.get_session()
     try:
-        UserRepository.update_role(session, telegram_user_id, new_role)
+        user = UserRepository.get_by_telegram_id(session, telegram_user_id)
+        if not user:
+            return jsonify({'success': False, 'message': 'Không tìm thấy user'}), 404
+        
+        # update_role nhận User.id và xóa cache quyền của user
+        UserRepository.update_role(session, user.id, new_role)
         return jsonify({'success': True, 'message': f'Đã cập nhật role thành {new_role}'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -196,20 +231,100 @@ def set_role(telegram_user_id):
 @app.route('/invoices/<status>')
 @login_required
 def invoices(status=None):
-    """Invoice management page"""
+    """Invoice management page (dữ liệu được tải theo trang qua /api/invoices)"""
+    page_title = f"Hóa đơn {status}" if status else "Tất cả hóa đơn"
+    return render_template('invoices.html',
+                         page_title=page_title,
+                         current_status=status,
+                         sort_columns=list(INVOICE_SORT_COLUMNS))
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+
+@app.route('/api/invoices')
+@login_required
+def api_invoices():
+    """
+    Danh sách hóa đơn theo trang (keyset pagination)
+    
+    Query params:
+        sort: created_at | invoice_date | total_amount | id (thêm '-' để giảm dần, mặc định -created_at)
+        cursor: next_cursor của trang trước
+        limit: số dòng mỗi trang (tối đa API_PAGE_MAX_LIMIT)
+        fields: danh sách field, cách nhau bởi dấu phẩy
+        status, supplier_tax_code, created_by_user_id, invoice_number: lọc theo giá trị
+        date_from, date_to: khoảng ngày hóa đơn (YYYY-MM-DD)
+    """
+    sort = request.args.get('sort', '-created_at')
+    fields = request.args.get('fields')
+    filters = {name: request.args[name] for name in INVOICE_FILTER_COLUMNS if request.args.get(name)}
+    
     session = db_manager.get_session()
     try:
-        if status:
-            invoice_list = InvoiceRepository.get_by_status(session, status)
-            page_title = f"Hóa đơn {status}"
-        else:
-            invoice_list = InvoiceRepository.get_all(session)
-            page_title = "Tất cả hóa đơn"
-        
-        return render_template('invoices.html', 
-                             invoices=invoice_list,
-                             page_title=page_title,
-                             current_status=status)
+        if 'created_by_user_id' in filters:
+            filters['created_by_user_id'] = int(filters['created_by_user_id'])
+        limit = min(max(int(request.args.get('limit', 50)), 1), API_PAGE_MAX_LIMIT)
+        page = InvoiceRepository.list_page(
+            session,
+            fields=fields.split(',') if fields else None,
+            sort=sort.lstrip('-'),
+            descending=sort.startswith('-'),
+            cursor=request.args.get('cursor'),
+            limit=limit,
+            filters=filters,
+            date_from=_parse_date(request.args.get('date_from')),
+            date_to=_parse_date(request.args.get('date_to'))
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    finally:
+        session.close()
+    
+    items = [
+        {key: value.isoformat() if isinstance(value, datetime) else value for key, value in item.items()}
+        for item in page.items
+    ]
+    return jsonify({'items': items, 'next_cursor': page.next_cursor})
+
+
+def _apply_status(session, invoice_ids, new_status: str, reason: str = None):
+    """
+    Đổi trạng thái, báo người gửi (outbox) và cộng counter đã duyệt của họ
+    trong cùng một transaction, giống bulk_admin.apply_status của bot
+    """
+    try:
+        changes = InvoiceRepository.bulk_set_status(
+            session, invoice_ids, new_status,
+            approver_id='web_admin', approver_username='web_admin', reason=reason, commit=False
+        )
+        notify_submitters_sync(session, changes, status_header(new_status, 'web_admin', reason))
+        if new_status == 'approved':
+            UserRepository.add_approved_counts(
+                session, Counter(change.created_by_user_id for change in changes)
+            )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return changes
+
+
+def _set_single_status(invoice_id: int, new_status: str, reason: str = None):
+    """Duyệt / từ chối một hóa đơn nếu còn chờ duyệt (409 nếu đã được xử lý)"""
+    session = db_manager.get_session()
+    try:
+        changes = _apply_status(session, [invoice_id], new_status, reason)
+        if not changes:
+            invoice = InvoiceRepository.get_by_id(session, invoice_id)
+            if not invoice:
+                return jsonify({'success': False, 'message': 'Không tìm thấy hóa đơn'}), 404
+            return jsonify({
+                'success': False,
+                'message': f'Hóa đơn đã được xử lý ({invoice.status}) bởi {invoice.approved_by_username or "người khác"}'
+            }), 409
+        return None
     finally:
         session.close()
 
@@ -218,44 +333,59 @@ def invoices(status=None):
 @login_required
 def approve_invoice(invoice_id):
     """Approve invoice"""
-    session = db_manager.get_session()
     try:
-        invoice = InvoiceRepository.get_by_id(session, invoice_id)
-        if not invoice:
-            return jsonify({'success': False, 'message': 'Không tìm thấy hóa đơn'}), 404
-        
-        invoice.status = 'approved'
-        invoice.approved_by_username = 'web_admin'
-        invoice.updated_at = datetime.now()
-        session.commit()
-        
-        # Increment approved count for user
-        UserRepository.increment_approved_count(session, invoice.telegram_user_id)
-        
-        return jsonify({'success': True, 'message': 'Đã duyệt hóa đơn'})
+        error = _set_single_status(invoice_id, 'approved')
+        return error or jsonify({'success': True, 'message': 'Đã duyệt hóa đơn'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
-    finally:
-        session.close()
 
 
 @app.route('/invoices/reject/<int:invoice_id>', methods=['POST'])
 @login_required
 def reject_invoice(invoice_id):
     """Reject invoice"""
+    try:
+        error = _set_single_status(invoice_id, 'rejected', request.form.get('reason', 'Không có lý do'))
+        return error or jsonify({'success': True, 'message': 'Đã từ chối hóa đơn'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/invoices/bulk', methods=['POST'])
+@login_required
+def bulk_invoices():
+    """
+    Duyệt / từ chối nhiều hóa đơn bằng một câu UPDATE
+    
+    Form:
+        ids: danh sách id, cách nhau bởi dấu phẩy
+        action: approve | reject
+        reason: lý do từ chối
+    """
+    action = request.form.get('action')
+    if action not in ('approve', 'reject'):
+        return jsonify({'success': False, 'message': 'Hành động không hợp lệ'}), 400
+    try:
+        invoice_ids = [int(value) for value in request.form.get('ids', '').split(',') if value]
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Danh sách hóa đơn không hợp lệ'}), 400
+    if not invoice_ids:
+        return jsonify({'success': False, 'message': 'Chưa chọn hóa đơn nào'}), 400
+    
     session = db_manager.get_session()
     try:
-        reason = request.form.get('reason', 'Không có lý do')
-        invoice = InvoiceRepository.get_by_id(session, invoice_id)
-        if not invoice:
-            return jsonify({'success': False, 'message': 'Không tìm thấy hóa đơn'}), 404
-        
-        invoice.status = 'rejected'
-        invoice.rejection_reason = reason
-        invoice.updated_at = datetime.now()
-        session.commit()
-        
-        return jsonify({'success': True, 'message': 'Đã từ chối hóa đơn'})
+        changes = _apply_status(
+            session, invoice_ids,
+            'approved' if action == 'approve' else 'rejected',
+            reason=request.form.get('reason', 'Không có lý do') if action == 'reject' else None
+        )
+        changed_ids = [change.invoice_id for change in changes]
+        verb = 'duyệt' if action == 'approve' else 'từ chối'
+        return jsonify({
+            'success': True,
+            'ids': changed_ids,
+            'message': f'Đã {verb} {len(changed_ids)}/{len(invoice_ids)} hóa đơn'
+        })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
     finally:
@@ -278,6 +408,82 @@ def view_invoice(invoice_id):
         session.close()
 
 
+def _get_invoice_file_path(invoice_id):
+    """file_path của hóa đơn (404 nếu không có file gốc)"""
+    session = db_manager.get_session()
+    try:
+        file_path = session.query(Invoice.file_path).filter(Invoice.id == invoice_id).scalar()
+    finally:
+        session.close()
+    if not file_path:
+        abort(404)
+    return file_path
+
+
+@app.route('/invoices/<int:invoice_id>/image')
+@login_required
+def invoice_image(invoice_id):
+    """File gốc của hóa đơn (hỗ trợ conditional GET và Range)"""
+    file_path = _get_invoice_file_path(invoice_id)
+    
+    local_path = storage.local_path(file_path)
+    if local_path:
+        return send_file(local_path, conditional=True, max_age=config.WEB_IMAGE_CACHE_MAX_AGE)
+    if not storage.exists(file_path):
+        abort(404)
+    
+    # Backend S3: key theo hash nội dung nên dùng luôn làm ETag
+    mimetype = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+    return send_file(BytesIO(storage.read(file_path)), mimetype=mimetype, conditional=True,
+                     etag=os.path.basename(file_path), max_age=config.WEB_IMAGE_CACHE_MAX_AGE)
+
+
+@app.route('/invoices/<int:invoice_id>/thumbnail')
+@login_required
+def invoice_thumbnail(invoice_id):
+    """Thumbnail của hóa đơn, tạo lần đầu khi được yêu cầu rồi cache trên đĩa"""
+    thumbnail = get_thumbnail(storage, _get_invoice_file_path(invoice_id))
+    if not thumbnail:
+        abort(404)
+    return send_file(thumbnail, mimetype='image/webp', conditional=True,
+                     max_age=config.WEB_IMAGE_CACHE_MAX_AGE)
+
+
+@app.route('/reports/pdf')
+@login_required
+def report_pdf():
+    """Download monthly PDF report (?month=MM/YYYY, default: current month)"""
+    month = request.args.get('month')
+    try:
+        if month:
+            first_day = datetime.strptime(month, '%m/%Y')
+        else:
+            first_day = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    except ValueError:
+        flash('Định dạng tháng không đúng! Dùng MM/YYYY', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    next_month = (first_day + timedelta(days=32)).replace(day=1)
+    
+    session = db_manager.get_session()
+    try:
+        summary = StatisticsExporter.generate_summary(
+            session, first_day, next_month - timedelta(microseconds=1)
+        )
+        if not summary['total_invoices']:
+            flash(f'Chưa có dữ liệu trong tháng {first_day.strftime("%m/%Y")}', 'warning')
+            return redirect(url_for('dashboard'))
+    finally:
+        session.close()
+    
+    # Render in worker process
+    pdf_path = PdfExporter.export_monthly_report(
+        summary, f"BÁO CÁO THÁNG {first_day.strftime('%m/%Y')}"
+    )
+    return send_file(pdf_path, mimetype='application/pdf', as_attachment=True,
+                     download_name=f"bao_cao_{first_day.strftime('%Y_%m')}.pdf")
+
+
 @app.route('/api/stats')
 @login_required
 def api_stats():
@@ -307,6 +513,18 @@ def api_stats():
         session.close()
 
 
+@app.context_processor
+def asset_helpers():
+    """asset_url('style.css') -> /static/style.css?v=<mtime> (đổi file là đổi URL)"""
+    def asset_url(filename):
+        try:
+            version = int(os.path.getmtime(os.path.join(app.static_folder, filename)))
+        except OSError:
+            version = 0
+        return url_for('static', filename=filename, v=version)
+    return {'asset_url': asset_url}
+
+
 # Template filters
 @app.template_filter('currency')
 def currency_filter(value):
@@ -336,7 +554,8 @@ if __name__ == '__main__':
     print("=" * 50)
     print("🌐 WEB ADMIN PANEL")
     print("=" * 50)
-    print(f"📍 URL: http://localhost:5000")
+    print(f"📍 URL: http://localhost:{config.WEB_PORT}")
     print(f"🔑 Password: {ADMIN_PASSWORD}")
+    print("⚠️  Dev server - production: gunicorn webapp.app:app")
     print("=" * 50)
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=config.WEB_DEBUG, host=config.WEB_HOST, port=config.WEB_PORT)